@@ -0,0 +1,77 @@
+# compares the python and numpy aggregation backends on synthetic data
+# usage: python3 -m benchmarks.backend_benchmark [rows ...]
+
+import sys
+import time
+from array import array
+
+import numpy as np
+
+from utils.transaction_table import TransactionTable
+from benchmarks.generate_sales_data import region_names
+from utils.data_processor import (
+    aggregate_transactions,
+    top_selling_products,
+    low_performing_products
+)
+
+
+# builds a random, already validated table directly from numpy arrays
+def synthetic_table(rows, n_regions=4, n_products=500, n_customers=50000, n_dates=365, seed=42):
+
+    rng = np.random.default_rng(seed)
+    table = TransactionTable()
+
+    table.dictionaries["Region"].extend(region_names(n_regions))
+    table.dictionaries["ProductName"].extend(f"Product {i}" for i in range(n_products))
+    table.dictionaries["ProductID"].extend(f"P{100 + i}" for i in range(n_products))
+    table.dictionaries["CustomerID"].extend(f"C{i:05d}" for i in range(n_customers))
+    table.dictionaries["Date"].extend(
+        str(day) for day in np.datetime64("2024-01-01") + np.arange(n_dates)
+    )
+
+    product_codes = rng.integers(0, n_products, rows, dtype=np.int32)
+    columns = {
+        "Region": rng.integers(0, n_regions, rows, dtype=np.int32),
+        "ProductName": product_codes,
+        "ProductID": product_codes,
+        "CustomerID": rng.integers(0, n_customers, rows, dtype=np.int32),
+        "Date": rng.integers(0, n_dates, rows, dtype=np.int32)
+    }
+    for column, values in columns.items():
+        table.codes[column] = array("i", values.tobytes())
+
+    table.quantity = array("q", rng.integers(1, 20, rows, dtype=np.int64).tobytes())
+    table.unit_price = array("d", np.round(rng.uniform(10, 5000, rows), 2).tobytes())
+    table.transaction_ids = [f"T{i}" for i in range(rows)]
+
+    return table
+
+
+def run_backend(table, backend):
+
+    start = time.perf_counter()
+    aggregates = aggregate_transactions(table, backend=backend)
+    top = top_selling_products(table, aggregates=aggregates, backend=backend)
+    low = low_performing_products(table, threshold=1000, aggregates=aggregates, backend=backend)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, (aggregates, top, low)
+
+
+def main(sizes):
+
+    print(f"{'rows':>12} {'python (s)':>12} {'numpy (s)':>12} {'speedup':>9}  match")
+
+    for rows in sizes:
+        table = synthetic_table(rows)
+
+        python_time, python_result = run_backend(table, "python")
+        numpy_time, numpy_result = run_backend(table, "numpy")
+
+        print(f"{rows:>12,} {python_time:>12.2f} {numpy_time:>12.2f} "
+              f"{python_time / numpy_time:>8.1f}x  {python_result == numpy_result}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000])
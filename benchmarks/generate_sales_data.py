@@ -0,0 +1,100 @@
+# deterministic synthetic sales data in the data/sales_data.txt format
+# usage: python3 -m benchmarks.generate_sales_data <output file> <rows> [seed]
+
+import random
+import sys
+from datetime import date, timedelta
+
+HEADER = "TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region\n"
+
+PRODUCT_WORDS = [
+    "Wireless Mouse", "USB Cable", "Laptop Charger", "Headphones", "Webcam",
+    "Keyboard", "Monitor", "External Hard Drive", "Mouse Pad", "Laptop"
+]
+
+REGIONS = ["North", "South", "East", "West", "Central", "North-East", "South-West", "Islands"]
+
+
+# the named regions first, then numbered ones beyond them
+def region_names(n_regions):
+
+    return REGIONS[:n_regions] + [f"Region {i + 1}" for i in range(len(REGIONS), n_regions)]
+
+
+# writes `rows` lines (dirty ones included) and returns the number written
+# the same arguments always produce the same file
+def generate_sales_file(filename, rows, seed=0, n_products=200, n_customers=10000,
+                        n_days=365, n_regions=4, dirty_rate=0.05, batch_size=10000):
+
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(n_days)]
+    regions = region_names(n_regions)
+    products = [
+        (f"P{101 + i}", f"{PRODUCT_WORDS[i % len(PRODUCT_WORDS)]} {i // len(PRODUCT_WORDS) + 1}",
+         rng.randint(50, 50000))
+        for i in range(n_products)
+    ]
+
+    with open(filename, "w", encoding="utf-8") as file:
+        file.write(HEADER)
+
+        batch = []
+        for i in range(rows):
+            product_id, product_name, base_price = products[rng.randrange(n_products)]
+            fields = [
+                f"T{i + 1:06d}",
+                dates[rng.randrange(n_days)],
+                product_id,
+                product_name,
+                str(rng.randint(1, 10)),
+                str(base_price),
+                f"C{rng.randrange(n_customers) + 1:04d}",
+                regions[rng.randrange(len(regions))]
+            ]
+
+            # thousands separators, as in the real export
+            if base_price >= 1000 and rng.random() < 0.3:
+                fields[5] = f"{base_price:,}"
+
+            if rng.random() < dirty_rate:
+                fields = make_dirty(rng, fields)
+
+            batch.append("|".join(fields) + "\n" if fields else "\n")
+            if len(batch) >= batch_size:
+                file.writelines(batch)
+                batch = []
+
+        file.writelines(batch)
+
+    return rows
+
+
+# one of the kinds of bad rows seen in real files
+def make_dirty(rng, fields):
+
+    kind = rng.randrange(8)
+
+    if kind == 0:
+        fields[4] = "0"                               # zero quantity
+    elif kind == 1:
+        fields[5] = "-" + fields[5]                   # negative price
+    elif kind == 2:
+        fields[0] = fields[0][1:]                     # TransactionID without T
+    elif kind == 3:
+        fields[2] = fields[2].replace("P", "X")       # bad ProductID
+    elif kind == 4:
+        fields[6] = ""                                # missing CustomerID
+    elif kind == 5:
+        fields[3] = fields[3].replace(" ", ",", 1)    # comma inside ProductName
+    elif kind == 6:
+        fields = fields[:-1]                          # missing field
+    else:
+        fields = []                                   # empty line
+
+    return fields
+
+
+if __name__ == "__main__":
+    generate_sales_file(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else 0)
@@ -0,0 +1,192 @@
+# times and memory-profiles every pipeline stage on synthetic files
+# usage: python3 -m benchmarks.pipeline_benchmark [--rows 10000 1000000 ...]
+#            [--output results.json] [--no-memory] [--data-dir DIR]
+#            [--products N] [--customers N] [--days N] [--regions N] [--dirty-rate R]
+# results are written as JSON so runs can be compared for regressions
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.generate_sales_data import generate_sales_file
+from utils.file_handler import read_sales_data, parse_transactions, validate_and_filter
+from utils.api_handler import enrich_sales_data
+from utils.data_processor import (
+    aggregate_transactions,
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products
+)
+
+DEFAULT_ROWS = [10_000, 1_000_000, 10_000_000]
+
+
+# catalog for enrichment without the network: every other product matches
+def synthetic_product_mapping(n_products=200):
+
+    return {
+        101 + i: {"title": f"Product {i}", "category": "electronics", "brand": "Generic", "rating": 4.2}
+        for i in range(0, n_products, 2)
+    }
+
+
+# (stage name, stage whose output it reads, function) in pipeline order
+# each function takes the dict of earlier stage outputs
+def pipeline_stages(filename, product_mapping):
+
+    valid = "validate_and_filter"
+
+    return [
+        ("read_sales_data", None, lambda s: read_sales_data(filename)),
+        ("parse_transactions", "read_sales_data", lambda s: parse_transactions(s["read_sales_data"])),
+        ("validate_and_filter", "parse_transactions", lambda s: validate_and_filter(s["parse_transactions"])[0]),
+        ("aggregate_transactions", valid, lambda s: aggregate_transactions(s[valid])),
+        ("calculate_total_revenue", valid, lambda s: calculate_total_revenue(s[valid])),
+        ("region_wise_sales", valid, lambda s: region_wise_sales(s[valid])),
+        ("top_selling_products", valid, lambda s: top_selling_products(s[valid])),
+        ("customer_analysis", valid, lambda s: customer_analysis(s[valid])),
+        ("daily_sales_trend", valid, lambda s: daily_sales_trend(s[valid])),
+        ("find_peak_sales_day", valid, lambda s: find_peak_sales_day(s[valid])),
+        ("low_performing_products", valid, lambda s: low_performing_products(s[valid])),
+        ("enrich_sales_data", valid, lambda s: enrich_sales_data(s[valid], product_mapping))
+    ]
+
+
+def count_rows(value):
+    return len(value) if isinstance(value, (list, dict)) else None
+
+
+# runs every stage once; with memory=True each stage runs under tracemalloc
+def run_stages(filename, memory=False):
+
+    outputs = {}
+    results = []
+
+    for name, input_name, stage in pipeline_stages(filename, synthetic_product_mapping()):
+        if memory:
+            tracemalloc.start()
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+
+        # the utils functions print progress, keep the report clean
+        with contextlib.redirect_stdout(io.StringIO()):
+            output = stage(outputs)
+
+        seconds = time.perf_counter() - start
+        cpu_seconds = time.process_time() - cpu_start
+
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        outputs[name] = output
+        rows_in = count_rows(outputs[input_name] if input_name else output)
+
+        results.append({
+            "stage": name,
+            "rows_in": rows_in,
+            "rows_out": count_rows(output),
+            "seconds": round(seconds, 6),
+            "cpu_seconds": round(cpu_seconds, 6),
+            "rows_per_second": round(rows_in / seconds) if rows_in and seconds > 0 else None,
+            "peak_memory_bytes": peak
+        })
+
+    return results
+
+
+# generator_options are passed to generate_sales_file (cardinalities etc.)
+def benchmark(rows_list, data_dir, memory=True, seed=0, generator_options=None):
+
+    generator_options = generator_options or {}
+    options_tag = "_".join(f"{key}{value}" for key, value in sorted(generator_options.items()))
+    runs = []
+
+    for rows in rows_list:
+        filename = os.path.join(data_dir, f"sales_{rows}_{seed}{'_' + options_tag if options_tag else ''}.txt")
+        if not os.path.exists(filename):
+            print(f"generating {rows:,} rows -> {filename}", file=sys.stderr)
+            generate_sales_file(filename, rows, seed=seed, **generator_options)
+
+        print(f"timing {rows:,} rows", file=sys.stderr)
+        timings = run_stages(filename)
+
+        if memory:
+            print(f"memory profiling {rows:,} rows", file=sys.stderr)
+            for timing, profiled in zip(timings, run_stages(filename, memory=True)):
+                timing["peak_memory_bytes"] = profiled["peak_memory_bytes"]
+
+        runs.append({
+            "rows": rows,
+            "file_bytes": os.path.getsize(filename),
+            "stages": timings
+        })
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+        "generator_options": generator_options,
+        "runs": runs
+    }
+
+
+def positive_int(value):
+
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark the sales pipeline stages.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "sales_benchmark"))
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--products", type=positive_int, dest="n_products")
+    parser.add_argument("--customers", type=positive_int, dest="n_customers")
+    parser.add_argument("--days", type=positive_int, dest="n_days")
+    parser.add_argument("--regions", type=positive_int, dest="n_regions")
+    parser.add_argument("--dirty-rate", type=float, dest="dirty_rate")
+    args = parser.parse_args(argv)
+
+    generator_options = {
+        key: getattr(args, key)
+        for key in ("n_products", "n_customers", "n_days", "n_regions", "dirty_rate")
+        if getattr(args, key) is not None
+    }
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = benchmark(args.rows, args.data_dir, memory=not args.no_memory,
+                        seed=args.seed, generator_options=generator_options)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
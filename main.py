@@ -1,110 +1,477 @@
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from utils.file_handler import read_sales_data
 from utils.file_handler import parse_transactions
-from utils.file_handler import validate_and_filter
-from utils.api_handler import fetch_all_products, create_product_mapping
+from utils.file_handler import load_sales_table_cached
+from utils.file_handler import stream_sales_data, EncodingChanged
+from utils.incremental import update_incremental
+from utils.filter_engine import FilterIndex
+from utils.api_handler import load_product_mapping, CATALOG_PAGE_SIZE
 from utils.api_handler import enrich_sales_data, save_enriched_data
-from utils.report_generator_fun import generate_sales_report
+from utils.api_handler import enrich_table, save_enriched_table
+from utils.api_handler import iter_enrich_sales_data, iter_save_enriched_data
+from utils.transaction_table import TransactionTable
+from utils.report_generator_fun import build_report_data, generate_sales_report, REPORT_FORMATS
+from utils import instrumentation
+from utils.instrumentation import stage
+from utils.service import serve
+from utils.result_cache import ResultCache, cache_key, file_fingerprint
 
 from utils.data_processor import (
+    aggregate_transactions,
     calculate_total_revenue,
     region_wise_sales,
     top_selling_products,
     customer_analysis,
     daily_sales_trend,
     find_peak_sales_day,
-    low_performing_products
+    low_performing_products,
+    approximate_aggregates,
+    approximate_amount_range,
+    approximate_daily_sales_trend,
+    approximate_top_products,
+    approximate_top_customers
 )
 
 
-def main():
-   
+# options come from the command line, optionally on top of a JSON config
+# file whose keys are the long option names (e.g. {"region": "North",
+# "min_amount": 1000}). instrumentation can also be switched on with
+# SALES_RUN_RECORD=<path>, SALES_TRACE_MEMORY=0 and SALES_PROFILE=<stage,...>
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Sales analytics pipeline.")
+    parser.add_argument("--config", help="JSON file with default values for the options below")
+    parser.add_argument("--input", default="data/sales_data.txt", help="sales data file")
+    parser.add_argument("--region", help="keep only this region")
+    parser.add_argument("--min-amount", type=float, help="minimum transaction amount")
+    parser.add_argument("--max-amount", type=float, help="maximum transaction amount")
+    parser.add_argument("--enriched-output", default="data/enriched_sales_data.txt")
+    parser.add_argument("--report-output", default="output/sales_report.txt")
+    parser.add_argument("--report-format", choices=REPORT_FORMATS, default="text")
+    parser.add_argument("--interactive", action="store_true",
+                        help="ask for the filters on the terminal")
+    parser.add_argument("--approximate", action="store_true",
+                        help="estimate the distinct counts with sketches (fixed memory per group) "
+                             "and print sketch based estimates with error bounds")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only process rows appended since the last --incremental run and "
+                             "report on all rows so far (no filters, no enrichment)")
+    parser.add_argument("--stream", action="store_true",
+                        help="read, validate, filter, enrich, save and aggregate row by row in one "
+                             "pass over the file, in flat memory (no index, snapshot or cache)")
+    parser.add_argument("--state-file",
+                        help="incremental state file (default: <input>.state.json)")
+    parser.add_argument("--sequential", action="store_true",
+                        help="fetch the product catalog after the analysis instead of alongside it")
+    parser.add_argument("--catalog-page-size", type=int, default=CATALOG_PAGE_SIZE,
+                        help="products per request when fetching the catalog "
+                             "(0 fetches it in a single request)")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the dataset and catalog in memory and answer HTTP requests")
+    parser.add_argument("--cache-dir",
+                        help="keep analysis results here, shared by later runs and processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--run-record", default=os.environ.get("SALES_RUN_RECORD"),
+                        help="write per-stage timings and memory to this JSON file")
+    parser.add_argument("--profile", default=os.environ.get("SALES_PROFILE", ""),
+                        help="comma separated stages to profile with cProfile")
+    parser.add_argument("--no-trace-memory", action="store_true",
+                        default=os.environ.get("SALES_TRACE_MEMORY") == "0")
+
+    args, _ = parser.parse_known_args(argv)
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as file:
+            config = json.load(file)
+        parser.set_defaults(**{key.replace("-", "_"): value for key, value in config.items()})
+
+    args = parser.parse_args(argv)
+
+    if args.catalog_page_size < 0:
+        parser.error("--catalog-page-size must not be negative")
+
+    # the persisted aggregates cover every valid row of the file
+    if args.incremental and (args.interactive or args.region
+                             or args.min_amount is not None or args.max_amount is not None):
+        parser.error("--incremental does not take filters")
+
+    if args.stream and (args.incremental or args.approximate):
+        parser.error("--stream cannot be combined with --incremental or --approximate")
+
+    return args
+
+
+def enable_instrumentation(args):
+
+    if not args.run_record:
+        return None
+
+    instrumentation.enable(
+        memory=not args.no_trace_memory,
+        profile_stages=[name.strip() for name in args.profile.split(",") if name.strip()]
+    )
+    return args.run_record
+
+
+# the old prompts, for --interactive runs
+def ask_filters():
+
+    apply_filter = input("\nDo you want to filter data? (y/n): ").strip().lower()
+
+    region = min_amt = max_amt = None
+    if apply_filter == "y":
+        region = input("Enter region (or press Enter to skip): ").strip() or None
+        min_amt = input("Enter minimum amount (or press Enter to skip): ").strip()
+        max_amt = input("Enter maximum amount (or press Enter to skip): ").strip()
+
+        min_amt = float(min_amt) if min_amt else None
+        max_amt = float(max_amt) if max_amt else None
+
+    return region, min_amt, max_amt
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    if args.serve:
+        serve(args.input, args.host, args.port, ResultCache(cache_dir=args.cache_dir),
+              catalog_page_size=args.catalog_page_size or None)
+        return
+
+    run_pipeline(args)
+
+
+def run_pipeline(args):
+
+    run_record_file = enable_instrumentation(args)
+
     try:
         print("=" * 40)
         print("SALES ANALYTICS SYSTEM")
         print("=" * 40)
 
+        if args.incremental:
+            report_incremental(args)
+        elif args.stream:
+            report_streaming(args)
+        else:
+            if args.sequential:
+                valid_txns, aggregates = ingest_and_analyze(args)
+                print("\n[6/10] Fetching product data from API...")
+                product_mapping = fetch_catalog(args)
+            else:
+                valid_txns, aggregates, product_mapping = asyncio.run(ingest_with_catalog(args))
+            print(f"✓ Fetched {len(product_mapping)} products")
+
+            enrich_and_report(args, valid_txns, aggregates, product_mapping)
+
+        # 10. Complete
+        print("\n[10/10] Process Complete!")
+        print("=" * 40)
+
+    except Exception as e:
+        print("\n ERROR OCCURRED")
+        print(f"Reason: {str(e)}")
+        print("Please check input files or configurations.")
+        print("=" * 40)
+
+    finally:
+        if run_record_file:
+            instrumentation.write_run_record(run_record_file)
+            instrumentation.disable()
+            print(f"Run record saved to: {run_record_file}")
+
+
+# --incremental: the aggregates kept in the state file are brought up to
+# date with the rows appended since the last run, then reported on
+def report_incremental(args):
+
+    print("\n[1/10] Processing rows appended since the last run...")
+    with stage("incremental") as record:
+        aggregates, state = update_incremental(args.input, args.state_file)
+        record["rows_out"] = state["total_input"]
+    print(f"✓ {state['total_input']} transactions so far | Invalid: {state['invalid']}")
+
+    print("\n[9/10] Generating report...")
+    with stage("report"):
+        report_data = build_report_data(aggregates)
+        generate_sales_report(report_data, args.report_output, args.report_format)
+    print(f"✓ Report saved to: {args.report_output}")
+
+
+# --stream: the catalog is fetched first, then every row goes from the file
+# through validation, the filters and enrichment into the enriched file and
+# the aggregates, so no rows are kept
+def report_streaming(args):
+
+    print("\n[1/10] Fetching product data from API...")
+    product_mapping = fetch_catalog(args)
+    print(f"✓ Fetched {len(product_mapping)} products")
+
+    region, min_amt, max_amt = choose_filters(args)
+
+    print("\n[2/10] Streaming the file through validation, enrichment and analysis...")
+    with stage("stream") as record:
+        try:
+            aggregates, filter_summary, enrichment_stats = stream_pipeline(
+                args, product_mapping, region, min_amt, max_amt
+            )
+        except EncodingChanged:
+            # the rows so far were decoded as utf-8, start over as latin-1
+            print("the file is not utf-8 throughout, streaming it again as latin-1")
+            aggregates, filter_summary, enrichment_stats = stream_pipeline(
+                args, product_mapping, region, min_amt, max_amt, encoding="latin-1"
+            )
+        record["rows_in"] = filter_summary["total_input"]
+        record["rows_out"] = filter_summary["final_count"]
+
+    print(f"✓ Valid: {filter_summary['total_input'] - filter_summary['invalid']} "
+          f"| Invalid: {filter_summary['invalid']} | Kept: {filter_summary['final_count']}")
+    print(f"✓ Enriched {enrichment_stats['matched']}/{enrichment_stats['total']} transactions")
+    print(f"✓ Saved to: {args.enriched_output}")
+
+    print("\n[9/10] Generating report...")
+    with stage("report"):
+        report_data = build_report_data(aggregates, enrichment_stats)
+        generate_sales_report(report_data, args.report_output, args.report_format)
+    print(f"✓ Report saved to: {args.report_output}")
+
+
+# one pass of --stream, returns (aggregates, filter_summary, enrichment_stats)
+def stream_pipeline(args, product_mapping, region, min_amt, max_amt, encoding=None):
+
+    filter_summary = {}
+    enrichment_stats = {}
+
+    transactions = stream_sales_data(args.input, region, min_amt, max_amt, filter_summary, encoding)
+    enriched = iter_enrich_sales_data(transactions, product_mapping, stats=enrichment_stats)
+    aggregates = aggregate_transactions(iter_save_enriched_data(enriched, args.enriched_output))
+
+    return aggregates, filter_summary, enrichment_stats
+
+
+# starts the catalog fetch before the file is read, so the network wait
+# overlaps ingest and analysis; the two only meet at enrichment.
+# requests is blocking, so both sides run in worker threads.
+# --interactive prompts stay on the main thread, before the fetch starts,
+# so they never interleave with its output
+async def ingest_with_catalog(args):
+
+    loaded = filters = None
+    if args.interactive:
+        loaded = load_and_index(args)
+        filters = choose_filters(args)
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=2)
+    catalog = loop.run_in_executor(executor, fetch_catalog, args)
+
+    try:
+        valid_txns, aggregates = await loop.run_in_executor(
+            executor, ingest_and_analyze, args, loaded, filters
+        )
+
+        print("\n[6/10] Waiting for product data from API...")
+        product_mapping = await catalog
+
+    except BaseException:
+        # surface the ingest error now instead of after the fetch finishes
+        # (a fetch already running cannot be stopped, it is just not awaited)
+        catalog.cancel()
+        executor.shutdown(wait=False)
+        raise
+
+    executor.shutdown()
+    return valid_txns, aggregates, product_mapping
+
+
+def fetch_catalog(args):
+
+    with stage("fetch_catalog") as record:
+        product_mapping = load_product_mapping(page_size=args.catalog_page_size or None)
+        record["rows_out"] = len(product_mapping)
+
+    return product_mapping
+
+
+# steps 1-5, returns the valid (filtered) transactions and their aggregates
+# loaded (from load_and_index) and filters (from choose_filters) are passed
+# when the caller already has them
+def ingest_and_analyze(args, loaded=None, filters=None):
+
+    filter_index, fingerprint = loaded or load_and_index(args)
+    region, min_amt, max_amt = filters or choose_filters(args)
+
+    return filter_and_analyze(args, filter_index, fingerprint, region, min_amt, max_amt)
+
+
+# steps 1-3, returns the filter index and the input's fingerprint.
+# with --cache-dir the file is loaded from its snapshot (parsed and validated
+# once per version of the file) and the aggregates of each file + filters
+# come from the result cache, so repeated runs skip parse, validate and
+# aggregate
+def load_and_index(args):
+
+    fingerprint = None
+
+    if args.cache_dir:
+        # 1-2. Read parsed and validated rows from the snapshot
+        print("\n[1/10] Reading sales data...")
+        with stage("read") as record:
+            fingerprint = file_fingerprint(args.input)
+            transactions, valid_rows = load_sales_table_cached(args.input, fingerprint=fingerprint)
+            record["rows_out"] = len(transactions)
+        print(f"✓ Successfully read {len(transactions)} transactions")
+        print("\n[2/10] Parsing and cleaning data...")
+        print(f"✓ Parsed {len(transactions)} records")
+    else:
         # 1. Read sales data
         print("\n[1/10] Reading sales data...")
-        raw_lines = read_sales_data("data/sales_data.txt")
+        with stage("read") as record:
+            raw_lines = read_sales_data(args.input)
+            record["rows_out"] = len(raw_lines)
         print(f"✓ Successfully read {len(raw_lines)} transactions")
 
         # 2. Parse & clean
         print("\n[2/10] Parsing and cleaning data...")
-        transactions = parse_transactions(raw_lines)
+        with stage("parse", len(raw_lines)) as record:
+            transactions = parse_transactions(raw_lines)
+            record["rows_out"] = len(transactions)
         print(f"✓ Parsed {len(transactions)} records")
+        valid_rows = None
+
+    # 3. Display filter options
+    # validates once and indexes rows by region and amount
+    with stage("index", len(transactions)):
+        filter_index = FilterIndex(transactions, valid_rows)
+
+    print("\n[3/10] Filter Options Available:")
+    print(f"Regions: {', '.join(sorted(filter_index.parsed_regions))}")
+    print(f"Amount Range: ₹{filter_index.parsed_amount_min:,.0f} - ₹{filter_index.parsed_amount_max:,.0f}")
+
+    return filter_index, fingerprint
 
-        # 3. Display filter options
-        regions = sorted(set(t["Region"] for t in transactions))
-        amounts = [t["Quantity"] * t["UnitPrice"] for t in transactions]
 
-        print("\n[3/10] Filter Options Available:")
-        print(f"Regions: {', '.join(regions)}")
-        print(f"Amount Range: ₹{min(amounts):,.0f} - ₹{max(amounts):,.0f}")
+# (region, min amount, max amount) from the prompts or the arguments
+def choose_filters(args):
 
-        apply_filter = input("\nDo you want to filter data? (y/n): ").strip().lower()
+    if args.interactive:
+        return ask_filters()
 
-        region = min_amt = max_amt = None
-        if apply_filter == "y":
-            region = input("Enter region (or press Enter to skip): ").strip() or None
-            min_amt = input("Enter minimum amount (or press Enter to skip): ").strip()
-            max_amt = input("Enter maximum amount (or press Enter to skip): ").strip()
+    print(f"Filters: region={args.region}, min={args.min_amount}, max={args.max_amount}")
+    return args.region, args.min_amount, args.max_amount
 
-            min_amt = float(min_amt) if min_amt else None
-            max_amt = float(max_amt) if max_amt else None
 
-        # 4. Validate & filter
-        print("\n[4/10] Validating transactions...")
-        valid_txns, invalid_count, summary = validate_and_filter(
-            transactions,
+# steps 4-5
+def filter_and_analyze(args, filter_index, fingerprint, region, min_amt, max_amt):
+
+    cache = ResultCache(cache_dir=args.cache_dir) if args.cache_dir else None
+
+    # 4. Validate & filter
+    print("\n[4/10] Validating transactions...")
+    with stage("validate_and_filter", filter_index.total_input) as record:
+        valid_txns, invalid_count, summary = filter_index.filter(
             region=region,
             min_amount=min_amt,
             max_amount=max_amt
         )
-        print(f"✓ Valid: {len(valid_txns)} | Invalid: {invalid_count}")
-
-        # 5. Analysis
-        print("\n[5/10] Analyzing sales data...")
-        calculate_total_revenue(valid_txns)
-        region_wise_sales(valid_txns)
-        top_selling_products(valid_txns)
-        customer_analysis(valid_txns)
-        daily_sales_trend(valid_txns)
-        find_peak_sales_day(valid_txns)
-        low_performing_products(valid_txns)
-        print("✓ Analysis complete")
-
-        # 6. Fetch API data
-        print("\n[6/10] Fetching product data from API...")
-        api_products = fetch_all_products()
-        product_mapping = create_product_mapping(api_products)
-        print(f"✓ Fetched {len(api_products)} products")
-
-        # 7. Enrichment
-        print("\n[7/10] Enriching sales data...")
-        enriched = enrich_sales_data(valid_txns, product_mapping)
-        success = sum(1 for t in enriched if t["API_Match"])
-        print(f"✓ Enriched {success}/{len(enriched)} transactions "
-              f"({(success / len(enriched)) * 100:.1f}%)")
-
-        # 8. Save enriched data
-        print("\n[8/10] Saving enriched data...")
-        save_enriched_data(enriched)
-        print("✓ Saved to: data/enriched_sales_data.txt")
-
-        # 9. Generate report
-        print("\n[9/10] Generating report...")
-        generate_sales_report(valid_txns, enriched)
-        print("✓ Report saved to: output/sales_report.txt")
+        record["rows_out"] = len(valid_txns)
+    print(f"✓ Valid: {len(valid_txns)} | Invalid: {invalid_count}")
+    rejected = {rule: count for rule, count in summary["rejected_by_rule"].items() if count}
+    if rejected:
+        print("  Rejected by rule: " + ", ".join(f"{rule} {count}" for rule, count in rejected.items()))
 
-        # 10. Complete
-        print("\n[10/10] Process Complete!")
-        print("=" * 40)
+    # 5. Analysis
+    print("\n[5/10] Analyzing sales data...")
+    with stage("analyze", len(valid_txns)):
+        if args.approximate:
+            # sketches instead of the exact distinct sets, not cached
+            aggregates = approximate_aggregates(valid_txns)
+        elif cache is not None:
+            key = cache_key(fingerprint, "aggregate_transactions", region, min_amt, max_amt)
+            aggregates = cache.get_or_compute(key, lambda: aggregate_transactions(valid_txns))
+        else:
+            aggregates = aggregate_transactions(valid_txns)
+        calculate_total_revenue(valid_txns, aggregates=aggregates)
+        region_wise_sales(valid_txns, aggregates=aggregates)
+        top_selling_products(valid_txns, aggregates=aggregates)
+        customer_analysis(valid_txns, aggregates=aggregates)
+        daily_sales_trend(valid_txns, aggregates=aggregates)
+        find_peak_sales_day(valid_txns, aggregates=aggregates)
+        low_performing_products(valid_txns, aggregates=aggregates)
+    print("✓ Analysis complete")
 
-    except Exception as e:
-        print("\n ERROR OCCURRED")
-        print(f"Reason: {str(e)}")
-        print("Please check input files or configurations.")
-        print("=" * 40)
+    if args.approximate:
+        print_approximate_summary(aggregates)
+
+    return valid_txns, aggregates
+
+
+# --approximate: estimates from the sketches, each with its error bound
+def print_approximate_summary(approximate):
+
+    amount_range = approximate_amount_range(approximate)
+    if amount_range["p50"] is not None:
+        print(f"  Amounts (±{amount_range['relative_error']:.0%}): "
+              f"p01 ₹{amount_range['p01']:,.0f} | median ₹{amount_range['p50']:,.0f} | "
+              f"p99 ₹{amount_range['p99']:,.0f}")
+
+    print("  Top products (estimated quantity, max overestimate):")
+    for product, quantity, error in approximate_top_products(approximate):
+        print(f"    {product}: {quantity} (+{error})")
+
+    print("  Top customers (estimated spent, max overestimate):")
+    for customer_id, spent, error in approximate_top_customers(approximate):
+        print(f"    {customer_id}: ₹{spent:,.2f} (+{error:,.2f})")
+
+    daily = approximate_daily_sales_trend(approximate)
+    if daily:
+        error = max(stats["unique_customers_error"] for stats in daily.values())
+        peak = max(daily, key=lambda date: daily[date]["unique_customers"])
+        print(f"  Busiest day by customers: {peak} (~{daily[peak]['unique_customers']} "
+              f"unique, ±{error:.1%})")
+
+
+# steps 7-9
+def enrich_and_report(args, valid_txns, aggregates, product_mapping):
+
+    # 7. Enrichment
+    print("\n[7/10] Enriching sales data...")
+    # a table (read from a snapshot) is enriched column-wise
+    is_table = isinstance(valid_txns, TransactionTable)
+    with stage("enrich", len(valid_txns)) as record:
+        enrichment_stats = {}
+        if is_table:
+            enriched = enrich_table(valid_txns, product_mapping, stats=enrichment_stats)
+        else:
+            enriched = enrich_sales_data(valid_txns, product_mapping, stats=enrichment_stats)
+        record["rows_out"] = len(valid_txns)
+    success = enrichment_stats["matched"]
+    print(f"✓ Enriched {success}/{len(valid_txns)} transactions "
+          f"({(success / len(valid_txns)) * 100:.1f}%)")
+
+    # 8. Save enriched data
+    print("\n[8/10] Saving enriched data...")
+    with stage("save_enriched", len(valid_txns)):
+        if is_table:
+            save_enriched_table(valid_txns, enriched, args.enriched_output)
+        else:
+            save_enriched_data(enriched, args.enriched_output)
+    print(f"✓ Saved to: {args.enriched_output}")
+
+    # 9. Generate report
+    print("\n[9/10] Generating report...")
+    # rendered from the aggregates alone, no pass over the rows
+    with stage("report"):
+        report_data = build_report_data(aggregates, enrichment_stats)
+        generate_sales_report(report_data, args.report_output, args.report_format)
+    print(f"✓ Report saved to: {args.report_output}")
 
 
 if __name__ == "__main__":
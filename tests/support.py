@@ -0,0 +1,50 @@
+# shared fixtures: a generated sales file and the original python pipeline
+# (read_sales_data + parse_transactions + is_valid_transaction) as reference
+
+import os
+
+from benchmarks.generate_sales_data import generate_sales_file
+from utils.file_handler import read_sales_data, parse_transactions, is_valid_transaction
+
+HEADER = "TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region\n"
+
+
+def generated_file(directory, rows=20000, name="sales.txt", **options):
+
+    filename = os.path.join(directory, name)
+    options.setdefault("seed", 7)
+    options.setdefault("n_regions", 6)
+    generate_sales_file(filename, rows, **options)
+    return filename
+
+
+def write_lines(filename, lines, header=HEADER, encoding="utf-8"):
+
+    with open(filename, "w", encoding=encoding) as file:
+        file.write(header)
+        file.writelines(line + "\n" for line in lines)
+    return filename
+
+
+def baseline_transactions(filename):
+    return parse_transactions(read_sales_data(filename))
+
+
+def baseline_valid(transactions):
+    return [tx for tx in transactions if is_valid_transaction(tx)]
+
+
+# one valid transaction dict, fields overridable
+def transaction(i, unit_price=100.0, quantity=1, region="North", product="Mouse",
+                customer=None, date="2024-01-01"):
+
+    return {
+        "TransactionID": f"T{i}",
+        "Date": date,
+        "ProductID": f"P{101 + i % 5}",
+        "ProductName": product,
+        "Quantity": quantity,
+        "UnitPrice": unit_price,
+        "CustomerID": customer or f"C{i % 7:03d}",
+        "Region": region
+    }
@@ -0,0 +1,84 @@
+# approximate mode: exact sums and counts, estimated distinct counts
+
+import shutil
+import tempfile
+import unittest
+
+from utils.data_processor import (
+    aggregate_transactions,
+    approximate_aggregates,
+    approximate_top_products,
+    customer_analysis,
+    daily_sales_trend,
+    top_selling_products
+)
+from utils.report_generator_fun import build_report_data
+
+from tests.support import generated_file, baseline_transactions, baseline_valid
+
+
+class ApproximateTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        directory = tempfile.mkdtemp()
+        try:
+            cls.valid = baseline_valid(baseline_transactions(
+                generated_file(directory, rows=20000, n_customers=5000, n_days=20)
+            ))
+        finally:
+            shutil.rmtree(directory)
+
+        cls.exact = aggregate_transactions(cls.valid)
+        cls.approximate = approximate_aggregates(cls.valid)
+
+    def test_no_distinct_sets_are_kept(self):
+
+        for stats in self.approximate["customers"].values():
+            self.assertNotIn("products_bought", stats)
+        for stats in self.approximate["daily"].values():
+            self.assertNotIsInstance(stats["unique_customers"], set)
+
+    def test_sums_and_counts_are_exact(self):
+
+        for section in ("regions", "products"):
+            self.assertEqual(self.approximate[section], self.exact[section])
+        self.assertEqual(self.approximate["total_revenue"], self.exact["total_revenue"])
+        self.assertEqual(top_selling_products(None, aggregates=self.approximate),
+                         top_selling_products(None, aggregates=self.exact))
+
+        exact_customers = customer_analysis(None, aggregates=self.exact, top_n=5)
+        for customer_id, stats in customer_analysis(None, aggregates=self.approximate, top_n=5).items():
+            expected = dict(exact_customers[customer_id])
+            del expected["products_bought"]
+            self.assertEqual(stats, expected)
+
+    def test_unique_customers_within_error(self):
+
+        exact = daily_sales_trend(None, aggregates=self.exact)
+        estimated = daily_sales_trend(None, aggregates=self.approximate)
+
+        self.assertEqual(list(estimated), list(exact))
+        for date, stats in estimated.items():
+            true_count = exact[date]["unique_customers"]
+            self.assertAlmostEqual(stats["unique_customers"], true_count, delta=0.15 * true_count)
+            self.assertEqual(stats["revenue"], exact[date]["revenue"])
+
+    # the true quantity lies in [quantity - error, quantity]
+    def test_top_products_from_the_sketch(self):
+
+        for product, quantity, error in approximate_top_products(self.approximate):
+            true_quantity = self.exact["products"][product]["total_quantity"]
+            self.assertLessEqual(quantity - error, true_quantity)
+            self.assertGreaterEqual(quantity, true_quantity)
+
+    def test_report_renders_from_approximate_aggregates(self):
+
+        report = build_report_data(self.approximate)
+
+        self.assertEqual(report["summary"], build_report_data(self.exact)["summary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
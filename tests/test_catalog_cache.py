@@ -0,0 +1,198 @@
+# product catalog cache against a local stub of the products API
+# run with: python3 -m unittest discover tests  (or python3 -m pytest tests)
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from utils.api_handler import load_product_mapping, load_catalog_cache
+
+PRODUCTS = [
+    {"id": i, "title": f"Product {i}", "category": "electronics", "brand": "Acme",
+     "price": 10.0 * i, "rating": 4.0}
+    for i in range(1, 251)
+]
+ETAG = '"catalog-v1"'
+
+
+# serves PRODUCTS like dummyjson, honouring skip/limit and If-None-Match
+# every request's query string is recorded in server.requests
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+
+        server = self.server
+        query = parse_qs(urlsplit(self.path).query)
+        server.requests.append(query)
+
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        skip = int(query.get("skip", ["0"])[0])
+        # the real API also caps a page at 100 products
+        limit = min(int(query.get("limit", ["30"])[0]), 100)
+
+        if skip in server.failing_skips:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = json.dumps({
+            "products": PRODUCTS[skip:skip + limit],
+            "total": len(PRODUCTS),
+            "skip": skip,
+            "limit": limit
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CatalogCacheTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.requests = []
+        self.server.failing_skips = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{port}/products?limit=100"
+
+        self.directory = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.directory, "catalog.json")
+
+    def tearDown(self):
+
+        self.stop_server()
+        shutil.rmtree(self.directory)
+
+    def stop_server(self):
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    # rewinds the cache's fetched_at so it is older than any ttl used here
+    def age_cache(self, seconds=3600):
+
+        cache = load_catalog_cache(self.cache_file)
+        cache["fetched_at"] -= seconds
+        with open(self.cache_file, "w", encoding="utf-8") as file:
+            json.dump(cache, file)
+
+    def test_first_run_fetches_every_page_and_saves_the_cache(self):
+
+        mapping = load_product_mapping(self.url, self.cache_file)
+
+        self.assertEqual(len(mapping), len(PRODUCTS))
+        self.assertEqual(mapping[3]["title"], "Product 3")
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(load_catalog_cache(self.cache_file)["products"]), len(PRODUCTS))
+
+    def test_single_request_is_cut_at_the_limit_and_keeps_the_etag(self):
+
+        mapping = load_product_mapping(self.url, self.cache_file, page_size=None)
+
+        self.assertEqual(len(mapping), 100)
+        self.assertEqual(len(self.server.requests), 1)
+
+        cache = load_catalog_cache(self.cache_file)
+        self.assertEqual(cache["etag"], ETAG)
+        self.assertEqual(len(cache["products"]), 100)
+
+    def test_fresh_cache_skips_the_network(self):
+
+        load_product_mapping(self.url, self.cache_file, ttl=60)
+        mapping = load_product_mapping(self.url, self.cache_file, ttl=60)
+
+        self.assertEqual(len(mapping), len(PRODUCTS))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_stale_cache_is_revalidated_with_304(self):
+
+        load_product_mapping(self.url, self.cache_file, ttl=60, page_size=None)
+        self.age_cache()
+        stale_fetched_at = load_catalog_cache(self.cache_file)["fetched_at"]
+
+        mapping = load_product_mapping(self.url, self.cache_file, ttl=60, page_size=None)
+
+        self.assertEqual(len(mapping), 100)
+        self.assertEqual(len(self.server.requests), 2)
+        cache = load_catalog_cache(self.cache_file)
+        self.assertGreater(cache["fetched_at"], stale_fetched_at)
+        self.assertEqual(len(cache["products"]), 100)
+
+    def test_stale_while_revalidate_returns_at_once_and_refreshes(self):
+
+        load_product_mapping(self.url, self.cache_file, ttl=60)
+        self.age_cache()
+        stale_fetched_at = load_catalog_cache(self.cache_file)["fetched_at"]
+
+        mapping = load_product_mapping(self.url, self.cache_file, ttl=60,
+                                       stale_while_revalidate=True)
+        self.assertEqual(len(mapping), len(PRODUCTS))
+
+        deadline = time.time() + 5
+        while load_catalog_cache(self.cache_file)["fetched_at"] == stale_fetched_at:
+            self.assertLess(time.time(), deadline, "background refresh never finished")
+            time.sleep(0.01)
+
+    def test_offline_falls_back_to_the_last_good_snapshot(self):
+
+        load_product_mapping(self.url, self.cache_file, ttl=60)
+        self.age_cache()
+        self.stop_server()
+
+        mapping = load_product_mapping(self.url, self.cache_file, ttl=60)
+
+        self.assertEqual(len(mapping), len(PRODUCTS))
+
+    def test_offline_without_a_cache_gives_an_empty_mapping(self):
+
+        self.stop_server()
+
+        self.assertEqual(load_product_mapping(self.url, self.cache_file), {})
+        self.assertIsNone(load_catalog_cache(self.cache_file))
+
+    def test_paginated_refresh_sends_one_limit(self):
+
+        mapping = load_product_mapping(self.url, self.cache_file, page_size=50)
+
+        self.assertEqual(len(mapping), len(PRODUCTS))
+        self.assertEqual(len(self.server.requests), 5)
+        for query in self.server.requests:
+            self.assertEqual(query["limit"], ["50"])
+
+    def test_failed_page_keeps_the_cached_catalog(self):
+
+        load_product_mapping(self.url, self.cache_file)
+        self.age_cache()
+        before = load_catalog_cache(self.cache_file)
+
+        self.server.failing_skips.add(100)
+        mapping = load_product_mapping(self.url, self.cache_file)
+
+        self.assertEqual(len(mapping), len(PRODUCTS))
+        self.assertEqual(load_catalog_cache(self.cache_file), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+# the catalog fetch overlaps ingest; an ingest error must not wait for it
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+import main
+
+
+class CatalogOverlapTest(unittest.TestCase):
+
+    def test_fetch_and_ingest_run_concurrently(self):
+
+        both_running = threading.Barrier(2, timeout=5)
+
+        def fetch(args):
+            both_running.wait()
+            return {1: {"title": "Mouse"}}
+
+        def ingest(args, loaded=None, filters=None):
+            both_running.wait()
+            return ["rows"], {"total_revenue": 0.0}
+
+        with mock.patch.object(main, "fetch_catalog", fetch), \
+                mock.patch.object(main, "ingest_and_analyze", ingest):
+            result = asyncio.run(main.ingest_with_catalog(main.parse_args([])))
+
+        self.assertEqual(result, (["rows"], {"total_revenue": 0.0}, {1: {"title": "Mouse"}}))
+
+    def test_ingest_error_is_raised_without_waiting_for_the_fetch(self):
+
+        released = threading.Event()
+
+        def fetch(args):
+            released.wait(5)
+            return {}
+
+        def ingest(args, loaded=None, filters=None):
+            raise ValueError("ingest failed")
+
+        start = time.perf_counter()
+        try:
+            with mock.patch.object(main, "fetch_catalog", fetch), \
+                    mock.patch.object(main, "ingest_and_analyze", ingest):
+                with self.assertRaisesRegex(ValueError, "ingest failed"):
+                    asyncio.run(main.ingest_with_catalog(main.parse_args([])))
+            self.assertLess(time.perf_counter() - start, 2)
+        finally:
+            released.set()
+
+
+if __name__ == "__main__":
+    unittest.main()
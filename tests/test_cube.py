@@ -0,0 +1,141 @@
+# sales cube: every group-by, slice and amount range against a direct
+# group-by over the transaction dicts
+
+import math
+import shutil
+import tempfile
+import unittest
+
+from utils.cube import SalesCube
+
+from tests.support import generated_file, baseline_transactions, baseline_valid, transaction
+
+# (by, filters)
+QUERIES = [
+    ((), {}),
+    (("Region",), {}),
+    (("Region", "Date"), {}),
+    (("ProductName",), {"region": "North", "start_date": "2024-01-05", "end_date": "2024-01-11"}),
+    (("CustomerID",), {"where": {"ProductName": ["Laptop 1", "Webcam 2"]}}),
+    (("Region",), {"min_amount": 5000}),
+    (("Date", "ProductName"), {"min_amount": 1000, "max_amount": 20000, "region": "South"}),
+    (("Region",), {"max_amount": 2000, "start_date": "2024-01-10"}),
+    ((), {"min_amount": 10 ** 9}),
+]
+
+
+# what query() must give, straight from the dicts. amounts are kept unless
+# amount < min_amount or amount > max_amount, as in validate_and_filter
+def group_by(transactions, by=(), where=None, region=None, min_amount=None, max_amount=None,
+             start_date=None, end_date=None):
+
+    where = dict(where or {})
+    if region:
+        where["Region"] = region
+
+    result = {}
+    for tx in transactions:
+        amount = tx["Quantity"] * tx["UnitPrice"]
+        if any(tx[name] not in (value if isinstance(value, list) else [value])
+               for name, value in where.items()):
+            continue
+        if (start_date is not None and tx["Date"] < start_date) or \
+                (end_date is not None and tx["Date"] > end_date):
+            continue
+        if (min_amount is not None and amount < min_amount) or \
+                (max_amount is not None and amount > max_amount):
+            continue
+
+        totals = result.setdefault(tuple(tx[name] for name in by), [0.0, 0, 0])
+        totals[0] += amount
+        totals[1] += tx["Quantity"]
+        totals[2] += 1
+
+    return result
+
+
+class CubeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        directory = tempfile.mkdtemp()
+        try:
+            cls.valid = baseline_valid(baseline_transactions(
+                generated_file(directory, rows=10000, n_days=20)
+            ))
+        finally:
+            shutil.rmtree(directory)
+
+        cls.cube = SalesCube(cls.valid)
+
+    def assertSameGroups(self, actual, expected):
+
+        self.assertEqual(set(actual), set(expected))
+        for group, (revenue, quantity, count) in expected.items():
+            stats = actual[group]
+            if math.isnan(revenue):
+                self.assertTrue(math.isnan(stats["revenue"]))
+            else:
+                self.assertAlmostEqual(stats["revenue"], revenue, delta=0.011)
+            self.assertEqual(stats["quantity"], quantity)
+            self.assertEqual(stats["transaction_count"], count)
+
+    def test_queries(self):
+
+        for by, filters in QUERIES:
+            with self.subTest(by=by, **filters):
+                self.assertSameGroups(self.cube.query(by, **filters), group_by(self.valid, by, **filters))
+
+    # the same answers whatever was materialized before
+    def test_roll_up_from_materialized_group_bys(self):
+
+        cube = SalesCube(self.valid)
+        cube.materialize(("Region", "ProductName", "Date"))
+        cube.materialize(("Region", "Date"))
+
+        for by, filters in QUERIES:
+            with self.subTest(by=by, **filters):
+                self.assertSameGroups(cube.query(by, **filters), group_by(self.valid, by, **filters))
+
+    def test_nan_amounts_are_in_every_amount_range(self):
+
+        rows = [
+            transaction(i, unit_price=price, quantity=2, region=region)
+            for i, (price, region) in enumerate([
+                (100.0, "North"), (float("nan"), "North"), (50.0, "North"),
+                (300.0, "South"), (float("nan"), "South"), (10.0, "South")
+            ])
+        ]
+        cube = SalesCube(rows)
+
+        for filters in [{"min_amount": 150}, {"max_amount": 250},
+                        {"min_amount": 150, "max_amount": 250}, {"min_amount": 700, "max_amount": 50}]:
+            with self.subTest(**filters):
+                expected = group_by(rows, ("Region",), **filters)
+                self.assertSameGroups(cube.query(("Region",), **filters), expected)
+                for region, (_, quantity, count) in expected.items():
+                    # the nan row and its quantity are counted
+                    self.assertGreaterEqual(count, 1)
+                    self.assertGreaterEqual(quantity, 2)
+
+    def test_totals_and_top(self):
+
+        self.assertEqual(self.cube.totals(region="Nowhere"),
+                         {"revenue": 0.0, "quantity": 0, "transaction_count": 0})
+
+        by_quantity = self.cube.query(("ProductName",), region="North")
+        expected = sorted(by_quantity.items(), key=lambda item: item[1]["quantity"], reverse=True)[:3]
+        self.assertEqual(self.cube.top("ProductName", n=3, metric="quantity", region="North"),
+                         [(group[0], stats) for group, stats in expected])
+
+    def test_unknown_dimension_or_metric(self):
+
+        with self.assertRaises(ValueError):
+            self.cube.query(("Store",))
+        with self.assertRaises(ValueError):
+            self.cube.top("Region", metric="margin")
+
+
+if __name__ == "__main__":
+    unittest.main()
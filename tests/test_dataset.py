@@ -0,0 +1,127 @@
+# multi-file datasets: partitions from the path and the single pass scan
+# against the plain python pipeline over the same rows in one file
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.data_processor import aggregate_transactions
+from utils.dataset import date_in_name, file_partitions, scan_dataset
+
+from tests.support import HEADER, generated_file, baseline_transactions, baseline_valid, transaction
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+def line(tx):
+    return "|".join(str(tx[key]) for key in HEADER.strip().split("|"))
+
+
+class DatasetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, name, data):
+
+        filename = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        opener = OPENERS.get(os.path.splitext(name)[1], open)
+        with opener(filename, "wb") as file:
+            file.write(data)
+        return filename
+
+    def assertSameAggregates(self, aggregates, expected):
+
+        self.assertAlmostEqual(aggregates.pop("total_revenue"), expected.pop("total_revenue"), places=2)
+        self.assertEqual(aggregates, expected)
+
+    def test_date_in_name(self):
+
+        self.assertEqual(date_in_name("sales_2024-01-05.txt.gz"), "2024-01-05")
+        self.assertEqual(date_in_name("sales_20240105.txt"), "2024-01-05")
+        # store numbers and order ids are not dates
+        self.assertIsNone(date_in_name("store_10012024.txt"))
+        self.assertIsNone(date_in_name("orders_00012345.txt"))
+        self.assertIsNone(date_in_name("sales_20241301.txt"))
+        self.assertIsNone(date_in_name("sales_2024-0105.txt"))
+        self.assertIsNone(date_in_name("batch_120240105.txt"))
+
+    def test_file_partitions(self):
+
+        self.assertEqual(file_partitions("data/region=North/date=2024-01/part.txt"),
+                         {"region": "North", "date": "2024-01"})
+        self.assertEqual(file_partitions("data/region=East/sales_2024-02-03.txt.xz"),
+                         {"region": "East", "date": "2024-02-03"})
+        self.assertEqual(file_partitions("data/store_10012024.txt"), {})
+
+    def test_compressed_files_match_the_baseline(self):
+
+        source = generated_file(self.directory, rows=6000)
+        with open(source, "rb") as file:
+            header, *rows = file.readlines()
+        os.remove(source)
+
+        for i, suffix in enumerate([".gz", ".bz2", ".xz", ""]):
+            self.write_file(f"sales/part{i}.txt{suffix}", header + b"".join(rows[i * 1500:(i + 1) * 1500]))
+        with open(os.path.join(self.directory, "whole.txt"), "wb") as file:
+            file.write(header + b"".join(rows))
+
+        transactions = baseline_transactions(os.path.join(self.directory, "whole.txt"))
+        expected = aggregate_transactions(baseline_valid(transactions))
+        aggregates, summary = scan_dataset(os.path.join(self.directory, "sales"), workers=2)
+
+        self.assertEqual(summary["files"], 4)
+        self.assertEqual(summary["total_input"], len(transactions))
+        self.assertSameAggregates(aggregates, expected)
+
+    def test_partitions_that_cannot_match_are_pruned(self):
+
+        for day in (1, 2, 3):
+            tx = transaction(day, date=f"2024-01-0{day}")
+            self.write_file(f"sales/sales_2024-01-0{day}.txt.gz", (HEADER + line(tx) + "\n").encode())
+        tx = transaction(4, date="2024-01-02")
+        self.write_file("sales/store_10012024.txt", (HEADER + line(tx) + "\n").encode())
+
+        aggregates, summary = scan_dataset(os.path.join(self.directory, "sales"),
+                                           start_date="2024-01-02", end_date="2024-01-02", workers=1)
+
+        self.assertEqual(summary["files"], 4)
+        self.assertEqual(summary["files_pruned"], 2)
+        self.assertEqual(summary["final_count"], 2)
+
+    def test_lines_decoded_and_split_like_read_sales_data(self):
+
+        rows = [line(transaction(i)) for i in range(200)]
+        rows[10] = rows[10].replace("Mouse", "Café Mouse")
+        rows[150] = rows[150].replace("Mouse", "Säge")
+        utf8_then_latin1 = (HEADER + "\n".join(rows[:150]) + "\n").encode("utf-8") + \
+            ("\n".join(rows[150:]) + "\n").encode("latin-1")
+
+        for name, data in [("mixed.txt", utf8_then_latin1),
+                           ("mixed.txt.gz", utf8_then_latin1),
+                           ("utf8.txt.xz", (HEADER + "\n".join(rows) + "\n").encode("utf-8")),
+                           ("latin1.txt.bz2", (HEADER + "\n".join(rows) + "\n").encode("latin-1")),
+                           ("crlf.txt.gz", (HEADER + "\n".join(rows)).replace("\n", "\r\n").encode("utf-8")),
+                           ("cr.txt.gz", (HEADER + "\n".join(rows)).replace("\n", "\r").encode("utf-8"))]:
+            with self.subTest(name=name):
+                filename = self.write_file(name, data)
+                plain = os.path.join(self.directory, "plain.txt")
+                with open(plain, "wb") as file:
+                    file.write(data)
+
+                expected = aggregate_transactions(baseline_valid(baseline_transactions(plain)))
+                aggregates, _ = scan_dataset(filename, workers=1)
+
+                self.assertSameAggregates(aggregates, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
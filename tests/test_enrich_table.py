@@ -0,0 +1,58 @@
+# column-wise enrichment of a TransactionTable against the per-row dict path
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.api_handler import enrich_sales_data, save_enriched_data, enrich_table, save_enriched_table
+from utils.transaction_table import TransactionTable
+
+from tests.support import generated_file, baseline_transactions, baseline_valid
+
+# every other product id of the generated file has a catalog entry
+PRODUCT_MAPPING = {
+    i: {"title": f"Product {i}", "category": "electronics", "brand": "Acme", "rating": 4.5}
+    for i in range(101, 200, 2)
+}
+
+
+class EnrichTableTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.valid = baseline_valid(baseline_transactions(generated_file(self.directory, rows=5000)))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_table_output_matches_the_dict_path(self):
+
+        table = TransactionTable.from_records(self.valid)
+        table_stats = {}
+        columns = enrich_table(table, PRODUCT_MAPPING, stats=table_stats)
+        table_file = os.path.join(self.directory, "table.txt")
+        table_rows = save_enriched_table(table, columns, table_file)
+
+        dict_stats = {}
+        enriched = enrich_sales_data([dict(tx) for tx in self.valid], PRODUCT_MAPPING, stats=dict_stats)
+        dict_file = os.path.join(self.directory, "dicts.txt")
+        dict_rows = save_enriched_data(enriched, dict_file)
+
+        self.assertEqual(table_stats, dict_stats)
+        self.assertTrue(0 < table_stats["matched"] < len(self.valid))
+        self.assertEqual(table_rows, dict_rows)
+        with open(table_file, encoding="utf-8") as a, open(dict_file, encoding="utf-8") as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_table_is_not_modified(self):
+
+        table = TransactionTable.from_records(self.valid)
+        enrich_table(table, PRODUCT_MAPPING)
+
+        self.assertEqual(list(table), self.valid)
+
+
+if __name__ == "__main__":
+    unittest.main()
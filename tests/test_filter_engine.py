@@ -0,0 +1,98 @@
+# FilterIndex.filter must return what validate_and_filter returns
+
+import io
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from utils.file_handler import validate_and_filter, read_sales_mmap
+from utils.filter_engine import FilterIndex
+from utils.transaction_table import TransactionTable
+
+from tests.support import generated_file, baseline_transactions, transaction
+
+QUERIES = [
+    (None, None, None),
+    ("North", None, None),
+    ("Nowhere", None, None),
+    (None, 60, 250),
+    ("North", 1000, 50000),
+    (None, 500, None),
+    (None, None, 2000),
+    ("South", 0, 0)
+]
+
+
+def baseline_filter(transactions, region, min_amount, max_amount):
+
+    with redirect_stdout(io.StringIO()):
+        selected, invalid, summary = validate_and_filter(list(transactions), region, min_amount, max_amount)
+    return [tx["TransactionID"] for tx in selected], invalid, summary
+
+
+def index_filter(index, region, min_amount, max_amount):
+
+    selected, invalid, summary = index.filter(region, min_amount, max_amount, verbose=False)
+    return [tx["TransactionID"] for tx in selected], invalid, summary
+
+
+class FilterIndexTest(unittest.TestCase):
+
+    def assertSameAsBaseline(self, transactions, index, queries=QUERIES):
+
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertEqual(index_filter(index, *query), baseline_filter(transactions, *query))
+
+    def test_generated_file(self):
+
+        directory = tempfile.mkdtemp()
+        try:
+            transactions = baseline_transactions(generated_file(directory, rows=5000))
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertSameAsBaseline(transactions, FilterIndex(transactions))
+        self.assertSameAsBaseline(transactions, FilterIndex(TransactionTable.from_records(transactions)))
+
+    # nan amounts do not sort, the baseline keeps them in every amount range
+    def test_nan_amounts(self):
+
+        prices = [100, float("nan"), 50, 300, 10, float("nan"), 200]
+        transactions = [transaction(i, unit_price=price) for i, price in enumerate(prices)]
+
+        for index in (FilterIndex(transactions), FilterIndex(TransactionTable.from_records(transactions))):
+            selected, _, summary = index_filter(index, None, 60, 250)
+            self.assertEqual(selected, ["T0", "T1", "T5", "T6"])
+            self.assertEqual(summary["filtered_by_amount"], 3)
+            self.assertSameAsBaseline(transactions, index)
+
+    def test_invalid_rows_are_counted_per_rule(self):
+
+        transactions = [transaction(0), transaction(1, quantity=0), transaction(2, unit_price=-5)]
+        transactions[0]["CustomerID"] = "X1"
+
+        _, invalid, summary = index_filter(FilterIndex(transactions), None, None, None)
+
+        self.assertEqual(invalid, 3)
+        self.assertEqual(summary["rejected_by_rule"]["customer_id_prefix"], 1)
+        self.assertEqual(summary["rejected_by_rule"]["quantity_positive"], 1)
+        self.assertEqual(summary["rejected_by_rule"]["unit_price_positive"], 1)
+
+    def test_valid_rows_from_a_snapshot(self):
+
+        directory = tempfile.mkdtemp()
+        try:
+            filename = generated_file(directory, rows=2000)
+            transactions = baseline_transactions(filename)
+            table = read_sales_mmap(filename, columnar=True)
+        finally:
+            shutil.rmtree(directory)
+
+        valid_rows = FilterIndex(table).valid_rows
+        self.assertSameAsBaseline(transactions, FilterIndex(table, valid_rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+# incremental runs must end with the aggregates of a full run over the file
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.data_processor import aggregate_transactions
+from utils.incremental import update_incremental
+
+from tests.support import generated_file, baseline_transactions, baseline_valid, write_lines
+
+
+class IncrementalTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "growing.txt")
+        self.state_file = self.filename + ".state.json"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertMatchesFullRun(self, aggregates, state):
+
+        transactions = baseline_transactions(self.filename)
+        valid = baseline_valid(transactions)
+        expected = aggregate_transactions(valid)
+
+        self.assertEqual(aggregates, expected)
+        # insertion order decides ties in the top-n views
+        for section in ("regions", "products", "customers", "daily"):
+            self.assertEqual(list(aggregates[section]), list(expected[section]), section)
+        self.assertEqual(state["total_input"], len(transactions))
+        self.assertEqual(state["invalid"], len(transactions) - len(valid))
+
+    def append(self, data):
+
+        with open(self.filename, "ab") as file:
+            file.write(data)
+        return update_incremental(self.filename, self.state_file)
+
+    def test_appends_match_full_run(self):
+
+        with open(generated_file(self.directory), "rb") as file:
+            data = file.read()
+
+        # the first part ends in the middle of a line
+        cut = len(data) // 3 + 5
+        self.append(data[:cut])
+        aggregates, state = self.append(data[cut:])
+        self.assertMatchesFullRun(aggregates, state)
+
+        # nothing appended, nothing changes
+        self.assertMatchesFullRun(*update_incremental(self.filename, self.state_file))
+
+    def test_unterminated_last_line_is_taken_once_settled(self):
+
+        write_lines(self.filename, ["T1|2024-01-01|P101|Mouse|2|100|C001|North"])
+        self.append(b"T2|2024-01-02|P102|Cable|1|50|C002|South")
+
+        # the size did not change since the previous run
+        aggregates, state = update_incremental(self.filename, self.state_file)
+        self.assertEqual(state["total_input"], 2)
+        self.assertMatchesFullRun(aggregates, state)
+
+        aggregates, state = self.append(b"\nT3|2024-01-03|P103|Keyboard|1|70|C003|East\n")
+        self.assertMatchesFullRun(aggregates, state)
+
+    # the encoding is the whole file's, as in read_sales_data
+    def test_utf8_file_with_a_latin1_row_further_down(self):
+
+        lines = ["T1|2024-01-01|P101|Webcam café 4|2|100|C001|North"]
+        lines += [f"T{i}|2024-01-02|P102|Cable|1|50|C002|South" for i in range(2, 10000)]
+        write_lines(self.filename, lines)
+
+        # a latin-1 byte a quarter into the file, away from the start, middle
+        # and end of it
+        with open(self.filename, "rb") as file:
+            data = file.read()
+        data = data.replace(b"T2500|2024-01-02|P102|Cable|", b"T2500|2024-01-02|P102|Caf\xe9 Mug|", 1)
+        with open(self.filename, "wb") as file:
+            file.write(data)
+
+        aggregates, state = update_incremental(self.filename, self.state_file)
+
+        self.assertIn("Webcam cafÃ© 4", aggregates["products"])
+        self.assertMatchesFullRun(aggregates, state)
+
+    def test_latin1_append_rebuilds_a_utf8_state(self):
+
+        write_lines(self.filename, ["T1|2024-01-01|P101|Webcam café 4|2|100|C001|North"])
+        aggregates, _ = update_incremental(self.filename, self.state_file)
+        self.assertIn("Webcam café 4", aggregates["products"])
+
+        aggregates, state = self.append(b"T2|2024-01-03|P103|Caf\xe9 Mug|1|70|C003|East\n")
+
+        self.assertEqual(state["encoding"], "latin-1")
+        self.assertNotIn("Webcam café 4", aggregates["products"])
+        self.assertMatchesFullRun(aggregates, state)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# memory mapped reader: same records as read_sales_data + parse_transactions
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.file_handler import read_sales_mmap
+
+from tests.support import HEADER, generated_file, write_lines, baseline_transactions
+
+
+class MmapReaderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.directory = tempfile.mkdtemp()
+        cls.filename = generated_file(cls.directory)
+        cls.transactions = baseline_transactions(cls.filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def assertMatchesBaseline(self, filename):
+
+        expected = baseline_transactions(filename)
+        self.assertEqual(read_sales_mmap(filename), expected)
+        self.assertEqual(list(read_sales_mmap(filename, columnar=True)), expected)
+
+    def test_generated_file(self):
+
+        self.assertEqual(read_sales_mmap(self.filename), self.transactions)
+        self.assertEqual(list(read_sales_mmap(self.filename, columnar=True)), self.transactions)
+
+    # one latin-1 byte anywhere makes the whole file latin-1, as in
+    # read_sales_data, so utf-8 looking rows before it decode as latin-1 too
+    def test_latin1_row_far_into_the_file(self):
+
+        with open(self.filename, "rb") as file:
+            lines = file.readlines()
+        early = next(i for i in range(1, len(lines)) if b"Mouse" in lines[i])
+        lines[early] = lines[early].replace(b"Mouse", "Mouse café".encode("utf-8"), 1)
+        late = next(i for i in range(len(lines) * 3 // 4, len(lines)) if b"Webcam" in lines[i])
+        lines[late] = lines[late].replace(b"Webcam", b"Webcam caf\xe9", 1)
+
+        filename = os.path.join(self.directory, "latin1.txt")
+        with open(filename, "wb") as file:
+            file.writelines(lines)
+
+        self.assertMatchesBaseline(filename)
+        self.assertTrue(any("cafÃ©" in tx["ProductName"] for tx in read_sales_mmap(filename)))
+
+    def test_utf8_file(self):
+
+        filename = write_lines(os.path.join(self.directory, "utf8.txt"), [
+            "T1|2024-01-01|P101|Café, Mouse|2|1,250.50|C001|Nörth",
+            "T2|2024-01-02|P102|Säge|1|10|C002|South",
+        ])
+
+        self.assertMatchesBaseline(filename)
+        self.assertEqual(read_sales_mmap(filename)[0]["ProductName"], "Café Mouse")
+
+    def test_malformed_rows_are_skipped_like_the_baseline(self):
+
+        filename = write_lines(os.path.join(self.directory, "malformed.txt"), [
+            "T1|2024-01-01|P101|Mouse|2|100|C001|North",
+            "T2|2024-01-01|P101|Mouse|2|100|C001",
+            "T3|2024-01-01|P101|Mouse|two|100|C001|North",
+            "T4|2024-01-01|P101|Mouse|2|abc|C001|North",
+            "",
+            "T5|2024-01-01|P101|Mouse| 3 |1,000|C001| South ",
+            "T6|2024-01-01|P101|Mouse|2|100|C001|North|extra",
+        ])
+
+        self.assertMatchesBaseline(filename)
+        self.assertEqual([tx["TransactionID"] for tx in read_sales_mmap(filename)], ["T1", "T5"])
+
+    def test_empty_and_header_only_files(self):
+
+        empty = os.path.join(self.directory, "empty.txt")
+        open(empty, "wb").close()
+        self.assertEqual(read_sales_mmap(empty), [])
+        self.assertEqual(len(read_sales_mmap(empty, columnar=True)), 0)
+
+        header_only = write_lines(os.path.join(self.directory, "header.txt"), [])
+        self.assertEqual(read_sales_mmap(header_only), [])
+
+    def test_missing_file(self):
+
+        missing = os.path.join(self.directory, "missing.txt")
+        self.assertEqual(read_sales_mmap(missing), [])
+        self.assertEqual(len(read_sales_mmap(missing, columnar=True)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
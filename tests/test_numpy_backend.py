@@ -0,0 +1,92 @@
+# the numpy backend and the python table path must give exactly the
+# aggregates of aggregate_transactions over the parsed dicts
+
+import shutil
+import tempfile
+import unittest
+
+from utils.data_processor import (
+    aggregate_transactions,
+    load_numpy_backend,
+    top_selling_products,
+    low_performing_products
+)
+from utils.file_handler import read_sales_mmap, valid_row_indices
+
+from tests.support import generated_file, baseline_transactions, baseline_valid
+
+no_numpy = load_numpy_backend() is None
+
+
+class TableBackendTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.directory = tempfile.mkdtemp()
+        filename = generated_file(cls.directory)
+
+        cls.valid = baseline_valid(baseline_transactions(filename))
+        cls.aggregates = aggregate_transactions(cls.valid)
+
+        table = read_sales_mmap(filename, columnar=True)
+        cls.table = table.take(valid_row_indices(table))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def assertSameAggregates(self, actual, expected):
+
+        self.assertEqual(actual, expected)
+        # insertion order decides ties in the top-n views
+        for section in ("regions", "products", "customers", "daily"):
+            self.assertEqual(list(actual[section]), list(expected[section]), section)
+
+    def test_table_aggregation(self):
+
+        self.assertEqual(list(self.table), self.valid)
+        self.assertSameAggregates(aggregate_transactions(self.table), self.aggregates)
+
+    @unittest.skipIf(no_numpy, "numpy not installed")
+    def test_numpy_backend_on_a_table(self):
+        self.assertSameAggregates(aggregate_transactions(self.table, backend="numpy"), self.aggregates)
+
+    @unittest.skipIf(no_numpy, "numpy not installed")
+    def test_numpy_backend_on_dicts(self):
+        self.assertSameAggregates(aggregate_transactions(self.valid, backend="numpy"), self.aggregates)
+
+    @unittest.skipIf(no_numpy, "numpy not installed")
+    def test_numpy_backend_accumulates_into_existing_aggregates(self):
+
+        half = len(self.valid) // 2
+        aggregates = aggregate_transactions(self.table.take(range(half)), backend="numpy")
+        aggregate_transactions(self.table.take(range(half, len(self.table))),
+                               backend="numpy", aggregates=aggregates)
+
+        expected = aggregate_transactions(self.valid[:half])
+        aggregate_transactions(self.valid[half:], aggregates=expected)
+        self.assertSameAggregates(aggregates, expected)
+
+    @unittest.skipIf(no_numpy, "numpy not installed")
+    def test_numpy_product_views(self):
+
+        for n in (1, 5, 50):
+            self.assertEqual(
+                top_selling_products(None, n=n, aggregates=self.aggregates, backend="numpy"),
+                top_selling_products(None, n=n, aggregates=self.aggregates)
+            )
+        for threshold in (0, 10, 10 ** 9):
+            self.assertEqual(
+                low_performing_products(None, threshold, aggregates=self.aggregates, backend="numpy"),
+                low_performing_products(None, threshold, aggregates=self.aggregates)
+            )
+
+    def test_unknown_backend(self):
+
+        with self.assertRaises(ValueError):
+            aggregate_transactions(self.valid, backend="pandas")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# multi-core parsing by byte ranges: same rows, in the same order, as
+# read_sales_data + parse_transactions
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.file_handler import parse_sales_file_parallel, split_byte_ranges
+
+from tests.support import generated_file, write_lines, baseline_transactions
+
+
+class ParallelParseTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.directory = tempfile.mkdtemp()
+        cls.filename = generated_file(cls.directory)
+        cls.transactions = baseline_transactions(cls.filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_generated_file(self):
+
+        for workers, chunks_per_worker in [(1, 1), (2, 4), (3, 7)]:
+            with self.subTest(workers=workers, chunks_per_worker=chunks_per_worker):
+                table = parse_sales_file_parallel(self.filename, workers, chunks_per_worker)
+                self.assertEqual(list(table), self.transactions)
+
+    def test_byte_ranges_cover_the_data_on_line_boundaries(self):
+
+        with open(self.filename, "rb") as file:
+            data = file.read()
+        header_end = data.index(b"\n") + 1
+
+        ranges = split_byte_ranges(self.filename, 13)
+
+        self.assertEqual(ranges[0][0], header_end)
+        self.assertEqual(ranges[-1][1], len(data))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[end - 1:end], b"\n")
+
+    def test_latin1_and_crlf_file(self):
+
+        filename = os.path.join(self.directory, "latin1.txt")
+        write_lines(filename, [
+            "T1|2024-01-01|P101|Café Mouse|2|1,250.50|C001|North",
+            "T2|2024-01-02|P102|Keyboard|1|10|C002|South",
+            "T3|2024-01-02|P102|Keyboard|x|10|C002|South",
+        ] * 50, encoding="latin-1")
+        with open(filename, "rb") as file:
+            data = file.read()
+        with open(filename, "wb") as file:
+            file.write(data.replace(b"\n", b"\r\n"))
+
+        self.assertEqual(list(parse_sales_file_parallel(filename, workers=2)),
+                         baseline_transactions(filename))
+
+    def test_header_only_and_missing_files(self):
+
+        header_only = write_lines(os.path.join(self.directory, "header.txt"), [])
+        self.assertEqual(len(parse_sales_file_parallel(header_only, workers=2)), 0)
+
+        missing = os.path.join(self.directory, "missing.txt")
+        self.assertEqual(len(parse_sales_file_parallel(missing, workers=2)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+# result cache: keys follow the file content, values round-trip through JSON
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.file_handler import load_sales_table_cached
+from utils.result_cache import ResultCache, cache_key, file_fingerprint
+
+from tests.support import write_lines
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = write_lines(os.path.join(self.directory, "sales.txt"),
+                                    ["T1|2024-01-01|P101|Mouse|2|100|C001|North"])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    # same size, mtime put back, as cp -p / rsync -t / tar leave it
+    def rewrite_keeping_mtime(self):
+
+        stat = os.stat(self.filename)
+        with open(self.filename, "r+", encoding="utf-8") as file:
+            data = file.read()
+            file.seek(0)
+            file.write(data.replace("|2|100|", "|3|100|"))
+        os.utime(self.filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        new_stat = os.stat(self.filename)
+        self.assertEqual((new_stat.st_size, new_stat.st_mtime_ns), (stat.st_size, stat.st_mtime_ns))
+
+    def test_same_size_rewrite_with_kept_mtime_changes_the_fingerprint(self):
+
+        before = file_fingerprint(self.filename)
+        self.rewrite_keeping_mtime()
+
+        self.assertNotEqual(file_fingerprint(self.filename), before)
+
+    def test_snapshot_is_not_reused_after_a_kept_mtime_rewrite(self):
+
+        table, _ = load_sales_table_cached(self.filename, fingerprint=file_fingerprint(self.filename))
+        self.assertEqual(table.quantity[0], 2)
+
+        self.rewrite_keeping_mtime()
+        table, _ = load_sales_table_cached(self.filename, fingerprint=file_fingerprint(self.filename))
+        self.assertEqual(table.quantity[0], 3)
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_keys_depend_on_fingerprint_name_and_arguments(self):
+
+        key = cache_key({"sha256": "a"}, "aggregate", "North", 10)
+
+        self.assertEqual(key, cache_key({"sha256": "a"}, "aggregate", "North", 10))
+        self.assertNotEqual(key, cache_key({"sha256": "b"}, "aggregate", "North", 10))
+        self.assertNotEqual(key, cache_key({"sha256": "a"}, "filter", "North", 10))
+        self.assertNotEqual(key, cache_key({"sha256": "a"}, "aggregate", "North", 20))
+
+    def test_values_come_back_with_sets_tuples_and_int_keys(self):
+
+        value = {"customers": {"C1": {"products_bought": {"Mouse", "Cable"}}},
+                 "peak": ("2024-01-01", 10.5, 2), "by_code": {1: [1.5, None]}}
+        cache = ResultCache()
+        cache.put("key", value)
+
+        self.assertEqual(cache.get("key"), value)
+
+    def test_gets_return_copies(self):
+
+        cache = ResultCache()
+        cache.put("key", {"regions": {"North": 1}})
+        cache.get("key")["regions"]["North"] = 99
+
+        self.assertEqual(cache.get("key"), {"regions": {"North": 1}})
+
+    def test_hits_and_misses_give_the_same_value(self):
+
+        cache = ResultCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"products": {"Mouse": (1, 2.0)}}
+
+        first = cache.get_or_compute("key", compute)
+        second = cache.get_or_compute("key", compute)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats["hits"], 1)
+
+    def test_memory_tier_evicts_least_recently_used(self):
+
+        cache = ResultCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_disk_tier_is_shared_between_instances(self):
+
+        ResultCache(cache_dir=self.directory).put("key", {"total": {1, 2}})
+        other = ResultCache(cache_dir=self.directory)
+
+        self.assertEqual(other.get("key"), {"total": {1, 2}})
+        self.assertEqual(other.stats["disk_hits"], 1)
+
+        other.clear()
+        self.assertIsNone(ResultCache(cache_dir=self.directory).get("key"))
+
+    def test_unreadable_disk_entry_is_a_miss(self):
+
+        cache = ResultCache(cache_dir=self.directory)
+        with open(cache.disk_path("key"), "wb") as file:
+            file.write(b"\x80not json")
+
+        self.assertEqual(cache.get("key", "missing"), "missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
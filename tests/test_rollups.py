@@ -0,0 +1,155 @@
+# daily rollup: every range, bucket and rolling query against totals
+# computed directly from the daily aggregates
+
+import random
+import shutil
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from utils.data_processor import aggregate_transactions, daily_sales_trend, find_peak_sales_day
+from utils.rollups import DailyRollup
+
+from tests.support import generated_file, baseline_transactions, baseline_valid, transaction
+
+
+class RollupTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        directory = tempfile.mkdtemp()
+        try:
+            valid = baseline_valid(baseline_transactions(generated_file(directory, rows=5000, n_days=90)))
+        finally:
+            shutil.rmtree(directory)
+
+        # a gap of days without sales inside the range
+        cls.aggregates = aggregate_transactions(
+            [tx for tx in valid if not "2024-02-10" <= tx["Date"] <= "2024-02-20"]
+        )
+        cls.daily = {
+            date.fromisoformat(day): stats for day, stats in cls.aggregates["daily"].items()
+        }
+        cls.rollup = DailyRollup(cls.aggregates)
+
+    # revenue and transaction count of the days in [start, end] (None unbounded)
+    def expected_totals(self, start=None, end=None):
+
+        days = [
+            stats for day, stats in self.daily.items()
+            if (start is None or day >= start) and (end is None or day <= end)
+        ]
+        return {
+            "revenue": round(sum(stats["revenue"] for stats in days), 2),
+            "transaction_count": sum(stats["transaction_count"] for stats in days)
+        }
+
+    def assertTotalsEqual(self, actual, expected):
+
+        self.assertAlmostEqual(actual["revenue"], expected["revenue"], delta=0.011)
+        self.assertEqual(actual["transaction_count"], expected["transaction_count"])
+
+    def ranges(self):
+
+        first, last = min(self.daily), max(self.daily)
+        picks = random.Random(3)
+        yield None, None
+        yield first - timedelta(days=30), last + timedelta(days=30)
+        yield last + timedelta(days=1), None
+        yield None, first - timedelta(days=1)
+        yield last, first
+        for _ in range(30):
+            start = first + timedelta(days=picks.randint(-5, 95))
+            yield start, start + timedelta(days=picks.randint(0, 40))
+
+    def test_range_totals(self):
+
+        for start, end in self.ranges():
+            with self.subTest(start=start, end=end):
+                self.assertTotalsEqual(self.rollup.range_totals(start, end),
+                                       self.expected_totals(start, end))
+
+        first = min(self.daily)
+        self.assertEqual(self.rollup.range_totals(first.isoformat(), first.isoformat()),
+                         self.rollup.range_totals(first, first))
+
+    def test_buckets(self):
+
+        def month_end(day):
+            return date(day.year + day.month // 12, day.month % 12 + 1, 1) - timedelta(days=1)
+
+        for size, label, bucket_end in [
+            ("month", lambda day: day.strftime("%Y-%m"), month_end),
+            ("week", lambda day: (day - timedelta(days=day.weekday())).isoformat(),
+             lambda day: day + timedelta(days=6 - day.weekday())),
+        ]:
+            with self.subTest(size=size):
+                buckets = self.rollup.buckets(size)
+                day = self.rollup.start
+                while day <= self.rollup.end:
+                    end = min(bucket_end(day), self.rollup.end)
+                    self.assertTotalsEqual(buckets.pop(label(day)), self.expected_totals(day, end))
+                    day = end + timedelta(days=1)
+                self.assertEqual(buckets, {})
+
+        start = self.rollup.start + timedelta(days=3)
+        for label, totals in self.rollup.buckets(10, start=start).items():
+            day = date.fromisoformat(label)
+            self.assertEqual((day - start).days % 10, 0)
+            self.assertTotalsEqual(totals, self.expected_totals(day, day + timedelta(days=9)))
+
+        with self.assertRaises(ValueError):
+            self.rollup.buckets("year")
+
+    def test_rolling(self):
+
+        rolling = self.rollup.rolling(7)
+
+        self.assertEqual(len(rolling), len(self.rollup))
+        for label, totals in rolling.items():
+            day = date.fromisoformat(label)
+            self.assertTotalsEqual(totals, self.expected_totals(day - timedelta(days=6), day))
+
+        with self.assertRaises(ValueError):
+            self.rollup.rolling(0)
+
+    def test_daily_trend(self):
+
+        self.assertEqual(self.rollup.daily_trend(), daily_sales_trend(None, aggregates=self.aggregates))
+
+    def test_peak_day(self):
+
+        for start, end in self.ranges():
+            with self.subTest(start=start, end=end):
+                days = {
+                    day.isoformat(): stats for day, stats in sorted(self.daily.items())
+                    if (start is None or day >= start) and (end is None or day <= end)
+                }
+                expected = find_peak_sales_day(None, aggregates={"daily": days})
+                self.assertEqual(self.rollup.peak_day(start, end), expected)
+
+    def test_ties_go_to_the_earliest_day(self):
+
+        rollup = DailyRollup.from_transactions([
+            transaction(1, date="2024-01-03"),
+            transaction(2, date="2024-01-01"),
+            transaction(3, date="2024-01-02", unit_price=50.0),
+        ])
+
+        self.assertEqual(rollup.peak_day(), ("2024-01-01", 100.0, 1))
+        self.assertEqual(rollup.peak_day("2024-01-02"), ("2024-01-03", 100.0, 1))
+
+    def test_empty_and_unplaceable_dates(self):
+
+        rollup = DailyRollup.from_transactions([transaction(1, date="01/02/2024")])
+
+        self.assertEqual(rollup.skipped_dates, ["01/02/2024"])
+        self.assertEqual(len(rollup), 0)
+        self.assertEqual(rollup.range_totals(), {"revenue": 0.0, "transaction_count": 0})
+        self.assertEqual(rollup.buckets("week"), {})
+        self.assertEqual(rollup.peak_day(), (None, 0.0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
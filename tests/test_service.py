@@ -0,0 +1,206 @@
+# service mode: every query answers what validate_and_filter + the analyses
+# give on the dicts, from the precomputed regions, the numpy selection or
+# the python fallback, and over HTTP
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from utils import service as service_module
+from utils.data_processor import (
+    aggregate_transactions,
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products,
+    load_numpy_backend
+)
+from utils.file_handler import validate_and_filter
+from utils.service import SalesService, create_server, parse_analyze_query
+
+from tests.support import generated_file, baseline_transactions
+
+# (region, min_amount, max_amount)
+QUERIES = [
+    (None, None, None),
+    ("North", None, None),
+    ("Nowhere", None, None),
+    (None, 1000, None),
+    (None, None, 5000),
+    ("South", 500, 20000),
+    ("East", 10 ** 9, None),
+]
+
+# every third product id of the generated file has a catalog entry
+PRODUCT_MAPPING = {
+    i: {"title": f"Product {i}", "category": "electronics", "brand": "Acme", "rating": 4.5}
+    for i in range(101, 200, 3)
+}
+
+
+# what analyze() must return, from the original dict pipeline
+def reference_analysis(transactions, region, min_amount, max_amount, top_n=5):
+
+    valid, _, filter_summary = validate_and_filter(
+        [dict(tx) for tx in transactions], region, min_amount, max_amount
+    )
+    aggregates = aggregate_transactions(valid)
+    peak_date, peak_revenue, peak_count = find_peak_sales_day(None, aggregates=aggregates)
+
+    matched = [tx for tx in valid if int(tx["ProductID"][1:]) in PRODUCT_MAPPING]
+    failed = {tx["ProductID"] for tx in valid} - {tx["ProductID"] for tx in matched}
+
+    return {
+        "filters": {"region": region, "min_amount": min_amount, "max_amount": max_amount},
+        "filter_summary": filter_summary,
+        "total_revenue": calculate_total_revenue(None, aggregates=aggregates),
+        "regions": region_wise_sales(None, aggregates=aggregates),
+        "top_products": top_selling_products(None, n=top_n, aggregates=aggregates),
+        "top_customers": customer_analysis(None, aggregates=aggregates, top_n=top_n),
+        "daily_trend": daily_sales_trend(None, aggregates=aggregates),
+        "peak_day": {"date": peak_date, "revenue": peak_revenue, "transaction_count": peak_count},
+        "low_performers": low_performing_products(None, aggregates=aggregates),
+        "enrichment": {
+            "total": len(valid),
+            "matched": len(matched),
+            "success_rate": round(len(matched) / len(valid) * 100, 2) if valid else 0.0,
+            "failed_products": sorted(failed)
+        }
+    }
+
+
+# as it goes over the wire
+def as_json(value):
+    return json.loads(json.dumps(value))
+
+
+class ServiceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.directory = tempfile.mkdtemp()
+        cls.filename = generated_file(cls.directory, rows=10000)
+        cls.transactions = baseline_transactions(cls.filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def check_queries(self, service):
+
+        for region, min_amount, max_amount in QUERIES:
+            with self.subTest(region=region, min_amount=min_amount, max_amount=max_amount):
+                self.assertEqual(
+                    as_json(service.analyze(region, min_amount, max_amount)),
+                    as_json(reference_analysis(self.transactions, region, min_amount, max_amount))
+                )
+
+    @unittest.skipIf(load_numpy_backend() is None, "numpy not installed")
+    def test_numpy_selection_matches_the_dict_pipeline(self):
+
+        service = SalesService(self.filename, product_mapping=PRODUCT_MAPPING)
+        self.assertIsNotNone(service.query_index.selection)
+        self.check_queries(service)
+
+    def test_python_fallback_matches_the_dict_pipeline(self):
+
+        with mock.patch.object(service_module, "load_numpy_backend", lambda: None):
+            service = SalesService(self.filename, product_mapping=PRODUCT_MAPPING)
+        self.assertIsNone(service.query_index.selection)
+        self.check_queries(service)
+
+    def test_repeated_query_is_served_from_the_cache(self):
+
+        service = SalesService(self.filename, product_mapping=PRODUCT_MAPPING)
+        first = service.analyze("North", 100)
+
+        with mock.patch.object(service, "compute_analysis") as compute:
+            self.assertEqual(service.analyze("North", 100), first)
+        compute.assert_not_called()
+
+    def test_changed_file_is_reloaded(self):
+
+        filename = os.path.join(self.directory, "growing.txt")
+        shutil.copyfile(self.filename, filename)
+        service = SalesService(filename, product_mapping=PRODUCT_MAPPING)
+        before = service.analyze()
+
+        with open(filename, "a", encoding="utf-8") as file:
+            file.write("T999999|2024-01-01|P101|Mouse|1|10|C0001|North\n")
+
+        after = service.analyze()
+        self.assertEqual(after["filter_summary"]["total_input"],
+                         before["filter_summary"]["total_input"] + 1)
+        self.assertAlmostEqual(after["total_revenue"], before["total_revenue"] + 10)
+
+    def test_parse_analyze_query(self):
+
+        self.assertEqual(parse_analyze_query("region=North&min_amount=10&top_n=3"),
+                         {"region": "North", "min_amount": 10.0, "max_amount": None, "top_n": 3})
+        self.assertEqual(parse_analyze_query("region=&max_amount= "),
+                         {"region": None, "min_amount": None, "max_amount": None, "top_n": 5})
+        with self.assertRaises(ValueError):
+            parse_analyze_query("min_amount=ten")
+
+
+class ServiceHttpTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.directory = tempfile.mkdtemp()
+        cls.filename = generated_file(cls.directory, rows=2000)
+        cls.service = SalesService(cls.filename, product_mapping=PRODUCT_MAPPING)
+        cls.server = create_server(cls.service, port=0)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.directory)
+
+    def get(self, path):
+
+        try:
+            with urllib.request.urlopen(self.url + path, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_analyze(self):
+
+        status, body = self.get("/analyze?region=North&min_amount=1000&top_n=3")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, as_json(self.service.analyze("North", 1000.0, None, 3)))
+        self.assertLessEqual(len(body["top_products"]), 3)
+
+    def test_health(self):
+
+        status, body = self.get("/health")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body["status"], "ok")
+        self.assertEqual(body["transactions"], len(self.service.query_index))
+
+    def test_bad_requests(self):
+
+        self.assertEqual(self.get("/analyze?min_amount=ten")[0], 400)
+        self.assertEqual(self.get("/nothing")[0], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# binary columnar snapshots: a loaded table is the parsed table, and a
+# snapshot is only used while its source file is unchanged
+
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import unittest
+from array import array
+from unittest import mock
+
+from utils import snapshot
+from utils.file_handler import read_sales_mmap, valid_row_indices, load_sales_table_cached
+from utils.snapshot import save_snapshot, load_snapshot, snapshot_path, pa
+from utils.transaction_table import TransactionTable
+
+from tests.support import generated_file, write_lines
+
+
+class SnapshotTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.directory = tempfile.mkdtemp()
+        cls.filename = generated_file(cls.directory)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def copy_of_file(self, name):
+
+        path = os.path.join(self.directory, name)
+        shutil.copyfile(self.filename, path)
+        return path
+
+    def check_round_trip(self, use_arrow):
+
+        filename = self.copy_of_file(f"snapshot_{use_arrow}.txt")
+        table = read_sales_mmap(filename, columnar=True)
+        valid_rows = valid_row_indices(table)
+
+        save_snapshot(filename, table, valid_rows, use_arrow=use_arrow)
+        loaded, loaded_rows = load_snapshot(filename, use_arrow=use_arrow)
+
+        self.assertEqual(list(loaded), list(table))
+        self.assertEqual(list(loaded_rows), list(valid_rows))
+
+        # a loaded table is a normal table: picklable and appendable
+        self.assertIsInstance(loaded.quantity, array)
+        self.assertEqual(list(pickle.loads(pickle.dumps(loaded))), list(table))
+        loaded.extend(table.take([0]))
+        self.assertEqual(len(loaded), len(table) + 1)
+
+        # any change to the source makes the snapshot stale
+        with open(filename, "a", encoding="utf-8") as file:
+            file.write("T999999|2024-01-01|P101|Mouse|1|10|C0001|North\n")
+        self.assertIsNone(load_snapshot(filename, use_arrow=use_arrow))
+
+    def test_native_round_trip(self):
+        self.check_round_trip(use_arrow=False)
+
+    @unittest.skipIf(pa is None, "pyarrow not installed")
+    def test_arrow_round_trip(self):
+        self.check_round_trip(use_arrow=True)
+
+    def test_empty_table_round_trip(self):
+
+        filename = write_lines(os.path.join(self.directory, "empty.txt"), [])
+        save_snapshot(filename, TransactionTable(), [], use_arrow=False)
+
+        loaded, loaded_rows = load_snapshot(filename, use_arrow=False)
+        self.assertEqual(len(loaded), 0)
+        self.assertEqual(loaded.transaction_ids, [])
+        self.assertEqual(list(loaded_rows), [])
+
+    def test_same_size_rewrite_is_stale(self):
+
+        filename = self.copy_of_file("rewrite.txt")
+        table = read_sales_mmap(filename, columnar=True)
+        save_snapshot(filename, table, valid_row_indices(table), use_arrow=False)
+        stat = os.stat(filename)
+
+        # same size and mtime, one byte of the first row changed
+        with open(filename, "r+b") as file:
+            file.readline()
+            file.write(b"X")
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.assertEqual(os.path.getsize(filename), stat.st_size)
+        self.assertIsNone(load_snapshot(filename, use_arrow=False))
+
+    def test_older_version_is_ignored(self):
+
+        filename = self.copy_of_file("version.txt")
+        table = read_sales_mmap(filename, columnar=True)
+        with mock.patch.object(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION - 1):
+            save_snapshot(filename, table, valid_row_indices(table), use_arrow=False)
+
+        self.assertIsNone(load_snapshot(filename, use_arrow=False))
+
+    def test_unreadable_snapshot_is_ignored(self):
+
+        filename = self.copy_of_file("corrupt.txt")
+        with open(snapshot_path(filename, use_arrow=False), "wb") as file:
+            file.write(snapshot.NATIVE_MAGIC + struct.pack("<Q", 100) + b"{not json")
+
+        self.assertIsNone(load_snapshot(filename, use_arrow=False))
+
+    def test_cached_load_parses_once(self):
+
+        filename = self.copy_of_file("cached.txt")
+        table, valid_rows = load_sales_table_cached(filename, use_arrow=False)
+        self.assertTrue(os.path.exists(snapshot_path(filename, use_arrow=False)))
+
+        with mock.patch("utils.file_handler.read_sales_mmap") as parse:
+            loaded, loaded_rows = load_sales_table_cached(filename, use_arrow=False)
+        parse.assert_not_called()
+
+        self.assertEqual(list(loaded), list(table))
+        self.assertEqual(list(loaded_rows), list(valid_rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# streaming reader and validator: the same lines, rows and counters as
+# read_sales_data + validate_and_filter, from a single read of the file
+
+import builtins
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from utils.file_handler import (
+    EncodingChanged,
+    iter_sales_data,
+    read_sales_data,
+    stream_sales_data,
+    validate_and_filter
+)
+
+from tests.support import HEADER, generated_file, baseline_transactions
+
+# every other product id of the generated file has a catalog entry
+PRODUCT_MAPPING = {
+    i: {"title": f"Product {i}", "category": "electronics", "brand": "Acme", "rating": 4.5}
+    for i in range(101, 200, 2)
+}
+
+
+class StreamingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_bytes(self, name, data):
+
+        filename = os.path.join(self.directory, name)
+        with open(filename, "wb") as file:
+            file.write(data)
+        return filename
+
+    # lines as iter_sales_data gives them to a caller that starts over
+    # on EncodingChanged
+    def streamed_lines(self, filename):
+
+        try:
+            return list(iter_sales_data(filename))
+        except EncodingChanged:
+            return list(iter_sales_data(filename, encoding="latin-1"))
+
+    def test_lines_match_read_sales_data(self):
+
+        rows = [f"T{i}|2024-01-01|P101|Mouse {i}|1|100|C001|North" for i in range(100)]
+        rows[10] = rows[10].replace("Mouse", "Mousé")
+        rows[80] = rows[80].replace("Mouse", "Säge")
+        text = HEADER + "\n".join(rows) + "\n\n"
+
+        for name, data in [
+            ("utf8.txt", text.encode("utf-8")),
+            ("latin1.txt", text.encode("latin-1")),
+            ("mixed.txt", (HEADER + "\n".join(rows[:50]) + "\n").encode("utf-8")
+             + "\n".join(rows[50:]).encode("latin-1")),
+            ("crlf.txt", text.replace("\n", "\r\n").encode("utf-8")),
+            ("cr.txt", text.replace("\n", "\r").encode("latin-1")),
+        ]:
+            with self.subTest(name=name):
+                filename = self.write_bytes(name, data)
+                self.assertEqual(self.streamed_lines(filename), read_sales_data(filename))
+
+    def test_mixed_file_raises_only_after_non_ascii_utf8(self):
+
+        filename = self.write_bytes("mixed.txt", HEADER.encode() + "T1|é\n".encode("utf-8") + b"T2|\xe9\n")
+        lines = iter_sales_data(filename)
+        self.assertEqual(next(lines), "T1|é")
+        with self.assertRaises(EncodingChanged):
+            next(lines)
+
+        # ascii lines before the first latin-1 byte decode the same either way
+        filename = self.write_bytes("late.txt", HEADER.encode() + b"T1|a\nT2|\xe9\n")
+        self.assertEqual(list(iter_sales_data(filename)), ["T1|a", "T2|é"])
+
+    def test_file_is_read_once(self):
+
+        filename = generated_file(self.directory, rows=2000)
+
+        with mock.patch.object(builtins, "open", wraps=open) as opened:
+            lines = list(iter_sales_data(filename))
+
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(lines, read_sales_data(filename))
+
+    def test_missing_file(self):
+        self.assertEqual(list(iter_sales_data(os.path.join(self.directory, "missing.txt"))), [])
+
+    def test_stream_matches_validate_and_filter(self):
+
+        filename = generated_file(self.directory, rows=5000)
+        transactions = baseline_transactions(filename)
+
+        for filters in [(None, None, None), ("North", 1000, None), (None, 500, 20000)]:
+            with self.subTest(filters=filters):
+                filter_summary = {}
+                streamed = list(stream_sales_data(filename, *filters, filter_summary=filter_summary))
+                valid, _, summary = validate_and_filter(transactions, *filters)
+
+                self.assertEqual(streamed, valid)
+                self.assertEqual(filter_summary, summary)
+
+    # --stream writes the same enriched file and report as the default run
+    def test_cli_stream_matches_the_default_pipeline(self):
+
+        rows = read_sales_data(generated_file(self.directory, rows=3000))
+        rows[5] = rows[5].replace("North", "Nörth")
+        lines = (HEADER + "\n".join(rows[:2000]) + "\n").encode("utf-8") + \
+            ("\n".join(rows[2000:]) + "\n").encode("latin-1").replace(b"Mouse", b"Mous\xe9")
+        filename = self.write_bytes("mixed.txt", lines)
+
+        outputs = {}
+        with mock.patch.object(main, "fetch_catalog", lambda args: PRODUCT_MAPPING):
+            for mode in ("default", "stream"):
+                enriched = os.path.join(self.directory, f"enriched_{mode}.txt")
+                report = os.path.join(self.directory, f"report_{mode}.csv")
+                main.main(["--input", filename, "--region", "North", "--min-amount", "500",
+                           "--sequential", "--enriched-output", enriched,
+                           "--report-output", report, "--report-format", "csv"]
+                          + (["--stream"] if mode == "stream" else []))
+                with open(enriched, encoding="utf-8") as enriched_file, \
+                        open(report, encoding="utf-8") as report_file:
+                    outputs[mode] = (enriched_file.read(),
+                                     [line for line in report_file if "generated" not in line.lower()])
+
+        self.assertGreater(outputs["stream"][0].count("\n"), 1)
+        self.assertEqual(outputs["stream"], outputs["default"])
+
+    def test_stream_rejects_incremental_and_approximate(self):
+
+        with mock.patch("sys.stderr"):
+            for option in ("--incremental", "--approximate"):
+                with self.assertRaises(SystemExit):
+                    main.parse_args(["--stream", option])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# columnar TransactionTable: holds the same rows as the parsed dicts and
+# validate_and_filter gives the same result on either
+
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from utils.file_handler import validate_and_filter
+from utils.transaction_table import TransactionTable
+
+from tests.support import generated_file, baseline_transactions, transaction
+
+# (region, min_amount, max_amount)
+FILTERS = [
+    (None, None, None),
+    ("North", None, None),
+    ("Nowhere", None, None),
+    (None, 1000, 50000),
+    ("South", 5000, None),
+    (None, None, 10),
+    (None, 60, 250),
+]
+
+
+class TransactionTableTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        directory = tempfile.mkdtemp()
+        try:
+            cls.transactions = baseline_transactions(generated_file(directory, rows=5000))
+        finally:
+            shutil.rmtree(directory)
+
+        cls.table = TransactionTable.from_records(cls.transactions)
+
+    def assertSameFilterResult(self, transactions, table, *filters):
+
+        valid, invalid, summary = validate_and_filter([dict(tx) for tx in transactions], *filters)
+        table_valid, table_invalid, table_summary = validate_and_filter(table, *filters)
+
+        self.assertIsInstance(table_valid, TransactionTable)
+        self.assertEqual(table_invalid, invalid)
+        self.assertEqual(table_summary, summary)
+        return valid, list(table_valid)
+
+    def test_rows_round_trip(self):
+
+        self.assertEqual(len(self.table), len(self.transactions))
+        self.assertEqual(list(self.table), self.transactions)
+        self.assertEqual(self.table.column("Quantity"), [tx["Quantity"] for tx in self.transactions])
+        self.assertEqual(self.table.column("Region"), [tx["Region"] for tx in self.transactions])
+        self.assertEqual(list(pickle.loads(pickle.dumps(self.table))), self.transactions)
+
+    def test_take_and_extend(self):
+
+        rows = list(range(0, len(self.table), 7))
+        taken = self.table.take(rows)
+        self.assertEqual(list(taken), [self.transactions[i] for i in rows])
+
+        # extend remaps the codes of a table with its own dictionaries
+        other = TransactionTable.from_records(reversed(self.transactions[:50]))
+        combined = TransactionTable.from_records(self.transactions[:10])
+        combined.extend(other)
+        self.assertEqual(list(combined), self.transactions[:10] + self.transactions[:50][::-1])
+
+    def test_validate_and_filter_matches_the_dict_path(self):
+
+        for filters in FILTERS:
+            with self.subTest(filters=filters):
+                valid, table_valid = self.assertSameFilterResult(self.transactions, self.table, *filters)
+                self.assertEqual(table_valid, valid)
+
+    # nan amounts are kept by the amount filter on both paths
+    def test_nan_amounts(self):
+
+        rows = [
+            transaction(i, unit_price=price)
+            for i, price in enumerate([100.0, float("nan"), 50.0, 300.0, 10.0, float("nan"), 200.0])
+        ]
+        table = TransactionTable.from_records(rows)
+
+        for filters in FILTERS:
+            with self.subTest(filters=filters):
+                valid, table_valid = self.assertSameFilterResult(rows, table, *filters)
+                self.assertEqual([tx["TransactionID"] for tx in table_valid],
+                                 [tx["TransactionID"] for tx in valid])
+
+        _, table_valid = self.assertSameFilterResult(rows, table, None, 60, 250)
+        self.assertEqual([tx["TransactionID"] for tx in table_valid], ["T0", "T1", "T5", "T6"])
+
+
+if __name__ == "__main__":
+    unittest.main()
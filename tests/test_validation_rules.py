@@ -0,0 +1,111 @@
+# per-rule rejection counters: the dict rules, the table row rules and the
+# column checks (stdlib and numpy) agree on which rule rejects each row
+
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import validation_rules
+from utils.file_handler import validate_and_filter, read_sales_mmap
+from utils.transaction_table import TransactionTable
+from utils.validation_rules import (
+    RULES,
+    first_failed_rule,
+    first_failed_rule_at,
+    validate_columns,
+    count_rejections,
+    empty_rule_counts
+)
+
+from tests.support import generated_file, baseline_transactions, transaction
+
+NAN = float("nan")
+
+# (changes to a valid transaction, first rule it breaks)
+TABLE_CASES = [
+    ({}, None),
+    ({"TransactionID": "X1"}, "transaction_id_prefix"),
+    ({"TransactionID": "X1", "ProductID": "X101"}, "transaction_id_prefix"),
+    ({"ProductID": "101"}, "product_id_prefix"),
+    ({"ProductID": "101", "Quantity": 0}, "product_id_prefix"),
+    ({"CustomerID": "c001"}, "customer_id_prefix"),
+    ({"Quantity": 0}, "quantity_positive"),
+    ({"Quantity": -3, "UnitPrice": -1.0}, "quantity_positive"),
+    ({"UnitPrice": 0.0}, "unit_price_positive"),
+    ({"UnitPrice": -0.5}, "unit_price_positive"),
+    # nan is not <= 0, so it passes as it always has
+    ({"UnitPrice": NAN}, None),
+]
+
+
+def case_rows():
+
+    rows = []
+    for i, (changes, _) in enumerate(TABLE_CASES):
+        tx = transaction(i)
+        tx.update(changes)
+        rows.append(tx)
+    return rows
+
+
+class ValidationRulesTest(unittest.TestCase):
+
+    def test_first_failed_rule_of_dicts(self):
+
+        for tx, (_, rule) in zip(case_rows(), TABLE_CASES):
+            with self.subTest(tx=tx):
+                self.assertEqual(first_failed_rule(tx), rule)
+
+        missing = transaction(0)
+        del missing["Region"]
+        self.assertEqual(first_failed_rule(missing), "missing_fields")
+        self.assertEqual(first_failed_rule(dict(transaction(0), Quantity="two")), "malformed")
+        self.assertEqual(first_failed_rule(dict(transaction(0), ProductID=None)), "malformed")
+
+    def test_table_rules_match_the_dict_rules(self):
+
+        rows = case_rows()
+        table = TransactionTable.from_records(rows)
+        expected_valid = [i for i, (_, rule) in enumerate(TABLE_CASES) if rule is None]
+        expected_counts = empty_rule_counts()
+        for _, rule in TABLE_CASES:
+            if rule:
+                expected_counts[rule] += 1
+
+        for i, (_, rule) in enumerate(TABLE_CASES):
+            self.assertEqual(first_failed_rule_at(table, i), rule)
+
+        self.assertEqual(count_rejections(table, expected_valid), expected_counts)
+
+        for numpy in (True, False):
+            if numpy and validation_rules.np is None:
+                continue
+            with self.subTest(numpy=numpy):
+                with mock.patch.object(validation_rules, "np", validation_rules.np if numpy else None):
+                    valid_rows, counts = validate_columns(table)
+                self.assertEqual(list(valid_rows), expected_valid)
+                self.assertEqual(counts, expected_counts)
+
+    def test_counts_add_up_to_the_invalid_count(self):
+
+        directory = tempfile.mkdtemp()
+        try:
+            filename = generated_file(directory)
+            transactions = baseline_transactions(filename)
+            table = read_sales_mmap(filename, columnar=True)
+        finally:
+            shutil.rmtree(directory)
+
+        _, invalid, summary = validate_and_filter(transactions)
+        _, table_invalid, table_summary = validate_and_filter(table)
+
+        self.assertGreater(invalid, 0)
+        self.assertEqual(sum(summary["rejected_by_rule"].values()), invalid)
+        self.assertEqual(table_invalid, invalid)
+        self.assertEqual(table_summary["rejected_by_rule"], summary["rejected_by_rule"])
+        self.assertEqual(list(summary["rejected_by_rule"]), list(RULES))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,34 @@
 import requests
 import os
-
-def fetch_all_products():
-    
-    url = "https://dummyjson.com/products?limit=100"
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, urlunsplit
+
+from utils.instrumentation import instrument
+
+PRODUCTS_URL = "https://dummyjson.com/products?limit=100"
+PRODUCTS_PAGE_URL = "https://dummyjson.com/products"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+CATALOG_CACHE_FILE = "data/product_catalog_cache.json"
+# products per request when the catalog is fetched page by page
+CATALOG_PAGE_SIZE = 100
+
+# keep only the fields used for enrichment
+def clean_product(product):
+
+    return {
+        "id": product.get("id"),
+        "title": product.get("title"),
+        "category": product.get("category"),
+        "brand": product.get("brand"),
+        "price": product.get("price"),
+        "rating": product.get("rating")
+    }
+
+def fetch_all_products(url=PRODUCTS_URL):
 
     try:
         response = requests.get(url, timeout=10)
@@ -13,17 +38,7 @@ def fetch_all_products():
             data = response.json()
             products = data.get("products", [])
 
-            cleaned_products = []
-
-            for product in products:
-                cleaned_products.append({
-                    "id": product.get("id"),
-                    "title": product.get("title"),
-                    "category": product.get("category"),
-                    "brand": product.get("brand"),
-                    "price": product.get("price"),
-                    "rating": product.get("rating")
-                })
+            cleaned_products = [clean_product(product) for product in products]
 
             print(f"successfully fetched {len(cleaned_products)} products")
             return cleaned_products
@@ -36,6 +51,137 @@ def fetch_all_products():
         print(f"connection error occurred: {e}")
         return []
 
+# paginated fetching
+
+# spaces out requests shared by several threads
+class RateLimiter:
+
+    def __init__(self, requests_per_second=None):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+# one page of products, retried with exponential backoff
+# returns (page data or None, latency of the last attempt in seconds)
+def fetch_products_page(session, url, skip, limit, retries=3, backoff=0.5,
+                        limiter=None, timeout=10):
+
+    latency = 0.0
+
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.wait()
+
+        start = time.perf_counter()
+        retry_after = None
+        try:
+            response = session.get(url, params={"skip": skip, "limit": limit}, timeout=timeout)
+            latency = time.perf_counter() - start
+
+            if response.status_code == 200:
+                return response.json(), latency
+
+            if response.status_code not in RETRY_STATUS_CODES:
+                print(f"API failed with status code: {response.status_code} (skip={skip})")
+                return None, latency
+
+            retry_after = response.headers.get("Retry-After")
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            latency = time.perf_counter() - start
+            print(f"connection error occurred: {e} (skip={skip})")
+
+        if attempt < retries:
+            delay = backoff * (2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            time.sleep(delay)
+
+    return None, latency
+
+# fetches the whole catalog page by page with skip/limit
+# pages run on a bounded thread pool sharing one pooled session
+# fetch statistics (throughput, per page latency) are written into stats
+@instrument(rows_in=None)
+def fetch_all_products_paginated(url=PRODUCTS_PAGE_URL, page_size=100, max_workers=4,
+                                 retries=3, backoff=0.5, requests_per_second=None,
+                                 timeout=10, stats=None):
+
+    if stats is None:
+        stats = {}
+
+    limiter = RateLimiter(requests_per_second)
+    start = time.perf_counter()
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        # first page tells us how many products there are
+        first_page, latency = fetch_products_page(
+            session, url, 0, page_size, retries, backoff, limiter, timeout
+        )
+        if first_page is None:
+            stats.update({"pages": 1, "failed_pages": [0], "products": 0})
+            return []
+
+        total = first_page.get("total", len(first_page.get("products", [])))
+        skips = list(range(page_size, total, page_size))
+
+        def fetch(skip):
+            return fetch_products_page(session, url, skip, page_size, retries, backoff, limiter, timeout)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pages = [(first_page, latency)] + list(pool.map(fetch, skips))
+
+    elapsed = time.perf_counter() - start
+
+    products = []
+    failed_pages = []
+    latencies = []
+    for skip, (page, latency) in zip([0] + skips, pages):
+        latencies.append(latency)
+        if page is None:
+            failed_pages.append(skip)
+            continue
+        products.extend(clean_product(product) for product in page.get("products", []))
+
+    stats.update({
+        "pages": len(pages),
+        "failed_pages": failed_pages,
+        "products": len(products),
+        "elapsed_seconds": round(elapsed, 4),
+        "products_per_second": round(len(products) / elapsed, 2) if elapsed > 0 else 0.0,
+        "page_latency_seconds": {
+            "min": round(min(latencies), 4),
+            "avg": round(sum(latencies) / len(latencies), 4),
+            "max": round(max(latencies), 4)
+        },
+        "page_latencies": [round(latency, 4) for latency in latencies]
+    })
+
+    print(f"successfully fetched {len(products)} products in {len(pages)} pages "
+          f"({stats['products_per_second']} products/s, "
+          f"avg page latency {stats['page_latency_seconds']['avg']}s)")
+    if failed_pages:
+        print(f"failed pages (skip): {failed_pages}")
+
+    return products
+
 # to create product mapping
 
 def create_product_mapping(api_products):
@@ -54,108 +200,321 @@ def create_product_mapping(api_products):
 
     return product_mapping
 
-#enriching data
+# product catalog cache
 
-import os
+# last good catalog snapshot from disk, None if missing or unreadable
+def load_catalog_cache(cache_file=CATALOG_CACHE_FILE):
+
+    try:
+        with open(cache_file, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+
+        if not isinstance(cache.get("products"), list):
+            return None
+        return cache
+
+    except FileNotFoundError:
+        return None
+    except (ValueError, OSError) as e:
+        print(f"ignoring unreadable catalog cache: {e}")
+        return None
+
+def save_catalog_cache(cache, cache_file=CATALOG_CACHE_FILE):
+
+    directory = os.path.dirname(cache_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # write to a temp file first so readers never see a half written cache
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        json.dump(cache, file)
+    os.replace(temp_file, cache_file)
+
+# conditional refresh of the cache
+# sends the stored ETag / Last-Modified so an unchanged catalog costs a 304
+# returns the new cache, or None if the API could not be reached
+# with page_size set the catalog is fetched page by page instead (the query
+# string of url is dropped), and any failed page fails the whole refresh
+def refresh_catalog_cache(url=PRODUCTS_URL, cache_file=CATALOG_CACHE_FILE, cache=None,
+                          timeout=10, page_size=None):
+
+    if page_size:
+        # the pages carry their own skip/limit, a limit left in the url would
+        # be sent twice
+        page_url = urlunsplit(urlsplit(url)._replace(query=""))
+        stats = {}
+        products = fetch_all_products_paginated(page_url, page_size=page_size, timeout=timeout,
+                                                stats=stats)
+        if not products or stats.get("failed_pages"):
+            # a partial catalog must not replace the last good one
+            print("catalog refresh incomplete, keeping the cached one")
+            return None
+
+        cache = {"url": url, "fetched_at": time.time(), "products": products}
+        save_catalog_cache(cache, cache_file)
+        return cache
+
+    headers = {}
+    if cache:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    try:
+        response = requests.get(url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and cache:
+            cache = dict(cache, fetched_at=time.time())
 
-def enrich_sales_data(transactions, product_mapping):
+        elif response.status_code == 200:
+            products = response.json().get("products", [])
+            if not products:
+                print("API returned an empty catalog, keeping the cached one")
+                return None
 
-    enriched_transactions = []
+            cache = {
+                "url": url,
+                "fetched_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "products": [clean_product(product) for product in products]
+            }
 
-    # to make sure output directory exists
-    os.makedirs("data", exist_ok=True)
+        else:
+            print(f"API failed with status code: {response.status_code}")
+            return None
 
-    output_file = "data/enriched_sales_data.txt"
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"connection error occurred: {e}")
+        return None
+
+    save_catalog_cache(cache, cache_file)
+    return cache
+
+# product mapping backed by the on-disk catalog cache
+# - fresh cache (younger than ttl seconds): no network at all
+# - stale cache: conditional refresh, or with stale_while_revalidate the
+#   stale mapping is returned at once and refreshed in a background thread
+# - API unreachable: the last good snapshot is used
+# the catalog is fetched page by page, so it is never cut off at one
+# request's limit; page_size=None fetches url in a single (conditional) request
+@instrument(rows_in=None)
+def load_product_mapping(url=PRODUCTS_URL, cache_file=CATALOG_CACHE_FILE,
+                         ttl=24 * 60 * 60, stale_while_revalidate=False,
+                         page_size=CATALOG_PAGE_SIZE):
+
+    cache = load_catalog_cache(cache_file)
+
+    if cache and cache.get("url") == url:
+        age = time.time() - cache.get("fetched_at", 0)
+
+        if age < ttl:
+            print(f"using cached product catalog ({len(cache['products'])} products)")
+            return create_product_mapping(cache["products"])
+
+        if stale_while_revalidate:
+            threading.Thread(
+                target=refresh_catalog_cache,
+                args=(url, cache_file, cache),
+                kwargs={"page_size": page_size},
+                daemon=True
+            ).start()
+            print("using stale product catalog, refreshing in background")
+            return create_product_mapping(cache["products"])
+    else:
+        cache = None
+
+    refreshed = refresh_catalog_cache(url, cache_file, cache, page_size=page_size)
+    if refreshed:
+        return create_product_mapping(refreshed["products"])
+
+    if cache:
+        print("API unavailable, using last good product catalog snapshot")
+        return create_product_mapping(cache["products"])
+
+    return {}
 
-    # to define header for output file
-    header = (
-        "TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region|"
-        "API_Category|API_Brand|API_Rating|API_Match\n"
-    )
+#enriching data
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(header)
+ENRICHED_COLUMNS = (
+    "TransactionID", "Date", "ProductID", "ProductName", "Quantity", "UnitPrice",
+    "CustomerID", "Region", "API_Category", "API_Brand", "API_Rating", "API_Match"
+)
 
-        for txn in transactions:
-            try:
-                # to extract numeric product ID (P101 -> 101)
-                product_id_str = txn.get("ProductID", "")
-                numeric_id = int("".join(filter(str.isdigit, product_id_str)))
+ENRICHMENT_FIELDS = ("API_Category", "API_Brand", "API_Rating", "API_Match")
 
-                api_data = product_mapping.get(numeric_id)
+NO_MATCH = {
+    "API_Category": None,
+    "API_Brand": None,
+    "API_Rating": None,
+    "API_Match": False
+}
 
-                if api_data:
-                    txn["API_Category"] = api_data.get("category")
-                    txn["API_Brand"] = api_data.get("brand")
-                    txn["API_Rating"] = api_data.get("rating")
-                    txn["API_Match"] = True
-                else:
-                    txn["API_Category"] = None
-                    txn["API_Brand"] = None
-                    txn["API_Rating"] = None
-                    txn["API_Match"] = False
+# enrichment fields for one ProductID string
+def resolve_product_fields(product_id_str, product_mapping):
 
-            except Exception:
-                txn["API_Category"] = None
-                txn["API_Brand"] = None
-                txn["API_Rating"] = None
-                txn["API_Match"] = False
+    try:
+        # to extract numeric product ID (P101 -> 101)
+        numeric_id = int("".join(filter(str.isdigit, product_id_str)))
+        api_data = product_mapping.get(numeric_id)
+
+    except Exception:
+        return NO_MATCH
+
+    if not api_data:
+        return NO_MATCH
+
+    return {
+        "API_Category": api_data.get("category"),
+        "API_Brand": api_data.get("brand"),
+        "API_Rating": api_data.get("rating"),
+        "API_Match": True
+    }
+
+# ProductID string -> enrichment fields, each distinct ProductID is
+# resolved against the catalog once and remembered
+class EnrichmentIndex(dict):
+
+    def __init__(self, product_mapping):
+        super().__init__()
+        self.product_mapping = product_mapping
+
+    def __missing__(self, product_id_str):
+        fields = self[product_id_str] = resolve_product_fields(product_id_str, self.product_mapping)
+        return fields
+
+# pure transform, no file I/O. yields each transaction as it is enriched,
+# so it can be piped straight into save_enriched_data
+# stats (a dict) is filled with the enrichment counts for the report as rows
+# go through: total, matched and the set of failed ProductNames
+def iter_enrich_sales_data(transactions, product_mapping, index=None, stats=None):
+
+    if index is None:
+        index = EnrichmentIndex(product_mapping)
+
+    if stats is not None:
+        stats.setdefault("total", 0)
+        stats.setdefault("matched", 0)
+        failed_products = stats.setdefault("failed_products", set())
+
+    for txn in transactions:
+        try:
+            txn.update(index[txn.get("ProductID", "")])
+        except TypeError:
+            # unhashable ProductID
+            txn.update(NO_MATCH)
+
+        if stats is not None:
+            stats["total"] += 1
+            if txn["API_Match"]:
+                stats["matched"] += 1
+            else:
+                failed_products.add(txn.get("ProductName"))
+
+        yield txn
+
+# enriches a TransactionTable without touching its rows
+# the catalog is resolved once per ProductID code, then every column is a
+# single lookup by code. returns {field: list of values in row order}
+# stats is filled as in iter_enrich_sales_data, counted per code
+def enrich_table(table, product_mapping, index=None, stats=None):
+
+    if index is None:
+        index = EnrichmentIndex(product_mapping)
+
+    resolved = [index[product_id] for product_id in table.dictionaries["ProductID"]]
+    product_codes = table.codes["ProductID"]
+
+    columns = {}
+    for field in ENRICHMENT_FIELDS:
+        by_code = [fields[field] for fields in resolved]
+        columns[field] = [by_code[code] for code in product_codes]
+
+    if stats is not None:
+        stats.setdefault("total", 0)
+        stats.setdefault("matched", 0)
+        failed_products = stats.setdefault("failed_products", set())
+
+        stats["total"] += len(table)
+        stats["matched"] += sum(columns["API_Match"])
+        product_names = table.dictionaries["ProductName"]
+        name_codes = table.codes["ProductName"]
+        failed_products.update(
+            product_names[name_codes[i]]
+            for i, match in enumerate(columns["API_Match"]) if not match
+        )
+
+    return columns
+
+@instrument()
+def enrich_sales_data(transactions, product_mapping, stats=None):
+
+    return list(iter_enrich_sales_data(transactions, product_mapping, stats=stats))
+
+# one output line, None written as an empty field
+def format_enriched_line(txn):
+
+    return format_enriched_values(map(txn.get, ENRICHED_COLUMNS))
+
+# one output line from the values in ENRICHED_COLUMNS order
+def format_enriched_values(values):
+
+    return "|".join([
+        "" if value is None else str(value)
+        for value in values
+    ]) + "\n"
 
-            enriched_transactions.append(txn)
+# to save enriched data
+# accepts a list or any iterable of enriched transactions and writes every
+# row exactly once, in batches through one buffered file
+@instrument(rows_out=None)
+def save_enriched_data(enriched_transactions, filename='data/enriched_sales_data.txt',
+                       batch_size=10000):
 
-            # to write enriched transaction to file
-            line = (
-                f"{txn.get('TransactionID')}|{txn.get('Date')}|{txn.get('ProductID')}|"
-                f"{txn.get('ProductName')}|{txn.get('Quantity')}|{txn.get('UnitPrice')}|"
-                f"{txn.get('CustomerID')}|{txn.get('Region')}|"
-                f"{txn.get('API_Category')}|{txn.get('API_Brand')}|"
-                f"{txn.get('API_Rating')}|{txn.get('API_Match')}\n"
-            )
+    written = iter_written_rows(enriched_transactions, format_enriched_line, filename, batch_size)
+    return sum(1 for _ in written)
 
-            f.write(line)
+# save_enriched_data as a pass-through for streaming pipelines: every
+# transaction is written and then yielded on (e.g. into the aggregation).
+# the file is complete once the returned iterator is exhausted
+def iter_save_enriched_data(enriched_transactions, filename='data/enriched_sales_data.txt',
+                            batch_size=10000):
 
-    print(f"enriched sales data saved to {output_file}")
+    return iter_written_rows(enriched_transactions, format_enriched_line, filename, batch_size)
 
-    return enriched_transactions
+# saves a TransactionTable with the columns from enrich_table, row by row
+# straight from the columns, no transaction dicts are built
+@instrument(rows_out=None)
+def save_enriched_table(table, enrichment_columns, filename='data/enriched_sales_data.txt',
+                        batch_size=10000):
 
-# to save enriched data
+    columns = [table.column(name) for name in ENRICHED_COLUMNS if name not in ENRICHMENT_FIELDS]
+    columns += [enrichment_columns[name] for name in ENRICHMENT_FIELDS]
+
+    written = iter_written_rows(zip(*columns), format_enriched_values, filename, batch_size)
+    return sum(1 for _ in written)
 
-def save_enriched_data(enriched_transactions, filename='data/enriched_sales_data.txt'):
-   
+# writes the header and format_line(row) of every row, yielding each row
+def iter_written_rows(rows, format_line, filename, batch_size):
 
     # to ensure directory exists
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-
-    header = (
-        "TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region|"
-        "API_Category|API_Brand|API_Rating|API_Match\n"
-    )
-
-    with open(filename, "w", encoding="utf-8") as file:
-        file.write(header)
-
-        for txn in enriched_transactions:
-            # replacing None with empty string
-            def safe(value):
-                return "" if value is None else str(value)
-
-            line = (
-                f"{safe(txn.get('TransactionID'))}|"
-                f"{safe(txn.get('Date'))}|"
-                f"{safe(txn.get('ProductID'))}|"
-                f"{safe(txn.get('ProductName'))}|"
-                f"{safe(txn.get('Quantity'))}|"
-                f"{safe(txn.get('UnitPrice'))}|"
-                f"{safe(txn.get('CustomerID'))}|"
-                f"{safe(txn.get('Region'))}|"
-                f"{safe(txn.get('API_Category'))}|"
-                f"{safe(txn.get('API_Brand'))}|"
-                f"{safe(txn.get('API_Rating'))}|"
-                f"{safe(txn.get('API_Match'))}\n"
-            )
-
-            file.write(line)
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
 
-    print(f"enriched data successfully saved to {filename}")
+    with open(filename, "w", encoding="utf-8", buffering=1 << 20) as file:
+        file.write("|".join(ENRICHED_COLUMNS) + "\n")
 
+        batch = []
+        for row in rows:
+            batch.append(format_line(row))
+            if len(batch) >= batch_size:
+                file.writelines(batch)
+                batch = []
+            yield row
 
+        file.writelines(batch)
+
+    print(f"enriched data successfully saved to {filename}")
@@ -0,0 +1,243 @@
+# pre-aggregated sales cube over Region x ProductName x CustomerID x Date
+# built in one pass over validated transactions. the base cells hold the
+# revenue, quantity and transaction count of every combination that occurs;
+# coarser group-bys are materialized on demand and reused for roll-ups and
+# drill-downs. for amount slices only each row's amount, quantity and cell
+# are kept (in flat arrays); the first amount slice over a group-by sorts
+# the amounts of each group once, later slices are a bisect per group
+
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+
+DIMENSIONS = ("Region", "ProductName", "CustomerID", "Date")
+METRICS = ("revenue", "quantity", "transaction_count")
+
+
+class SalesCube:
+
+    def __init__(self, transactions):
+
+        # (region, product, customer, date) -> [revenue, quantity, count, cell number]
+        cells = {}
+
+        # per row, for amount slices
+        self.row_cells = array("i")
+        self.row_amounts = array("d")
+        self.row_quantities = array("q")
+
+        for tx in transactions:
+            try:
+                quantity = tx["Quantity"]
+                amount = quantity * tx["UnitPrice"]
+            except (KeyError, TypeError):
+                # skip transactions with missing or invalid data
+                continue
+
+            key = (tx.get("Region"), tx.get("ProductName"), tx.get("CustomerID"), tx.get("Date"))
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0.0, 0, 0, len(cells)]
+            cell[0] += amount
+            cell[1] += quantity
+            cell[2] += 1
+
+            self.row_cells.append(cell[3])
+            self.row_amounts.append(amount)
+            self.row_quantities.append(quantity)
+
+        self.cells = cells
+
+        # dimension tuple (in DIMENSIONS order) -> {key: [revenue, quantity, count]}
+        self.cuboids = {}
+
+        # dimension tuple -> {key: (sorted amounts, revenue prefix sums,
+        # quantity prefix sums, nan rows)}, built on the first amount slice over it
+        self.amount_indexes = {}
+
+    # dimension names in cube order, ValueError for unknown ones
+    @staticmethod
+    def canonical(dimensions):
+
+        unknown = set(dimensions) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"unknown dimensions: {sorted(unknown)}")
+        return tuple(name for name in DIMENSIONS if name in dimensions)
+
+    # group-by over the given dimensions, built from the smallest already
+    # materialized group-by that contains them (roll-up), else the base cells
+    def materialize(self, dimensions):
+
+        dimensions = self.canonical(dimensions)
+        if dimensions in self.cuboids:
+            return self.cuboids[dimensions]
+
+        source_dimensions, source = DIMENSIONS, self.cells
+        for candidate, cuboid in self.cuboids.items():
+            if set(dimensions) <= set(candidate) and len(cuboid) < len(source):
+                source_dimensions, source = candidate, cuboid
+
+        positions = [source_dimensions.index(name) for name in dimensions]
+        cuboid = {}
+
+        for key, cell in source.items():
+            group = tuple(key[i] for i in positions)
+            totals = cuboid.get(group)
+            if totals is None:
+                totals = cuboid[group] = [0.0, 0, 0]
+            totals[0] += cell[0]
+            totals[1] += cell[1]
+            totals[2] += cell[2]
+
+        self.cuboids[dimensions] = cuboid
+        return cuboid
+
+    # per group of the given dimensions: its row amounts in ascending order
+    # and prefix sums of revenue and quantity in the same order, so the
+    # totals of any amount range are two bisects and two subtractions.
+    # rows with a nan amount cannot be ordered; validate_and_filter keeps
+    # them in every amount range, so their (revenue, quantity, count) is
+    # kept aside (None when there are none) and added to every range
+    def amount_index(self, dimensions):
+
+        dimensions = self.canonical(dimensions)
+        if dimensions in self.amount_indexes:
+            return self.amount_indexes[dimensions]
+
+        positions = [DIMENSIONS.index(name) for name in dimensions]
+        cell_groups = [None] * len(self.cells)
+        for key, cell in self.cells.items():
+            cell_groups[cell[3]] = tuple(key[i] for i in positions)
+
+        rows = {}
+        for cell_number, amount, quantity in zip(self.row_cells, self.row_amounts, self.row_quantities):
+            group = cell_groups[cell_number]
+            group_rows = rows.get(group)
+            if group_rows is None:
+                group_rows = rows[group] = []
+            group_rows.append((amount, quantity))
+
+        index = {}
+        for group, group_rows in rows.items():
+            nan_rows = None
+            if any(amount != amount for amount, _ in group_rows):
+                nan_quantities = [quantity for amount, quantity in group_rows if amount != amount]
+                nan_rows = (float("nan"), sum(nan_quantities), len(nan_quantities))
+                group_rows = [row for row in group_rows if row[0] == row[0]]
+
+            group_rows.sort()
+            amounts = array("d", [amount for amount, _ in group_rows])
+            revenue = array("d", [0.0])
+            quantity = array("q", [0])
+            for amount, row_quantity in group_rows:
+                revenue.append(revenue[-1] + amount)
+                quantity.append(quantity[-1] + row_quantity)
+            index[group] = (amounts, revenue, quantity, nan_rows)
+
+        self.amount_indexes[dimensions] = index
+        return index
+
+    # revenue / quantity / count per combination of `by`, e.g.
+    #   query(("Region", "Date"))                            revenue per region per day
+    #   query(("ProductName",), region="North",
+    #         start_date="2024-12-01", end_date="2024-12-07") drill into one region and week
+    # where maps a dimension to a value or a set of values. region, min_amount
+    # and max_amount slice like validate_and_filter; dates are inclusive ISO strings
+    def query(self, by=(), where=None, region=None, min_amount=None, max_amount=None,
+              start_date=None, end_date=None):
+
+        by = tuple(by)
+        self.canonical(by)
+
+        where = dict(where or {})
+        if region:
+            where["Region"] = region
+        filtered = set(where)
+        if start_date is not None or end_date is not None:
+            filtered.add("Date")
+
+        check_amount = min_amount is not None or max_amount is not None
+
+        # answered from the smallest group-by that has the needed dimensions,
+        # or its amount index for amount slices
+        source_dimensions = self.canonical(set(by) | filtered)
+        if check_amount:
+            source = self.amount_index(source_dimensions)
+        else:
+            source = self.materialize(source_dimensions)
+
+        checks = []
+        for name, value in where.items():
+            values = set(value) if isinstance(value, (set, frozenset, list, tuple)) else {value}
+            checks.append((source_dimensions.index(self.canonical((name,))[0]), values))
+
+        date_position = source_dimensions.index("Date") if "Date" in filtered else None
+        positions = [source_dimensions.index(name) for name in by]
+        result = {}
+
+        for key, cell in source.items():
+            if not all(key[position] in values for position, values in checks):
+                continue
+
+            if date_position is not None:
+                date = key[date_position]
+                if date is None or (start_date is not None and date < start_date) or \
+                        (end_date is not None and date > end_date):
+                    continue
+
+            if check_amount:
+                amounts, revenue_prefix, quantity_prefix, nan_rows = cell
+                start = bisect_left(amounts, min_amount) if min_amount is not None else 0
+                end = max(bisect_right(amounts, max_amount) if max_amount is not None else len(amounts), start)
+                revenue = revenue_prefix[end] - revenue_prefix[start]
+                quantity = quantity_prefix[end] - quantity_prefix[start]
+                count = end - start
+                if nan_rows is not None:
+                    revenue += nan_rows[0]
+                    quantity += nan_rows[1]
+                    count += nan_rows[2]
+                if count <= 0:
+                    continue
+            else:
+                revenue, quantity, count = cell[0], cell[1], cell[2]
+
+            group = tuple(key[i] for i in positions)
+            totals = result.get(group)
+            if totals is None:
+                totals = result[group] = [0.0, 0, 0]
+            totals[0] += revenue
+            totals[1] += quantity
+            totals[2] += count
+
+        return {
+            group: {
+                "revenue": round(revenue, 2),
+                "quantity": quantity,
+                "transaction_count": count
+            }
+            for group, (revenue, quantity, count) in result.items()
+        }
+
+    # grand totals of a slice
+    def totals(self, **filters):
+
+        return self.query((), **filters).get((), {
+            "revenue": 0.0,
+            "quantity": 0,
+            "transaction_count": 0
+        })
+
+    # the n biggest groups of `by` by metric, e.g.
+    #   top("ProductName", metric="quantity", region="North", start_date=..., end_date=...)
+    def top(self, by, n=5, metric="revenue", **filters):
+
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric: {metric}")
+
+        by = (by,) if isinstance(by, str) else tuple(by)
+        groups = self.query(by, **filters)
+
+        return [
+            (group[0] if len(by) == 1 else group, stats)
+            for group, stats in heapq.nlargest(n, groups.items(), key=lambda item: item[1][metric])
+        ]
@@ -1,53 +1,298 @@
 # sales analysis
 
-#to calculate total revenue
-def calculate_total_revenue(transactions):
-    
-    total_revenue = 0.0
+import heapq
+
+from utils.transaction_table import TransactionTable
+from utils.sketches import HyperLogLog, SpaceSaving, QuantileSketch
+from utils.instrumentation import instrument
+
+# the numpy backend is optional, returns None when numpy is missing
+def load_numpy_backend():
+
+    try:
+        from utils import numpy_backend
+    except ImportError:
+        print("numpy is not installed, using the python backend")
+        return None
+
+    return numpy_backend
+
+
+# single pass aggregation engine
+# every analysis below is a view over the accumulators built here,
+# so the transactions are walked (and Quantity * UnitPrice computed) only once
+# pass existing aggregates to keep accumulating into them (in place)
+@instrument(rows_out=None)
+def aggregate_transactions(transactions, backend="python", aggregates=None):
+
+    if backend not in ("python", "numpy"):
+        raise ValueError(f"unknown backend: {backend}")
+
+    columnar = isinstance(transactions, TransactionTable)
+    result = None
+
+    if backend == "numpy":
+        numpy_backend = load_numpy_backend()
+        if numpy_backend is not None:
+            result = numpy_backend.aggregate_numpy(transactions)
+
+    if result is None and columnar:
+        result = aggregate_table(transactions)
+
+    if result is not None:
+        if aggregates is None:
+            return result
+        return merge_aggregates(aggregates, result)
+
+    if aggregates is None:
+        aggregates = empty_aggregates()
+
+    total_revenue = aggregates["total_revenue"]
+    region_total = aggregates["region_total"]
+
+    region_stats = aggregates["regions"]
+    product_stats = aggregates["products"]
+    customer_stats = aggregates["customers"]
+    daily_stats = aggregates["daily"]
 
     for tx in transactions:
         try:
-            total_revenue += tx["Quantity"] * tx["UnitPrice"]
+            quantity = tx["Quantity"]
+            sale_amount = quantity * tx["UnitPrice"]
+            total_revenue += sale_amount
         except (KeyError, TypeError):
             # skip transactions with missing or invalid data
             continue
 
-    return round(total_revenue, 2)
+        region = tx.get("Region")
+        product = tx.get("ProductName")
+        customer_id = tx.get("CustomerID")
+        date = tx.get("Date")
 
+        if region is not None:
+            region_total += sale_amount
 
-# for region wise sales analysis
-def region_wise_sales(transactions):
-    
-    region_stats = {}
-    grand_total_sales = 0.0
+            stats = region_stats.get(region)
+            if stats is None:
+                stats = region_stats[region] = {
+                    "total_sales": 0.0,
+                    "transaction_count": 0
+                }
+            stats["total_sales"] += sale_amount
+            stats["transaction_count"] += 1
 
-    for tx in transactions:
-        try:
-            region = tx["Region"]
-            sale_amount = tx["Quantity"] * tx["UnitPrice"]
+        if product is not None:
+            stats = product_stats.get(product)
+            if stats is None:
+                stats = product_stats[product] = {
+                    "total_quantity": 0,
+                    "total_revenue": 0.0
+                }
+            stats["total_quantity"] += quantity
+            stats["total_revenue"] += sale_amount
+
+            if customer_id is not None:
+                stats = customer_stats.get(customer_id)
+                if stats is None:
+                    stats = customer_stats[customer_id] = {
+                        "total_spent": 0.0,
+                        "purchase_count": 0,
+                        "products_bought": set()
+                    }
+                stats["total_spent"] += sale_amount
+                stats["purchase_count"] += 1
+                stats["products_bought"].add(product)
+
+        if date is not None:
+            stats = daily_stats.get(date)
+            if stats is None:
+                stats = daily_stats[date] = {
+                    "revenue": 0.0,
+                    "transaction_count": 0,
+                    "unique_customers": set()
+                }
+            stats["revenue"] += sale_amount
+            stats["transaction_count"] += 1
+            if customer_id is not None:
+                stats["unique_customers"].add(customer_id)
 
-            grand_total_sales += sale_amount
+    aggregates["total_revenue"] = total_revenue
+    aggregates["region_total"] = region_total
 
-            if region not in region_stats:
-                region_stats[region] = {
-                    "total_sales": 0.0,
-                    "transaction_count": 0
+    return aggregates
+
+
+def empty_aggregates():
+
+    return {
+        "total_revenue": 0.0,
+        "region_total": 0.0,
+        "regions": {},
+        "products": {},
+        "customers": {},
+        "daily": {}
+    }
+
+
+# adds the accumulators of source into target (in place) and returns target
+# each group sum becomes (target + source), so the last bits can differ
+# from aggregating all rows in one sequential pass
+def merge_aggregates(target, source):
+
+    target["total_revenue"] += source["total_revenue"]
+    target["region_total"] += source["region_total"]
+
+    for section in ("regions", "products", "customers", "daily"):
+        target_groups = target[section]
+
+        for key, stats in source[section].items():
+            current = target_groups.get(key)
+            if current is None:
+                target_groups[key] = {
+                    name: set(value) if isinstance(value, set) else value
+                    for name, value in stats.items()
                 }
+                continue
+
+            for name, value in stats.items():
+                if isinstance(value, set):
+                    current[name] |= value
+                else:
+                    current[name] += value
+
+    return target
+
+
+# aggregate_transactions for a TransactionTable
+# accumulates into lists indexed by the column codes, then decodes once
+def aggregate_table(table):
+
+    dictionaries = table.dictionaries
+    codes = table.codes
+
+    region_sales = [0.0] * len(dictionaries["Region"])
+    region_count = [0] * len(dictionaries["Region"])
+    product_quantity = [0] * len(dictionaries["ProductName"])
+    product_revenue = [0.0] * len(dictionaries["ProductName"])
+    product_count = [0] * len(dictionaries["ProductName"])
+    customer_spent = [0.0] * len(dictionaries["CustomerID"])
+    customer_count = [0] * len(dictionaries["CustomerID"])
+    customer_products = [None] * len(dictionaries["CustomerID"])
+    daily_revenue = [0.0] * len(dictionaries["Date"])
+    daily_count = [0] * len(dictionaries["Date"])
+    daily_customers = [None] * len(dictionaries["Date"])
+
+    # codes in order of first appearance, to keep the dict ordering
+    region_order = []
+    product_order = []
+    customer_order = []
+    date_order = []
 
-            region_stats[region]["total_sales"] += sale_amount
-            region_stats[region]["transaction_count"] += 1
+    total_revenue = 0.0
 
-        except (KeyError, TypeError):
-            # skip invalid records
-            continue
+    for quantity, unit_price, region, product, customer_id, date in zip(
+        table.quantity, table.unit_price, codes["Region"],
+        codes["ProductName"], codes["CustomerID"], codes["Date"]
+    ):
+        sale_amount = quantity * unit_price
+        total_revenue += sale_amount
+
+        if not region_count[region]:
+            region_order.append(region)
+        region_sales[region] += sale_amount
+        region_count[region] += 1
+
+        if not product_count[product]:
+            product_order.append(product)
+        product_count[product] += 1
+        product_quantity[product] += quantity
+        product_revenue[product] += sale_amount
+
+        if customer_products[customer_id] is None:
+            customer_products[customer_id] = set()
+            customer_order.append(customer_id)
+        customer_spent[customer_id] += sale_amount
+        customer_count[customer_id] += 1
+        customer_products[customer_id].add(product)
+
+        if daily_customers[date] is None:
+            daily_customers[date] = set()
+            date_order.append(date)
+        daily_revenue[date] += sale_amount
+        daily_count[date] += 1
+        daily_customers[date].add(customer_id)
+
+    regions = dictionaries["Region"]
+    products = dictionaries["ProductName"]
+    customers = dictionaries["CustomerID"]
+    dates = dictionaries["Date"]
+
+    return {
+        "total_revenue": total_revenue,
+        "region_total": total_revenue,
+        "regions": {
+            regions[code]: {
+                "total_sales": region_sales[code],
+                "transaction_count": region_count[code]
+            }
+            for code in region_order
+        },
+        "products": {
+            products[code]: {
+                "total_quantity": product_quantity[code],
+                "total_revenue": product_revenue[code]
+            }
+            for code in product_order
+        },
+        "customers": {
+            customers[code]: {
+                "total_spent": customer_spent[code],
+                "purchase_count": customer_count[code],
+                "products_bought": {products[p] for p in customer_products[code]}
+            }
+            for code in customer_order
+        },
+        "daily": {
+            dates[code]: {
+                "revenue": daily_revenue[code],
+                "transaction_count": daily_count[code],
+                "unique_customers": {customers[c] for c in daily_customers[code]}
+            }
+            for code in date_order
+        }
+    }
+
+
+#to calculate total revenue
+@instrument()
+def calculate_total_revenue(transactions, aggregates=None):
+
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions)
+
+    return round(aggregates["total_revenue"], 2)
+
+
+# for region wise sales analysis
+@instrument()
+def region_wise_sales(transactions, aggregates=None):
+
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions)
+
+    grand_total_sales = aggregates["region_total"]
+    region_stats = {}
 
     #calculate percentage
-    for region in region_stats:
-        total_sales = region_stats[region]["total_sales"]
+    for region, stats in aggregates["regions"].items():
+        total_sales = stats["total_sales"]
         percentage = (total_sales / grand_total_sales) * 100 if grand_total_sales > 0 else 0
 
-        region_stats[region]["percentage"] = round(percentage, 2)
-        region_stats[region]["total_sales"] = round(total_sales, 2)
+        region_stats[region] = {
+            "total_sales": round(total_sales, 2),
+            "transaction_count": stats["transaction_count"],
+            "percentage": round(percentage, 2)
+        }
 
     # sorting
     sorted_region_stats = dict(
@@ -61,40 +306,36 @@ def region_wise_sales(transactions):
     return sorted_region_stats
 
 # for top selling products
-def top_selling_products(transactions, n=5):
-
-    product_stats = {}
-
-    for tx in transactions:
-        try:
-            product = tx["ProductName"]
-            quantity = tx["Quantity"]
-            revenue = quantity * tx["UnitPrice"]
-
-            if product not in product_stats:
-                product_stats[product] = {
-                    "total_quantity": 0,
-                    "total_revenue": 0.0
-                }
-
-            product_stats[product]["total_quantity"] += quantity
-            product_stats[product]["total_revenue"] += revenue
-
-        except (KeyError, TypeError):
-            # skip invalid records
-            continue
-
-    #sorting
-    sorted_products = sorted(
-        product_stats.items(),
-        key=lambda item: item[1]["total_quantity"],
-        reverse=True
-    )
+# uses a bounded heap for the top n; full_sort=True sorts every product
+@instrument()
+def top_selling_products(transactions, n=5, aggregates=None, backend="python", full_sort=False):
+
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions, backend=backend)
+
+    if backend == "numpy":
+        numpy_backend = load_numpy_backend()
+        if numpy_backend is not None:
+            return numpy_backend.top_products_numpy(aggregates["products"], n)
+
+    # nlargest keeps ties in the same order as a stable sort
+    if full_sort or n is None or n < 0:
+        sorted_products = sorted(
+            aggregates["products"].items(),
+            key=lambda item: item[1]["total_quantity"],
+            reverse=True
+        )[:n]
+    else:
+        sorted_products = heapq.nlargest(
+            n,
+            aggregates["products"].items(),
+            key=lambda item: item[1]["total_quantity"]
+        )
 
     #to display top N
     top_products = []
 
-    for product, stats in sorted_products[:n]:
+    for product, stats in sorted_products:
         top_products.append((
             product,
             stats["total_quantity"],
@@ -105,44 +346,45 @@ def top_selling_products(transactions, n=5):
 
 #customer analysis
 
-def customer_analysis(transactions):
-    
-    customer_stats = {}
+# top_n returns only the n biggest spenders, picked with a bounded heap
+# and without building the stats of every other customer
+@instrument()
+def customer_analysis(transactions, aggregates=None, top_n=None):
 
-    
-    for tx in transactions:
-        try:
-            customer_id = tx["CustomerID"]
-            product = tx["ProductName"]
-            order_value = tx["Quantity"] * tx["UnitPrice"]
-
-            if customer_id not in customer_stats:
-                customer_stats[customer_id] = {
-                    "total_spent": 0.0,
-                    "purchase_count": 0,
-                    "products_bought": set()
-                }
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions)
 
-            customer_stats[customer_id]["total_spent"] += order_value
-            customer_stats[customer_id]["purchase_count"] += 1
-            customer_stats[customer_id]["products_bought"].add(product)
+    customers = aggregates["customers"].items()
+    if top_n is not None:
+        customers = heapq.nlargest(
+            max(top_n, 0),
+            customers,
+            key=lambda item: round(item[1]["total_spent"], 2)
+        )
 
-        except (KeyError, TypeError):
-            # skip invalid records
-            continue
+    customer_stats = {}
 
     # customer calculations
-    for customer_id in customer_stats:
-        total_spent = customer_stats[customer_id]["total_spent"]
-        purchase_count = customer_stats[customer_id]["purchase_count"]
+    for customer_id, stats in customers:
+        total_spent = stats["total_spent"]
+        purchase_count = stats["purchase_count"]
 
         avg_order_value = total_spent / purchase_count if purchase_count > 0 else 0
 
-        customer_stats[customer_id]["avg_order_value"] = round(avg_order_value, 2)
-        customer_stats[customer_id]["total_spent"] = round(total_spent, 2)
-        customer_stats[customer_id]["products_bought"] = sorted(
-            list(customer_stats[customer_id]["products_bought"])
-        )
+        entry = {
+            "total_spent": round(total_spent, 2),
+            "purchase_count": purchase_count
+        }
+        # approximate aggregates keep no products_bought sets
+        if "products_bought" in stats:
+            entry["products_bought"] = sorted(stats["products_bought"])
+        entry["avg_order_value"] = round(avg_order_value, 2)
+
+        customer_stats[customer_id] = entry
+
+    # already in order when picked from the heap
+    if top_n is not None:
+        return customer_stats
 
     # sorting
     sorted_customers = dict(
@@ -156,37 +398,21 @@ def customer_analysis(transactions):
     return sorted_customers
 
 #for daily sales  
-def daily_sales_trend(transactions):
-    
-    daily_stats = {}
-
-    for tx in transactions:
-        try:
-            date = tx["Date"]
-            customer_id = tx["CustomerID"]
-            revenue = tx["Quantity"] * tx["UnitPrice"]
-
-            if date not in daily_stats:
-                daily_stats[date] = {
-                    "revenue": 0.0,
-                    "transaction_count": 0,
-                    "unique_customers": set()
-                }
+@instrument()
+def daily_sales_trend(transactions, aggregates=None):
 
-            daily_stats[date]["revenue"] += revenue
-            daily_stats[date]["transaction_count"] += 1
-            daily_stats[date]["unique_customers"].add(customer_id)
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions)
 
-        except (KeyError, TypeError):
-            # skip invalid records
-            continue
+    daily_stats = {}
 
     #formating
-    for date in daily_stats:
-        daily_stats[date]["revenue"] = round(daily_stats[date]["revenue"], 2)
-        daily_stats[date]["unique_customers"] = len(
-            daily_stats[date]["unique_customers"]
-        )
+    for date, stats in aggregates["daily"].items():
+        daily_stats[date] = {
+            "revenue": round(stats["revenue"], 2),
+            "transaction_count": stats["transaction_count"],
+            "unique_customers": len(stats["unique_customers"])
+        }
 
     #sorting chronologically
     sorted_daily_stats = dict(sorted(daily_stats.items()))
@@ -194,28 +420,17 @@ def daily_sales_trend(transactions):
     return sorted_daily_stats
 
 # to find peak sales days 
-def find_peak_sales_day(transactions):
-    
-    daily_summary = {}
+# without aggregates the peak is tracked while scanning, no full aggregation
+@instrument(rows_out=None)
+def find_peak_sales_day(transactions, aggregates=None):
 
-    #aggregating
-    for tx in transactions:
-        try:
-            date = tx["Date"]
-            revenue = tx["Quantity"] * tx["UnitPrice"]
-
-            if date not in daily_summary:
-                daily_summary[date] = {
-                    "revenue": 0.0,
-                    "transaction_count": 0
-                }
+    if aggregates is None:
+        if isinstance(transactions, TransactionTable):
+            aggregates = aggregate_table(transactions)
+        else:
+            return running_peak_sales_day(transactions)
 
-            daily_summary[date]["revenue"] += revenue
-            daily_summary[date]["transaction_count"] += 1
-
-        except (KeyError, TypeError):
-            # skip malformed records
-            continue
+    daily_summary = aggregates["daily"]
 
     if not daily_summary:
         return None, 0.0, 0
@@ -233,49 +448,226 @@ def find_peak_sales_day(transactions):
     )
 
 
-# to filter out low performing products
-def low_performing_products(transactions, threshold=10):
-    
-    product_stats = {}
+# single scan with a running max of the daily revenue
+def running_peak_sales_day(transactions):
+
+    # date -> [revenue, transaction_count, first seen position]
+    daily_summary = {}
+    peak = None
+    monotone = True
 
-    #aggregating
     for tx in transactions:
         try:
-            product = tx["ProductName"]
-            quantity = tx["Quantity"]
-            revenue = quantity * tx["UnitPrice"]
-
-            if product not in product_stats:
-                product_stats[product] = {
-                    "total_quantity": 0,
-                    "total_revenue": 0.0
-                }
-
-            product_stats[product]["total_quantity"] += quantity
-            product_stats[product]["total_revenue"] += revenue
-
+            date = tx["Date"]
+            revenue = tx["Quantity"] * tx["UnitPrice"]
         except (KeyError, TypeError):
             # skip malformed records
             continue
 
+        day = daily_summary.get(date)
+        if day is None:
+            day = daily_summary[date] = [0.0, 0, len(daily_summary)]
+
+        day[0] += revenue
+        day[1] += 1
+
+        # the running max is exact while daily revenue only grows
+        if revenue <= 0:
+            monotone = False
+        elif peak is None or day[0] > peak[0] or (day[0] == peak[0] and day[2] < peak[2]):
+            peak = day
+            peak_date = date
+
+    if not daily_summary:
+        return None, 0.0, 0
+
+    if not monotone or peak is None:
+        peak_date, peak = max(daily_summary.items(), key=lambda item: item[1][0])
+
+    return peak_date, round(peak[0], 2), peak[1]
+
+
+# to filter out low performing products
+# n returns only the n lowest, picked with a bounded heap
+@instrument()
+def low_performing_products(transactions, threshold=10, aggregates=None, backend="python", n=None):
+
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions, backend=backend)
+
+    if backend == "numpy":
+        numpy_backend = load_numpy_backend()
+        if numpy_backend is not None:
+            low_performers = numpy_backend.low_products_numpy(aggregates["products"], threshold)
+            return low_performers if n is None else low_performers[:n]
+
     # filtering
-    low_performers = [
+    low_performers = (
+        (product, stats)
+        for product, stats in aggregates["products"].items()
+        if stats["total_quantity"] < threshold
+    )
+
+    # sorting
+    if n is None or n < 0:
+        low_performers = sorted(low_performers, key=lambda item: item[1]["total_quantity"])[:n]
+    else:
+        low_performers = heapq.nsmallest(n, low_performers, key=lambda item: item[1]["total_quantity"])
+
+    return [
         (
             product,
             stats["total_quantity"],
             round(stats["total_revenue"], 2)
         )
-        for product, stats in product_stats.items()
-        if stats["total_quantity"] < threshold
+        for product, stats in low_performers
     ]
 
-    # sorting
-    low_performers.sort(key=lambda x: x[1])
 
-    return low_performers
+# approximate mode
+# the same aggregates as aggregate_transactions minus the exact distinct
+# sets, which grow with the data: a HyperLogLog per day stands in for its
+# set of unique customers and customers keep no set of products bought.
+# every other accumulator is a scalar, so memory per group is fixed and the
+# views and the report work on the result unchanged. alongside: Space-Saving
+# counters for top products and customers and a quantile sketch for the
+# transaction amounts, every estimate with its error bound
+@instrument(rows_out=None)
+def approximate_aggregates(transactions, hll_precision=10, heavy_hitters=100,
+                           relative_accuracy=0.01):
+
+    region_stats = {}
+    product_stats = {}
+    customer_stats = {}
+    daily_stats = {}
+    product_sketch = SpaceSaving(heavy_hitters)
+    customer_sketch = SpaceSaving(heavy_hitters)
+    amounts = QuantileSketch(relative_accuracy)
+    total_revenue = 0.0
+    region_total = 0.0
+
+    for tx in transactions:
+        try:
+            quantity = tx["Quantity"]
+            sale_amount = quantity * tx["UnitPrice"]
+            total_revenue += sale_amount
+        except (KeyError, TypeError):
+            # skip transactions with missing or invalid data
+            continue
+
+        amounts.add(sale_amount)
+
+        region = tx.get("Region")
+        product = tx.get("ProductName")
+        customer_id = tx.get("CustomerID")
+        date = tx.get("Date")
 
+        if region is not None:
+            region_total += sale_amount
+
+            stats = region_stats.get(region)
+            if stats is None:
+                stats = region_stats[region] = {
+                    "total_sales": 0.0,
+                    "transaction_count": 0
+                }
+            stats["total_sales"] += sale_amount
+            stats["transaction_count"] += 1
+
+        if product is not None:
+            product_sketch.add(product, quantity)
+
+            stats = product_stats.get(product)
+            if stats is None:
+                stats = product_stats[product] = {
+                    "total_quantity": 0,
+                    "total_revenue": 0.0
+                }
+            stats["total_quantity"] += quantity
+            stats["total_revenue"] += sale_amount
+
+            if customer_id is not None:
+                customer_sketch.add(customer_id, sale_amount)
+
+                stats = customer_stats.get(customer_id)
+                if stats is None:
+                    stats = customer_stats[customer_id] = {
+                        "total_spent": 0.0,
+                        "purchase_count": 0
+                    }
+                stats["total_spent"] += sale_amount
+                stats["purchase_count"] += 1
+
+        if date is not None:
+            stats = daily_stats.get(date)
+            if stats is None:
+                stats = daily_stats[date] = {
+                    "revenue": 0.0,
+                    "transaction_count": 0,
+                    "unique_customers": HyperLogLog(hll_precision)
+                }
+            stats["revenue"] += sale_amount
+            stats["transaction_count"] += 1
+            if customer_id is not None:
+                stats["unique_customers"].add(customer_id)
+
+    return {
+        "total_revenue": total_revenue,
+        "region_total": region_total,
+        "regions": region_stats,
+        "products": product_stats,
+        "customers": customer_stats,
+        "daily": daily_stats,
+        "product_sketch": product_sketch,
+        "customer_sketch": customer_sketch,
+        "amounts": amounts
+    }
+
+
+# daily_sales_trend with estimated unique customers
+# unique_customers_error is the relative standard error of the estimate
+def approximate_daily_sales_trend(approximate):
+
+    daily_stats = {}
+
+    for date, stats in sorted(approximate["daily"].items()):
+        sketch = stats["unique_customers"]
+        daily_stats[date] = {
+            "revenue": round(stats["revenue"], 2),
+            "transaction_count": stats["transaction_count"],
+            "unique_customers": len(sketch),
+            "unique_customers_error": round(sketch.relative_error, 4)
+        }
+
+    return daily_stats
+
+
+# (product, estimated quantity, max overestimate)
+# the true quantity lies in [quantity - error, quantity]
+def approximate_top_products(approximate, n=5):
+    return approximate["product_sketch"].top(n)
+
+
+# (customer, estimated total spent, max overestimate)
+def approximate_top_customers(approximate, n=5):
+
+    return [
+        (customer_id, round(spent, 2), round(error, 2))
+        for customer_id, spent, error in approximate["customer_sketch"].top(n)
+    ]
 
 
+# exact min / max plus quantiles within relative_error of the true value
+def approximate_amount_range(approximate, quantiles=(0.01, 0.5, 0.99)):
 
+    sketch = approximate["amounts"] if isinstance(approximate, dict) else approximate
 
+    result = {
+        "min": sketch.min if sketch.min is not None else 0,
+        "max": sketch.max if sketch.max is not None else 0,
+        "relative_error": sketch.relative_accuracy
+    }
+    for q in quantiles:
+        result[f"p{round(q * 100):02d}"] = sketch.quantile(q)
 
+    return result
@@ -0,0 +1,229 @@
+# multi-file sales datasets
+# a dataset is a directory, a glob or a single file; files can be plain or
+# gzip / bz2 / xz compressed. files are scanned in parallel (one process per
+# file), each into its own aggregates, which are then merged in file order,
+# so no rows are ever concatenated.
+#
+# partitions are read from the path, hive style (region=North/date=2024-01-05/)
+# or a date in the file name (sales_2024-01-05.txt.gz). with a region or date
+# filter, files whose partition cannot match are skipped without being opened
+
+import bz2
+import glob
+import gzip
+import lzma
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from utils.file_handler import (
+    EncodingChanged,
+    iter_decoded_lines,
+    iter_parse_transactions,
+    iter_validate_and_filter
+)
+from utils.data_processor import aggregate_transactions, empty_aggregates, merge_aggregates
+from utils.validation_rules import empty_rule_counts
+
+COMPRESSED_OPENERS = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open
+}
+
+DATA_SUFFIX = ".txt"
+# a yyyy-mm-dd or yyyymmdd run of its own in the file name; only taken as a
+# partition when it is a real date, so store numbers and order ids are not
+DATE_IN_NAME = re.compile(r"(?<!\d)((?:19|20)\d{2})(-?)(\d{2})\2(\d{2})(?!\d)")
+
+
+def open_dataset_file(filename, mode="rt", encoding=None):
+
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(filename)[1].lower(), open)
+    if "b" in mode:
+        return opener(filename, mode)
+    return opener(filename, mode, encoding=encoding)
+
+
+# sales files under a directory (recursively), matching a glob, or the file itself
+def dataset_files(source):
+
+    if os.path.isdir(source):
+        files = []
+        for directory, subdirectories, names in os.walk(source):
+            subdirectories.sort()
+            for name in sorted(names):
+                base, suffix = os.path.splitext(name)
+                data_name = base if suffix.lower() in COMPRESSED_OPENERS else name
+                if data_name.endswith(DATA_SUFFIX):
+                    files.append(os.path.join(directory, name))
+        return files
+
+    if glob.has_magic(source):
+        return sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+
+    return [source] if os.path.isfile(source) else []
+
+
+# {"region": ..., "date": ...} as far as the path tells
+# dates may be partial (date=2024-01 for a month file)
+def file_partitions(filename):
+
+    partitions = {}
+    for part in filename.replace("\\", "/").split("/"):
+        key, separator, value = part.partition("=")
+        if separator and value:
+            partitions[key.lower()] = value
+
+    if "date" not in partitions:
+        name_date = date_in_name(os.path.basename(filename))
+        if name_date:
+            partitions["date"] = name_date
+
+    return partitions
+
+
+# first real date in a file name as an ISO string, None if there is none
+def date_in_name(name):
+
+    for match in DATE_IN_NAME.finditer(name):
+        year, _, month, day = match.groups()
+        try:
+            return date(int(year), int(month), int(day)).isoformat()
+        except ValueError:
+            continue
+
+    return None
+
+
+# False only when the partition rules the whole file out
+def partition_may_match(partitions, region=None, start_date=None, end_date=None):
+
+    if region and "region" in partitions and partitions["region"] != region:
+        return False
+
+    date = partitions.get("date")
+    if date:
+        # a partial date covers every date starting with it
+        if end_date is not None and date > end_date:
+            return False
+        if start_date is not None and date + "~" < start_date:
+            return False
+
+    return True
+
+
+# iter_sales_data for plain or compressed files, in one pass over the data
+def iter_dataset_file(filename, encoding=None):
+
+    try:
+        with open_dataset_file(filename, "rb") as file:
+            yield from iter_decoded_lines(file, filename, encoding)
+
+    except FileNotFoundError:
+        print(f"error: File not found -> {filename}")
+
+    except (OSError, EOFError, lzma.LZMAError) as e:
+        print(f"error: unable to read {filename}: {e}")
+
+
+# aggregates and filter counters of one file, runs in a worker process
+def scan_file(filename, region=None, min_amount=None, max_amount=None,
+              start_date=None, end_date=None):
+
+    try:
+        return scan_rows(filename, None, region, min_amount, max_amount, start_date, end_date)
+    except EncodingChanged:
+        return scan_rows(filename, "latin-1", region, min_amount, max_amount, start_date, end_date)
+
+
+def scan_rows(filename, encoding, region, min_amount, max_amount, start_date, end_date):
+
+    filter_summary = {"filtered_by_date": 0}
+    transactions = iter_validate_and_filter(
+        iter_parse_transactions(iter_dataset_file(filename, encoding)),
+        region=region,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        filter_summary=filter_summary,
+        verbose=False
+    )
+
+    if start_date is not None or end_date is not None:
+
+        def in_date_range(rows):
+            for tx in rows:
+                date = tx["Date"]
+                if (start_date is not None and date < start_date) or \
+                        (end_date is not None and date > end_date):
+                    filter_summary["filtered_by_date"] += 1
+                    continue
+                yield tx
+
+        transactions = in_date_range(transactions)
+
+    aggregates = aggregate_transactions(transactions)
+
+    # final_count is counted before the date filter
+    filter_summary["final_count"] -= filter_summary["filtered_by_date"]
+
+    return aggregates, filter_summary
+
+
+# merged aggregates (as aggregate_transactions) and filter_summary of every
+# file in the dataset. dates are ISO strings, start_date/end_date inclusive.
+# rows of pruned files are not read, so they are not in total_input
+def scan_dataset(source, region=None, min_amount=None, max_amount=None,
+                 start_date=None, end_date=None, workers=None):
+
+    files = dataset_files(source)
+    selected = [
+        filename for filename in files
+        if partition_may_match(file_partitions(filename), region, start_date, end_date)
+    ]
+
+    aggregates = empty_aggregates()
+    filter_summary = {
+        "files": len(files),
+        "files_pruned": len(files) - len(selected),
+        "total_input": 0,
+        "invalid": 0,
+        "filtered_by_region": 0,
+        "filtered_by_amount": 0,
+        "filtered_by_date": 0,
+        "final_count": 0,
+        "rejected_by_rule": empty_rule_counts()
+    }
+
+    if not selected:
+        print(f"no files to scan in {source}")
+        return aggregates, filter_summary
+
+    arguments = [[value] * len(selected) for value in (region, min_amount, max_amount, start_date, end_date)]
+    workers = min(workers or os.cpu_count() or 1, len(selected))
+
+    # map yields in file order, so the merge order is deterministic
+    if workers == 1:
+        for file_aggregates, file_summary in map(scan_file, selected, *arguments):
+            merge_file_result(aggregates, filter_summary, file_aggregates, file_summary)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file_aggregates, file_summary in executor.map(scan_file, selected, *arguments):
+                merge_file_result(aggregates, filter_summary, file_aggregates, file_summary)
+
+    print(f"scanned {len(selected)} of {len(files)} files "
+          f"({filter_summary['files_pruned']} pruned by partition)")
+
+    return aggregates, filter_summary
+
+
+def merge_file_result(aggregates, filter_summary, file_aggregates, file_summary):
+
+    merge_aggregates(aggregates, file_aggregates)
+    for key, value in file_summary.items():
+        if isinstance(value, dict):
+            for rule, count in value.items():
+                filter_summary[key][rule] += count
+        else:
+            filter_summary[key] += value
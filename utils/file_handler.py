@@ -1,5 +1,20 @@
 #data file handling, processing, validating and filtering
 
+import codecs
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.transaction_table import TransactionTable, COLUMN_ORDER, CODED_COLUMNS
+from utils.snapshot import source_fingerprint, load_snapshot, save_snapshot
+from utils.instrumentation import instrument
+from utils.validation_rules import (
+    empty_rule_counts,
+    first_failed_rule,
+    validate_columns
+)
+
+@instrument(rows_in=None)
 def read_sales_data(filename):
     
     encodings = ["utf-8", "latin-1", "cp1252"]
@@ -34,93 +49,375 @@ def read_sales_data(filename):
     print("error: unable to read file with supported encodings.")
     return []
 
-def parse_transactions(raw_lines):
-    
-    parsed_records = []
-    expected_fields = 8
+# finds the first encoding that can decode the whole file
+# the file is decoded in fixed size chunks so nothing is kept in memory
+def detect_file_encoding(filename, encodings=("utf-8", "latin-1", "cp1252"), chunk_size=1 << 20):
 
-    for line in raw_lines:
+    for encoding in encodings:
+        decoder = codecs.getincrementaldecoder(encoding)()
         try:
-            parts = line.split("|")
+            with open(filename, "rb") as file:
+                while True:
+                    chunk = file.read(chunk_size)
+                    if not chunk:
+                        decoder.decode(b"", final=True)
+                        break
+                    decoder.decode(chunk)
+            return encoding
+
+        except UnicodeDecodeError:
+            #next encoding
+            continue
 
-            # skip rows that has incorrect number of fields
-            if len(parts) != expected_fields:
+    return None
+
+# raised when a file turns out to be latin-1 after utf-8 lines with non
+# ascii characters were already yielded, which latin-1 decodes differently
+class EncodingChanged(Exception):
+    pass
+
+# stripped, non empty data lines of a file read as raw byte lines, decoded
+# in the same single pass. like read_sales_data the whole file is utf-8
+# unless some line is not, then it is latin-1. each line is decoded on its
+# own (a newline byte is never part of a utf-8 character): the file is taken
+# as utf-8 until a line fails, and ascii lines read so far decode the same
+# either way. if a non ascii utf-8 line was already yielded, EncodingChanged
+# is raised and the caller starts over with encoding="latin-1"
+def iter_decoded_lines(raw_lines, filename, encoding=None):
+
+    non_ascii_read = False
+    header = True
+
+    for raw in raw_lines:
+        if encoding is None:
+            try:
+                text = raw.decode("utf-8")
+            except UnicodeDecodeError:
+                if non_ascii_read:
+                    raise EncodingChanged(filename)
+                encoding = "latin-1"
+                text = raw.decode(encoding)
+            else:
+                non_ascii_read = non_ascii_read or not raw.isascii()
+        else:
+            text = raw.decode(encoding)
+
+        # same line splitting as text mode files (\n, \r\n and \r)
+        for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+            # skip header
+            if header:
+                header = False
                 continue
 
-            transaction_id = parts[0].strip()
-            date = parts[1].strip()
-            product_id = parts[2].strip()
-
-            # remove commas from productname column
-            product_name = parts[3].replace(",", "").strip()
-
-            # converting numeric features
-            quantity = int(parts[4].replace(",", "").strip())
-            unit_price = float(parts[5].replace(",", "").strip())
-
-            customer_id = parts[6].strip()
-            region = parts[7].strip()
-
-            parsed_records.append({
-                "TransactionID": transaction_id,
-                "Date": date,
-                "ProductID": product_id,
-                "ProductName": product_name,
-                "Quantity": quantity,
-                "UnitPrice": unit_price,
-                "CustomerID": customer_id,
-                "Region": region
-            })
-
-        except ValueError:
-            # to skip invalid numeric conversion rows
-            continue
+            line = line.strip()
+            if line:
+                yield line
+
+# streaming version of read_sales_data
+# yields one stripped line at a time instead of building a list, reading the
+# file once (see iter_decoded_lines for encoding=None and EncodingChanged)
+def iter_sales_data(filename, encoding=None):
+
+    try:
+        with open(filename, "rb") as file:
+            yield from iter_decoded_lines(file, filename, encoding)
+
+    except FileNotFoundError:
+        print(f"error: File not found -> {filename}")
+
+# splits and converts one raw line into its 8 field values
+# returns None for rows with the wrong number of fields or bad numbers
+def parse_line(line):
+
+    parts = line.split("|")
+
+    # skip rows that has incorrect number of fields
+    if len(parts) != 8:
+        return None
+
+    try:
+        # converting numeric features
+        quantity = int(parts[4].replace(",", "").strip())
+        unit_price = float(parts[5].replace(",", "").strip())
+
+    except ValueError:
+        # to skip invalid numeric conversion rows
+        return None
+
+    return (
+        parts[0].strip(),
+        parts[1].strip(),
+        parts[2].strip(),
+        # remove commas from productname column
+        parts[3].replace(",", "").strip(),
+        quantity,
+        unit_price,
+        parts[6].strip(),
+        parts[7].strip()
+    )
+
+@instrument()
+def parse_transactions(raw_lines, columnar=False):
+
+    if columnar:
+        return parse_transactions_columnar(raw_lines)
+
+    return list(iter_parse_transactions(raw_lines))
+
+# streaming parser, yields one transaction dict per valid line
+def iter_parse_transactions(raw_lines):
+
+    for line in raw_lines:
+        try:
+            fields = parse_line(line)
         except Exception:
             # to skip unexpected malformed rows
             continue
 
-    return parsed_records
+        if fields is None:
+            continue
 
-def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None):
-    
-    required_fields = [
-        "TransactionID", "Date", "ProductID", "ProductName",
-        "Quantity", "UnitPrice", "CustomerID", "Region"
-    ]
+        yield dict(zip(COLUMN_ORDER, fields))
 
-    total_input = len(transactions)
-    invalid_count = 0
-    valid_transactions = []
+# parses straight into a TransactionTable, no per row dicts
+def parse_transactions_columnar(raw_lines):
 
-    # VAIDATION
-    for tx in transactions:
+    table = TransactionTable()
+
+    for line in raw_lines:
         try:
-            # first check required fields
-            if not all(field in tx for field in required_fields):
-                invalid_count += 1
+            fields = parse_line(line)
+            if fields is None:
                 continue
 
-            # field level validations
-            if not tx["TransactionID"].startswith("T"):
-                invalid_count += 1
-                continue
+            table.append(*fields)
 
-            if not tx["ProductID"].startswith("P"):
-                invalid_count += 1
-                continue
+        except Exception:
+            # to skip unexpected malformed rows
+            continue
 
-            if not tx["CustomerID"].startswith("C"):
-                invalid_count += 1
-                continue
+    return table
 
-            if tx["Quantity"] <= 0 or tx["UnitPrice"] <= 0:
-                invalid_count += 1
-                continue
+# splits the data part of a file (everything after the header line)
+# into byte ranges that each start and end on a line boundary
+def split_byte_ranges(filename, parts):
 
-            valid_transactions.append(tx)
+    size = os.path.getsize(filename)
 
-        except Exception:
+    with open(filename, "rb") as file:
+        # skip header
+        file.readline()
+        start = file.tell()
+
+        step = max((size - start) // max(parts, 1), 1)
+        ranges = []
+
+        while start < size:
+            file.seek(min(start + step, size))
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+# worker: parses one byte range into a compact TransactionTable
+# (arrays and per-column dictionaries pickle much smaller than dicts)
+def parse_byte_range(filename, start, end, encoding):
+
+    with open(filename, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    # same line splitting as text mode files (\n, \r\n and \r)
+    text = data.decode(encoding).replace("\r\n", "\n").replace("\r", "\n")
+    lines = (line.strip() for line in text.split("\n"))
+
+    return parse_transactions_columnar(line for line in lines if line)
+
+# parses a sales file on several cores
+# the file is split into newline aligned byte ranges, each range is parsed in
+# a worker process and the partial tables are merged in file order
+@instrument(rows_in=None)
+def parse_sales_file_parallel(filename, workers=None, chunks_per_worker=4):
+
+    workers = workers or os.cpu_count() or 1
+
+    try:
+        encoding = detect_file_encoding(filename)
+        if encoding is None:
+            print("error: unable to read file with supported encodings.")
+            return TransactionTable()
+
+        ranges = split_byte_ranges(filename, workers * chunks_per_worker)
+
+    except FileNotFoundError:
+        print(f"error: File not found -> {filename}")
+        return TransactionTable()
+
+    table = TransactionTable()
+    if not ranges:
+        return table
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partial_tables = pool.map(
+            parse_byte_range,
+            [filename] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+            [encoding] * len(ranges)
+        )
+
+        for partial in partial_tables:
+            table.extend(partial)
+
+    return table
+
+# same decision as read_sales_data: utf-8 when the whole buffer decodes as
+# utf-8, latin-1 otherwise. chunks that are pure ascii are skipped without
+# decoding, so the usual all ascii file costs one fast scan
+def detect_encoding_buffer(data, chunk_size=1 << 20):
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    try:
+        for offset in range(0, len(data), chunk_size):
+            chunk = data[offset:offset + chunk_size]
+            # a pending partial character must still be completed by this chunk
+            if not chunk.isascii() or decoder.getstate()[0]:
+                decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "latin-1"
+
+    return "utf-8"
+
+# decodes one raw field in the file's encoding. the encoding is decided on
+# the whole file, so this does not fail; latin-1 (which decodes any bytes)
+# is only a guard
+def decode_field(raw, encoding):
+
+    try:
+        return raw.decode(encoding)
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+# converts a raw numeric field, the bytes fast path first
+def parse_number(raw, convert, encoding):
+
+    try:
+        return convert(raw.replace(b",", b""))
+    except ValueError:
+        return convert(decode_field(raw, encoding).replace(",", "").strip())
+
+# memory mapped reader, same records as read_sales_data + parse_transactions
+# lines and fields are located on the raw bytes and every distinct string
+# value is decoded only once. the encoding is decided on the whole file as in
+# read_sales_data, by one scan that decodes only its non ascii chunks
+@instrument(rows_in=None)
+def read_sales_mmap(filename, columnar=False):
+
+    table = TransactionTable()
+    records = []
+
+    # raw bytes -> code (columnar) or str (records), one cache per column
+    caches = {column: {} for column in CODED_COLUMNS}
+
+    def lookup(column, raw):
+
+        value = caches[column].get(raw)
+        if value is None:
+            text = decode_field(raw, encoding)
+            if column == "ProductName":
+                # remove commas from productname column
+                text = text.replace(",", "")
+            text = text.strip()
+            value = table.encode(column, text) if columnar else text
+            caches[column][raw] = value
+        return value
+
+    try:
+        with open(filename, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return table if columnar else records
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                encoding = detect_encoding_buffer(data)
+
+                # skip header
+                data.readline()
+
+                for line in iter(data.readline, b""):
+                    parts = line.split(b"|")
+
+                    # skip rows that has incorrect number of fields
+                    if len(parts) != 8:
+                        continue
+
+                    try:
+                        quantity = parse_number(parts[4], int, encoding)
+                        unit_price = parse_number(parts[5], float, encoding)
+                    except ValueError:
+                        # to skip invalid numeric conversion rows
+                        continue
+
+                    transaction_id = decode_field(parts[0], encoding).strip()
+
+                    if columnar:
+                        try:
+                            table.append_encoded(
+                                transaction_id,
+                                lookup("Date", parts[1]),
+                                lookup("ProductID", parts[2]),
+                                lookup("ProductName", parts[3]),
+                                quantity,
+                                unit_price,
+                                lookup("CustomerID", parts[6]),
+                                lookup("Region", parts[7])
+                            )
+                        except OverflowError:
+                            continue
+                    else:
+                        records.append({
+                            "TransactionID": transaction_id,
+                            "Date": lookup("Date", parts[1]),
+                            "ProductID": lookup("ProductID", parts[2]),
+                            "ProductName": lookup("ProductName", parts[3]),
+                            "Quantity": quantity,
+                            "UnitPrice": unit_price,
+                            "CustomerID": lookup("CustomerID", parts[6]),
+                            "Region": lookup("Region", parts[7])
+                        })
+
+    except FileNotFoundError:
+        print(f"error: File not found -> {filename}")
+
+    return table if columnar else records
+
+# returns True if a parsed transaction passes all field level rules
+# (the rules themselves are in utils/validation_rules.py)
+def is_valid_transaction(tx):
+    return first_failed_rule(tx) is None
+
+@instrument()
+def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None):
+
+    if isinstance(transactions, TransactionTable):
+        return validate_and_filter_table(transactions, region, min_amount, max_amount)
+
+    total_input = len(transactions)
+    invalid_count = 0
+    valid_transactions = []
+    rejected_by_rule = empty_rule_counts()
+
+    # VAIDATION
+    for tx in transactions:
+        rule = first_failed_rule(tx)
+        if rule is None:
+            valid_transactions.append(tx)
+        else:
             invalid_count += 1
+            rejected_by_rule[rule] += 1
 
     # METADATA
     regions = sorted({tx["Region"] for tx in valid_transactions})
@@ -165,7 +462,191 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
         "invalid": invalid_count,
         "filtered_by_region": filtered_by_region,
         "filtered_by_amount": filtered_by_amount,
-        "final_count": len(valid_transactions)
+        "final_count": len(valid_transactions),
+        "rejected_by_rule": rejected_by_rule
     }
 
     return valid_transactions, invalid_count, filter_summary
+
+# streaming version of validate_and_filter
+# yields valid, filtered transactions one by one. the counters are written
+# into filter_summary as rows go through, and the metadata is printed once
+# the input is exhausted (unless verbose=False)
+def iter_validate_and_filter(transactions, region=None, min_amount=None,
+                             max_amount=None, filter_summary=None, verbose=True):
+
+    if filter_summary is None:
+        filter_summary = {}
+
+    filter_summary.update({
+        "total_input": 0,
+        "invalid": 0,
+        "filtered_by_region": 0,
+        "filtered_by_amount": 0,
+        "final_count": 0,
+        "rejected_by_rule": empty_rule_counts()
+    })
+    rejected_by_rule = filter_summary["rejected_by_rule"]
+
+    regions = set()
+    min_seen = None
+    max_seen = None
+    check_amount = min_amount is not None or max_amount is not None
+
+    for tx in transactions:
+        filter_summary["total_input"] += 1
+
+        rule = first_failed_rule(tx)
+        if rule is not None:
+            filter_summary["invalid"] += 1
+            rejected_by_rule[rule] += 1
+            continue
+
+        # METADATA
+        amount = tx["Quantity"] * tx["UnitPrice"]
+        regions.add(tx["Region"])
+        if min_seen is None or amount < min_seen:
+            min_seen = amount
+        if max_seen is None or amount > max_seen:
+            max_seen = amount
+
+        # REGION FILTER
+        if region and tx["Region"] != region:
+            filter_summary["filtered_by_region"] += 1
+            continue
+
+        # AMOUNT FILTER
+        if check_amount:
+            if min_amount is not None and amount < min_amount:
+                filter_summary["filtered_by_amount"] += 1
+                continue
+            if max_amount is not None and amount > max_amount:
+                filter_summary["filtered_by_amount"] += 1
+                continue
+
+        filter_summary["final_count"] += 1
+        yield tx
+
+    if not verbose:
+        return
+
+    print("available regions :", sorted(regions))
+    print("transaction amount range :",
+          0 if min_seen is None else min_seen, "-",
+          0 if max_seen is None else max_seen)
+
+# streams a sales file straight into the validator
+# memory stays flat no matter how big the file is. the file is read once; a
+# file that turns out to be latin-1 late raises EncodingChanged (see
+# iter_decoded_lines), after which the caller streams it again with
+# encoding="latin-1"
+def stream_sales_data(filename, region=None, min_amount=None,
+                      max_amount=None, filter_summary=None, encoding=None):
+
+    lines = iter_sales_data(filename, encoding)
+    transactions = iter_parse_transactions(lines)
+
+    return iter_validate_and_filter(
+        transactions,
+        region=region,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        filter_summary=filter_summary
+    )
+
+# positions of the rows of a TransactionTable that pass validation
+# the rules run over whole columns, see validate_columns
+def valid_row_indices(table):
+    return validate_columns(table)[0]
+
+# validate_and_filter for a TransactionTable
+def validate_and_filter_table(table, region=None, min_amount=None, max_amount=None):
+
+    total_input = len(table)
+    dictionaries = table.dictionaries
+    codes = table.codes
+
+    # VAIDATION
+    valid_rows, rejected_by_rule = validate_columns(table)
+    invalid_count = total_input - len(valid_rows)
+
+    # METADATA
+    quantity = table.quantity
+    unit_price = table.unit_price
+    region_codes = codes["Region"]
+
+    amounts = [quantity[i] * unit_price[i] for i in valid_rows]
+    regions = sorted({dictionaries["Region"][region_codes[i]] for i in valid_rows})
+
+    print("available regions :", regions)
+    print("transaction amount range :", min(amounts, default=0), "-", max(amounts, default=0))
+
+    filtered_by_region = 0
+    filtered_by_amount = 0
+
+    # REGION FILTER
+    if region:
+        before = len(valid_rows)
+        region_code = table.code_of("Region", region)
+        keep = [
+            (i, amount) for i, amount in zip(valid_rows, amounts)
+            if region_codes[i] == region_code
+        ]
+        valid_rows = [i for i, _ in keep]
+        amounts = [amount for _, amount in keep]
+        filtered_by_region = before - len(valid_rows)
+        print(f"after region filter ({region}) :", len(valid_rows))
+
+    # AMOUNT FILTER
+    if min_amount is not None or max_amount is not None:
+        before = len(valid_rows)
+        # "amount < min_amount drops the row", as in validate_and_filter,
+        # so a nan amount is kept
+        valid_rows = [
+            i for i, amount in zip(valid_rows, amounts)
+            if not (min_amount is not None and amount < min_amount)
+            and not (max_amount is not None and amount > max_amount)
+        ]
+        filtered_by_amount = before - len(valid_rows)
+        print("after amount filter :", len(valid_rows))
+
+    filter_summary = {
+        "total_input": total_input,
+        "invalid": invalid_count,
+        "filtered_by_region": filtered_by_region,
+        "filtered_by_amount": filtered_by_amount,
+        "final_count": len(valid_rows),
+        "rejected_by_rule": rejected_by_rule
+    }
+
+    return table.take(valid_rows), invalid_count, filter_summary
+
+# fast path: parsed + validated transactions from a binary columnar snapshot
+# the snapshot sits next to the source file and is only used while the
+# file's size, mtime and sha256 still match; otherwise the file is parsed
+# again and a fresh snapshot is written. returns (table, valid row positions)
+# fingerprint can be passed when the caller already has it, to skip hashing
+@instrument(rows_in=None)
+def load_sales_table_cached(filename, use_arrow=None, fingerprint=None):
+
+    try:
+        fingerprint = fingerprint or source_fingerprint(filename)
+    except FileNotFoundError:
+        print(f"error: File not found -> {filename}")
+        return TransactionTable(), []
+
+    cached = load_snapshot(filename, fingerprint, use_arrow)
+    if cached is not None:
+        print(f"loaded {len(cached[0])} transactions from snapshot")
+        return cached
+
+    table = read_sales_mmap(filename, columnar=True)
+    valid_rows = valid_row_indices(table)
+
+    try:
+        path = save_snapshot(filename, table, valid_rows, fingerprint, use_arrow)
+        print(f"snapshot saved to {path}")
+    except OSError as e:
+        print(f"could not write snapshot: {e}")
+
+    return table, valid_rows
@@ -0,0 +1,140 @@
+# reusable filter engine for validate_and_filter
+# validates once and indexes the valid rows by region and by amount, so
+# repeated region / min / max filters are lookups and bisects, not rescans
+
+from bisect import bisect_left, bisect_right
+
+from utils.transaction_table import TransactionTable
+from utils.validation_rules import empty_rule_counts, first_failed_rule, validate_columns, count_rejections
+
+
+class FilterIndex:
+
+    # valid_rows can be passed when validity is already known (snapshots)
+    def __init__(self, transactions, valid_rows=None):
+
+        self.transactions = transactions
+        self.columnar = isinstance(transactions, TransactionTable)
+        self.total_input = len(transactions)
+
+        # options shown before filtering, over every parsed row
+        self.parsed_regions = set()
+
+        # VALIDATION, amounts computed once per row
+        if self.columnar:
+            regions = transactions.column("Region")
+            amounts = [q * p for q, p in zip(transactions.quantity, transactions.unit_price)]
+            if valid_rows is None:
+                valid_rows, self.rejected_by_rule = validate_columns(transactions)
+            else:
+                self.rejected_by_rule = count_rejections(transactions, valid_rows)
+        else:
+            regions = [tx.get("Region") for tx in transactions]
+            amounts = []
+            known_rows = None if valid_rows is None else set(valid_rows)
+            valid_rows = []
+            self.rejected_by_rule = empty_rule_counts()
+            for i, tx in enumerate(transactions):
+                try:
+                    amounts.append(tx["Quantity"] * tx["UnitPrice"])
+                except (KeyError, TypeError):
+                    amounts.append(None)
+                if known_rows is not None and i in known_rows:
+                    valid_rows.append(i)
+                    continue
+                rule = first_failed_rule(tx)
+                if rule is None and known_rows is None:
+                    valid_rows.append(i)
+                elif rule is not None:
+                    self.rejected_by_rule[rule] += 1
+
+        self.parsed_regions.update(region for region in regions if region is not None)
+        parsed_amounts = [amount for amount in amounts if amount is not None]
+        self.parsed_amount_min = min(parsed_amounts, default=0)
+        self.parsed_amount_max = max(parsed_amounts, default=0)
+
+        self.valid_rows = list(valid_rows)
+        self.invalid_count = self.total_input - len(valid_rows)
+        self.amounts = amounts
+
+        # REGION PARTITIONS, row positions in file order
+        self.region_rows = {}
+        for i in valid_rows:
+            self.region_rows.setdefault(regions[i], []).append(i)
+
+        self.regions = sorted(self.region_rows)
+        valid_amounts = [amounts[i] for i in valid_rows]
+        self.amount_min = min(valid_amounts, default=0)
+        self.amount_max = max(valid_amounts, default=0)
+
+        # amount sorted indexes, built per partition on first use
+        self.sorted_indexes = {}
+
+    # (sorted amounts, row positions in the same order, nan amount rows) for
+    # one partition. nan does not order, so those rows are kept aside
+    def amount_index(self, region=None):
+
+        if region not in self.sorted_indexes:
+            rows = self.region_rows.get(region, []) if region else self.valid_rows
+            amounts = self.amounts
+            nan_rows = [i for i in rows if amounts[i] != amounts[i]]
+            ordered = sorted((i for i in rows if amounts[i] == amounts[i]), key=amounts.__getitem__)
+            self.sorted_indexes[region] = ([amounts[i] for i in ordered], ordered, nan_rows)
+
+        return self.sorted_indexes[region]
+
+    # rows in [min_amount, max_amount] within a partition, in file order
+    # nan amount rows are never below min or above max, so validate_and_filter
+    # keeps them in every range
+    def rows_in_range(self, region, min_amount, max_amount):
+
+        keys, rows, nan_rows = self.amount_index(region)
+
+        start = bisect_left(keys, min_amount) if min_amount is not None else 0
+        end = bisect_right(keys, max_amount) if max_amount is not None else len(keys)
+
+        selected = rows[start:end] if start < end else []
+        return sorted(selected + nan_rows) if nan_rows else sorted(selected)
+
+    # same result and output as validate_and_filter
+    def filter(self, region=None, min_amount=None, max_amount=None, verbose=True):
+
+        if verbose:
+            print("available regions :", self.regions)
+            print("transaction amount range :", self.amount_min, "-", self.amount_max)
+
+        rows = self.valid_rows
+        filtered_by_region = 0
+        filtered_by_amount = 0
+
+        # REGION FILTER
+        if region:
+            rows = self.region_rows.get(region, [])
+            filtered_by_region = len(self.valid_rows) - len(rows)
+            if verbose:
+                print(f"after region filter ({region}) :", len(rows))
+
+        # AMOUNT FILTER
+        if min_amount is not None or max_amount is not None:
+            before = len(rows)
+            rows = self.rows_in_range(region or None, min_amount, max_amount)
+            filtered_by_amount = before - len(rows)
+            if verbose:
+                print("after amount filter :", len(rows))
+
+        filter_summary = {
+            "total_input": self.total_input,
+            "invalid": self.invalid_count,
+            "filtered_by_region": filtered_by_region,
+            "filtered_by_amount": filtered_by_amount,
+            "final_count": len(rows),
+            "rejected_by_rule": dict(self.rejected_by_rule)
+        }
+
+        if self.columnar:
+            selected = self.transactions.take(rows)
+        else:
+            transactions = self.transactions
+            selected = [transactions[i] for i in rows]
+
+        return selected, self.invalid_count, filter_summary
@@ -0,0 +1,205 @@
+# incremental, append-only processing of a growing sales file
+# the running aggregates and the byte offset already processed are kept in a
+# small state file, so each run only parses the rows appended since the last
+
+import hashlib
+import json
+import mmap
+import os
+
+from utils.file_handler import detect_encoding_buffer, iter_parse_transactions, is_valid_transaction
+from utils.data_processor import aggregate_transactions, empty_aggregates
+
+STATE_VERSION = 3
+
+# bytes hashed at the start of the file to notice it was replaced
+HEAD_BYTES = 4096
+
+
+def default_state_file(filename):
+    return f"{filename}.state.json"
+
+
+def file_head_hash(file, length):
+
+    file.seek(0)
+    return hashlib.sha1(file.read(length)).hexdigest()
+
+
+# sets are stored as lists, dict order is kept so ties sort the same way
+def serialize_aggregates(aggregates):
+
+    result = dict(aggregates)
+    for section in ("customers", "daily"):
+        result[section] = {
+            key: {
+                name: sorted(value) if isinstance(value, set) else value
+                for name, value in stats.items()
+            }
+            for key, stats in aggregates[section].items()
+        }
+    return result
+
+
+def deserialize_aggregates(data):
+
+    aggregates = dict(data)
+    for stats in aggregates["customers"].values():
+        stats["products_bought"] = set(stats["products_bought"])
+    for stats in aggregates["daily"].values():
+        stats["unique_customers"] = set(stats["unique_customers"])
+    return aggregates
+
+
+def new_state(filename):
+
+    return {
+        "version": STATE_VERSION,
+        "source": os.path.abspath(filename),
+        "offset": 0,
+        "size": 0,
+        "head_length": 0,
+        "head_hash": hashlib.sha1(b"").hexdigest(),
+        "encoding": None,
+        "last_transaction_id": None,
+        "total_input": 0,
+        "invalid": 0,
+        "aggregates": empty_aggregates()
+    }
+
+
+def load_state(state_file):
+
+    try:
+        with open(state_file, "r", encoding="utf-8") as file:
+            state = json.load(file)
+
+        if state.get("version") != STATE_VERSION:
+            return None
+
+        state["aggregates"] = deserialize_aggregates(state["aggregates"])
+        return state
+
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, OSError) as e:
+        print(f"ignoring unreadable state file: {e}")
+        return None
+
+
+def save_state(state, state_file):
+
+    data = dict(state, aggregates=serialize_aggregates(state["aggregates"]))
+
+    # write to a temp file first so a crash never leaves a broken state
+    temp_file = f"{state_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        json.dump(data, file, separators=(",", ":"))
+    os.replace(temp_file, state_file)
+
+
+# encoding of the whole file, the same decision the full readers make
+def detect_file_encoding(file, size):
+
+    if size == 0:
+        return "utf-8"
+
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return detect_encoding_buffer(data)
+
+
+# lines appended since the last run, from offset up to the last newline.
+# a last line without a newline may still be being written, so it is left
+# for the next run, and taken as complete once the file size has not
+# changed between two runs.
+# lines are decoded strictly: an appended line that is not valid utf-8
+# makes the whole file latin-1, so UnicodeDecodeError is raised and the
+# caller rebuilds instead of mixing decodings
+def iter_new_lines(file, state, size):
+
+    encoding = state["encoding"]
+    take_unterminated = size == state["size"]
+    file.seek(state["offset"])
+
+    if state["offset"] == 0:
+        # skip header
+        header = file.readline()
+        if not header.endswith(b"\n") and not take_unterminated:
+            return
+        state["offset"] = file.tell()
+
+    for raw in file:
+        if not raw.endswith(b"\n") and not take_unterminated:
+            break
+
+        state["offset"] += len(raw)
+
+        line = raw.decode(encoding).strip()
+        if line:
+            yield line
+
+
+# (number of parsed rows, valid transactions) appended since the last run
+def read_new_rows(file, state, size):
+
+    new_rows = 0
+    valid_rows = []
+
+    for tx in iter_parse_transactions(iter_new_lines(file, state, size)):
+        new_rows += 1
+        if is_valid_transaction(tx):
+            valid_rows.append(tx)
+            state["last_transaction_id"] = tx["TransactionID"]
+
+    return new_rows, valid_rows
+
+
+# brings the aggregates of filename up to date and returns (aggregates, state)
+# the cost is proportional to the rows appended since the previous run;
+# if the file was truncated or replaced, everything is rebuilt from scratch
+def update_incremental(filename, state_file=None):
+
+    state_file = state_file or default_state_file(filename)
+    state = load_state(state_file)
+
+    try:
+        with open(filename, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+
+            if (state is None
+                    or state["source"] != os.path.abspath(filename)
+                    or size < state["offset"]
+                    or file_head_hash(file, state["head_length"]) != state["head_hash"]):
+                if state is not None:
+                    print("sales file changed, rebuilding incremental state")
+                state = new_state(filename)
+
+            if state["encoding"] is None:
+                state["encoding"] = detect_file_encoding(file, size)
+
+            try:
+                new_rows, valid_rows = read_new_rows(file, state, size)
+            except UnicodeDecodeError:
+                # the whole file now reads as latin-1, rows already counted
+                # were decoded as utf-8
+                print("sales file is no longer valid utf-8, rebuilding incremental state")
+                state = new_state(filename)
+                state["encoding"] = "latin-1"
+                new_rows, valid_rows = read_new_rows(file, state, size)
+
+            aggregate_transactions(valid_rows, aggregates=state["aggregates"])
+
+            state["total_input"] += new_rows
+            state["invalid"] += new_rows - len(valid_rows)
+            state["size"] = size
+            state["head_length"] = min(state["offset"], HEAD_BYTES)
+            state["head_hash"] = file_head_hash(file, state["head_length"])
+
+    except FileNotFoundError:
+        print(f"error: File not found -> {filename}")
+        return empty_aggregates(), new_state(filename)
+
+    save_state(state, state_file)
+    print(f"incremental update: {new_rows} new rows, {len(valid_rows)} valid")
+
+    return state["aggregates"], state
@@ -0,0 +1,183 @@
+# lightweight per-stage instrumentation
+# stages are wrapped with the stage() context manager or the @instrument
+# decorator. while disabled (the default) both do nothing but one flag check
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+_state = {
+    "enabled": False,
+    "memory": False,
+    "profile_stages": set(),
+    "profile_dir": None,
+    "started": None,
+    "records": []
+}
+
+# open stages per thread, so stages running concurrently keep their own parents
+_local = threading.local()
+
+
+# memory=True traces allocations (slower), profile_stages get a cProfile
+# dump written to profile_dir
+def enable(memory=True, profile_stages=(), profile_dir="output/profiles"):
+
+    _state.update({
+        "enabled": True,
+        "memory": memory,
+        "profile_stages": set(profile_stages),
+        "profile_dir": profile_dir,
+        "started": time.time(),
+        "records": []
+    })
+
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+
+    if _state["memory"] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state["enabled"] = False
+
+
+def is_enabled():
+    return _state["enabled"]
+
+
+def count_rows(value):
+
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+# rows produced by a stage, the first item for functions returning a tuple
+def count_output(result):
+    return count_rows(result[0] if isinstance(result, tuple) else result)
+
+
+@contextmanager
+def stage(name, rows_in=None):
+
+    if not _state["enabled"]:
+        yield {}
+        return
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+
+    record = {
+        "stage": name,
+        "parent": stack[-1]["stage"] if stack else None,
+        "rows_in": rows_in,
+        "rows_out": None
+    }
+
+    # nested stages reset the traced peak, so parents keep a running max
+    # (the peak is process wide: stages running in parallel threads share it)
+    memory = _state["memory"] and tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak")
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+        tracemalloc.reset_peak()
+        record["_start_memory"] = current
+        record["_peak"] = current
+
+    profiler = None
+    if name in _state["profile_stages"]:
+        profiler = cProfile.Profile()
+
+    stack.append(record)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+
+        seconds = time.perf_counter() - start
+        cpu_seconds = time.process_time() - cpu_start
+        stack.pop()
+
+        record["seconds"] = round(seconds, 6)
+        record["cpu_seconds"] = round(cpu_seconds, 6)
+
+        rows = record["rows_in"] if record["rows_in"] is not None else record["rows_out"]
+        record["rows_per_second"] = round(rows / seconds) if rows and seconds > 0 else None
+
+        if memory:
+            peak = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+            record["peak_memory_bytes"] = peak - record.pop("_start_memory")
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+
+        if profiler:
+            os.makedirs(_state["profile_dir"], exist_ok=True)
+            path = os.path.join(_state["profile_dir"], f"{name}.prof")
+            profiler.dump_stats(path)
+            record["profile"] = path
+
+        _state["records"].append(record)
+
+
+# decorator form of stage(); rows are counted with rows_in(first argument)
+# and rows_out(result), pass None for either when it is not rows (filenames)
+def instrument(name=None, rows_in=count_rows, rows_out=count_output):
+
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"]:
+                return func(*args, **kwargs)
+
+            with stage(stage_name, rows_in(args[0]) if rows_in and args else None) as record:
+                result = func(*args, **kwargs)
+                if rows_out:
+                    record["rows_out"] = rows_out(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+# everything recorded since enable(), in completion order
+def run_record():
+
+    return {
+        "started": datetime.fromtimestamp(_state["started"]).isoformat(timespec="seconds")
+        if _state["started"] else None,
+        "total_seconds": round(time.time() - _state["started"], 6) if _state["started"] else None,
+        "memory_traced": _state["memory"],
+        "stages": list(_state["records"])
+    }
+
+
+def write_run_record(filename):
+
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(filename, "w", encoding="utf-8") as file:
+        json.dump(run_record(), file, indent=2)
+
+    return filename
@@ -0,0 +1,264 @@
+# vectorized analytics backend
+# needs numpy, which is optional; data_processor only imports this module
+# when the numpy backend is selected
+
+import numpy as np
+
+from utils.transaction_table import TransactionTable
+
+
+# zero copy numpy views over the table columns
+def table_arrays(table):
+
+    quantity = np.frombuffer(table.quantity, dtype=np.int64) if len(table) else np.zeros(0, np.int64)
+    unit_price = np.frombuffer(table.unit_price, dtype=np.float64) if len(table) else np.zeros(0)
+    codes = {
+        column: np.frombuffer(values, dtype=np.int32) if len(table) else np.zeros(0, np.int32)
+        for column, values in table.codes.items()
+    }
+    return quantity, unit_price, codes
+
+
+# group codes ordered by first appearance, like dict insertion order
+def first_seen_order(codes, group_count):
+
+    first_index = np.full(group_count, len(codes), dtype=np.int64)
+    np.minimum.at(first_index, codes, np.arange(len(codes), dtype=np.int64))
+
+    present = np.flatnonzero(first_index < len(codes))
+    return present[np.argsort(first_index[present], kind="stable")]
+
+
+# sequential sum, same rounding as a python += loop
+# (np.sum uses pairwise summation and can differ in the last bits)
+def sequential_sum(values):
+
+    if len(values) == 0:
+        return 0.0
+    return float(np.cumsum(values)[-1])
+
+
+# start position of every run of equal values in a sorted array
+def run_starts(values):
+
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+
+
+# set of member values per group, e.g. customer -> products bought
+# dedupe by sorting combined keys, then slice each group out in one go
+def distinct_members(group_codes, member_codes, member_values):
+
+    member_count = max(len(member_values), 1)
+    keys = np.sort(group_codes.astype(np.int64) * member_count + member_codes)
+    keys = keys[run_starts(keys)]
+
+    groups = keys // member_count
+    members = np.array(member_values, dtype=object)[keys % member_count].tolist()
+
+    starts = run_starts(groups)
+    ends = np.append(starts[1:], len(keys))
+
+    return {
+        group: set(members[start:end])
+        for group, start, end in zip(groups[starts].tolist(), starts.tolist(), ends.tolist())
+    }
+
+
+# same output as data_processor.aggregate_transactions
+def aggregate_numpy(transactions):
+
+    if isinstance(transactions, TransactionTable):
+        table = transactions
+    else:
+        table = TransactionTable.from_records(transactions)
+
+    return aggregate_arrays(table.dictionaries, *table_arrays(table))
+
+
+# aggregate_numpy over column arrays (rows in file order) coded against
+# dictionaries, e.g. a selection gathered out of a SelectionIndex
+def aggregate_arrays(dictionaries, quantity, unit_price, codes):
+
+    # bincount with weights adds in row order, so every group sum
+    # matches the pure python accumulation bit for bit
+    sale_amount = quantity * unit_price
+    total_revenue = sequential_sum(sale_amount)
+
+    region_codes = codes["Region"]
+    product_codes = codes["ProductName"]
+    customer_codes = codes["CustomerID"]
+    date_codes = codes["Date"]
+
+    n_regions = len(dictionaries["Region"])
+    n_products = len(dictionaries["ProductName"])
+    n_customers = len(dictionaries["CustomerID"])
+    n_dates = len(dictionaries["Date"])
+
+    region_sales = np.bincount(region_codes, weights=sale_amount, minlength=n_regions)
+    region_count = np.bincount(region_codes, minlength=n_regions)
+
+    # integer quantities summed exactly
+    product_quantity = np.zeros(n_products, dtype=np.int64)
+    np.add.at(product_quantity, product_codes, quantity)
+    product_revenue = np.bincount(product_codes, weights=sale_amount, minlength=n_products)
+
+    customer_spent = np.bincount(customer_codes, weights=sale_amount, minlength=n_customers)
+    customer_count = np.bincount(customer_codes, minlength=n_customers)
+
+    daily_revenue = np.bincount(date_codes, weights=sale_amount, minlength=n_dates)
+    daily_count = np.bincount(date_codes, minlength=n_dates)
+
+    regions = dictionaries["Region"]
+    products = dictionaries["ProductName"]
+    customers = dictionaries["CustomerID"]
+    dates = dictionaries["Date"]
+
+    # plain lists index much faster than numpy scalars in the loops below
+    region_sales = region_sales.tolist()
+    region_count = region_count.tolist()
+    product_quantity = product_quantity.tolist()
+    product_revenue = product_revenue.tolist()
+    customer_spent = customer_spent.tolist()
+    customer_count = customer_count.tolist()
+    daily_revenue = daily_revenue.tolist()
+    daily_count = daily_count.tolist()
+
+    customer_products = distinct_members(customer_codes, product_codes, products)
+    daily_customers = distinct_members(date_codes, customer_codes, customers)
+
+    return {
+        "total_revenue": total_revenue,
+        "region_total": total_revenue,
+        "regions": {
+            regions[code]: {
+                "total_sales": region_sales[code],
+                "transaction_count": region_count[code]
+            }
+            for code in first_seen_order(region_codes, n_regions).tolist()
+        },
+        "products": {
+            products[code]: {
+                "total_quantity": product_quantity[code],
+                "total_revenue": product_revenue[code]
+            }
+            for code in first_seen_order(product_codes, n_products).tolist()
+        },
+        "customers": {
+            customers[code]: {
+                "total_spent": customer_spent[code],
+                "purchase_count": customer_count[code],
+                "products_bought": customer_products[code]
+            }
+            for code in first_seen_order(customer_codes, n_customers).tolist()
+        },
+        "daily": {
+            dates[code]: {
+                "revenue": daily_revenue[code],
+                "transaction_count": daily_count[code],
+                "unique_customers": daily_customers[code]
+            }
+            for code in first_seen_order(date_codes, n_dates).tolist()
+        }
+    }
+
+
+# the valid rows of a table as numpy columns, for repeated region / amount
+# selections (the analysis service). a selection is a vectorized mask and
+# is aggregated from the gathered columns, without building the rows
+class SelectionIndex:
+
+    def __init__(self, table, valid_rows):
+
+        rows = np.asarray(valid_rows, dtype=np.int64)
+        quantity, unit_price, codes = table_arrays(table)
+
+        self.dictionaries = table.dictionaries
+        self.quantity = quantity[rows]
+        self.unit_price = unit_price[rows]
+        self.amount = self.quantity * self.unit_price
+        self.codes = {column: values[rows] for column, values in codes.items()}
+        self.region_codes = {region: code for code, region in enumerate(self.dictionaries["Region"])}
+
+    def __len__(self):
+        return len(self.amount)
+
+    # positions of the rows kept by validate_and_filter's region and amount
+    # filters, in file order. the amount tests are written like the python
+    # ones ("amount < min_amount drops the row"), so nan behaves the same
+    def select(self, region=None, min_amount=None, max_amount=None):
+
+        mask = np.ones(len(self), dtype=bool)
+
+        if region:
+            code = self.region_codes.get(region)
+            if code is None:
+                return np.zeros(0, dtype=np.int64)
+            mask &= self.codes["Region"] == code
+        if min_amount is not None:
+            mask &= ~(self.amount < min_amount)
+        if max_amount is not None:
+            mask &= ~(self.amount > max_amount)
+
+        return np.flatnonzero(mask)
+
+    def aggregate(self, positions):
+
+        return aggregate_arrays(
+            self.dictionaries,
+            self.quantity[positions],
+            self.unit_price[positions],
+            {column: values[positions] for column, values in self.codes.items()}
+        )
+
+    # {ProductID: rows} of the selection
+    def product_id_counts(self, positions):
+
+        product_ids = self.dictionaries["ProductID"]
+        counts = np.bincount(self.codes["ProductID"][positions], minlength=len(product_ids))
+        return {
+            product_ids[code]: count
+            for code, count in enumerate(counts.tolist())
+            if count
+        }
+
+
+# product names and stats as parallel arrays, in aggregation order
+def product_arrays(product_stats):
+
+    names = list(product_stats)
+    quantity = np.fromiter(
+        (stats["total_quantity"] for stats in product_stats.values()),
+        dtype=np.int64, count=len(names)
+    )
+    revenue = np.fromiter(
+        (stats["total_revenue"] for stats in product_stats.values()),
+        dtype=np.float64, count=len(names)
+    )
+    return names, quantity, revenue
+
+
+# top n products by quantity, stable on ties like sorted(reverse=True)
+def top_products_numpy(product_stats, n=5):
+
+    names, quantity, revenue = product_arrays(product_stats)
+    order = np.argsort(-quantity, kind="stable")[:n]
+
+    return [
+        (names[i], int(quantity[i]), round(float(revenue[i]), 2))
+        for i in order.tolist()
+    ]
+
+
+# products under the quantity threshold, sorted by quantity
+def low_products_numpy(product_stats, threshold=10):
+
+    names, quantity, revenue = product_arrays(product_stats)
+    selected = np.flatnonzero(quantity < threshold)
+    order = selected[np.argsort(quantity[selected], kind="stable")]
+
+    return [
+        (names[i], int(quantity[i]), round(float(revenue[i]), 2))
+        for i in order.tolist()
+    ]
@@ -0,0 +1,215 @@
+# sales report generation
+# the report is rendered from one precomputed bundle (build_report_data),
+# never from the transactions, so its cost depends on the number of
+# regions / products / customers / days and not on the number of rows
+
+import csv
+import json
+import os
+from datetime import datetime
+
+from utils.data_processor import (
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products
+)
+
+RULE = "=" * 44
+LINE = "-" * 44
+REPORT_FORMATS = ("text", "json", "csv")
+
+
+# everything the report shows, from the aggregate_transactions output and
+# the stats filled in by enrich_sales_data(..., stats=...)
+def build_report_data(aggregates, enrichment_stats=None, top_n=5, low_threshold=10):
+
+    regions = region_wise_sales(None, aggregates=aggregates)
+    daily = daily_sales_trend(None, aggregates=aggregates)
+    peak_date, peak_revenue, peak_count = find_peak_sales_day(None, aggregates=aggregates)
+
+    transaction_count = sum(stats["transaction_count"] for stats in aggregates["regions"].values())
+    total_revenue = round(aggregates["total_revenue"], 2)
+    dates = list(daily)
+
+    enrichment_stats = enrichment_stats or {}
+    enriched_total = enrichment_stats.get("total", 0)
+    matched = enrichment_stats.get("matched", 0)
+
+    return {
+        "records_processed": transaction_count,
+        "summary": {
+            "total_revenue": total_revenue,
+            "total_transactions": transaction_count,
+            "average_order_value": round(total_revenue / transaction_count, 2) if transaction_count else 0.0,
+            "date_range": [dates[0], dates[-1]] if dates else None
+        },
+        "regions": regions,
+        "top_products": top_selling_products(None, n=top_n, aggregates=aggregates),
+        "top_customers": customer_analysis(None, aggregates=aggregates, top_n=top_n),
+        "daily": daily,
+        "peak_day": {"date": peak_date, "revenue": peak_revenue, "transaction_count": peak_count},
+        "low_performers": low_performing_products(None, threshold=low_threshold, aggregates=aggregates),
+        "top_n": top_n,
+        "low_threshold": low_threshold,
+        "region_averages": {
+            region: round(stats["total_sales"] / stats["transaction_count"], 2)
+            if stats["transaction_count"] else 0.0
+            for region, stats in regions.items()
+        },
+        "enrichment": {
+            "total": enriched_total,
+            "matched": matched,
+            "success_rate": round(matched / enriched_total * 100, 2) if enriched_total else 0.0,
+            "failed_products": sorted(
+                product for product in enrichment_stats.get("failed_products", ()) if product is not None
+            )
+        }
+    }
+
+
+# the text report, same layout as output/sales_report.txt
+def render_text_report(report_data, generated=None):
+
+    generated = generated or datetime.now()
+    summary = report_data["summary"]
+    date_range = summary["date_range"]
+    peak_day = report_data["peak_day"]
+    enrichment = report_data["enrichment"]
+
+    lines = [
+        RULE,
+        "       SALES ANALYTICS REPORT",
+        f"   Generated: {generated}",
+        f"   Records Processed: {report_data['records_processed']}",
+        RULE,
+        "",
+        "OVERALL SUMMARY",
+        LINE,
+        f"{'Total Revenue:':<22}₹{summary['total_revenue']:,.2f}",
+        f"{'Total Transactions:':<22}{summary['total_transactions']}",
+        f"{'Average Order Value:':<22}₹{summary['average_order_value']:,.2f}",
+        f"{'Date Range:':<22}{date_range[0]} to {date_range[1]}" if date_range else f"{'Date Range:':<22}-",
+        "",
+        "REGION-WISE PERFORMANCE",
+        LINE,
+        "Region    Sales        % Total   Transactions"
+    ]
+
+    lines.extend(
+        f"{region:<10} ₹{stats['total_sales']:>10,.0f}  {stats['percentage']:>6.2f}%  {stats['transaction_count']:>5}"
+        for region, stats in report_data["regions"].items()
+    )
+
+    lines += ["", f"TOP {report_data['top_n']} PRODUCTS", LINE]
+    lines.extend(
+        f"{rank}. {product:<15} Qty:{quantity} Revenue:₹{revenue:,.0f}"
+        for rank, (product, quantity, revenue) in enumerate(report_data["top_products"], 1)
+    )
+
+    lines += ["", f"TOP {report_data['top_n']} CUSTOMERS", LINE]
+    lines.extend(
+        f"{rank}. {customer_id} Spent:₹{stats['total_spent']:,.0f} Orders:{stats['purchase_count']}"
+        for rank, (customer_id, stats) in enumerate(report_data["top_customers"].items(), 1)
+    )
+
+    lines += ["", "DAILY SALES TREND", LINE]
+    lines.extend(
+        f"{date} Revenue:₹{stats['revenue']:,.0f} Txns:{stats['transaction_count']} "
+        f"Customers:{stats['unique_customers']}"
+        for date, stats in report_data["daily"].items()
+    )
+
+    lines += ["", "PRODUCT PERFORMANCE ANALYSIS", LINE]
+    if peak_day["date"] is not None:
+        lines.append(f"Best Selling Day: {peak_day['date']} "
+                     f"(₹{peak_day['revenue']:,.0f}, {peak_day['transaction_count']} txns)")
+    else:
+        lines.append("Best Selling Day: -")
+
+    lines += ["", f"Low Performing Products (<{report_data['low_threshold']} qty):"]
+    lines.extend(
+        f"- {product}: Qty {quantity}, Revenue ₹{revenue:,.0f}"
+        for product, quantity, revenue in report_data["low_performers"]
+    )
+
+    lines += ["", "Average Transaction Value per Region:"]
+    lines.extend(
+        f"- {region}: ₹{average:,.2f}"
+        for region, average in report_data["region_averages"].items()
+    )
+
+    lines += [
+        "",
+        "API ENRICHMENT SUMMARY",
+        LINE,
+        f"Total Enriched: {enrichment['matched']}",
+        f"Success Rate: {enrichment['success_rate']:.2f}%",
+        "Failed Products:"
+    ]
+    lines.extend(f"- {product}" for product in enrichment["failed_products"])
+
+    return "\n".join(lines) + "\n"
+
+
+# one row per value: section, key, field, value
+def report_csv_rows(report_data):
+
+    rows = [("summary", "", "records_processed", report_data["records_processed"])]
+    rows.extend(("summary", "", field, value) for field, value in report_data["summary"].items()
+                if field != "date_range")
+
+    if report_data["summary"]["date_range"]:
+        rows.append(("summary", "", "date_start", report_data["summary"]["date_range"][0]))
+        rows.append(("summary", "", "date_end", report_data["summary"]["date_range"][1]))
+
+    for section in ("regions", "top_customers", "daily"):
+        for key, stats in report_data[section].items():
+            rows.extend(
+                (section, key, field, ";".join(value) if isinstance(value, list) else value)
+                for field, value in stats.items()
+            )
+
+    for section in ("top_products", "low_performers"):
+        for product, quantity, revenue in report_data[section]:
+            rows.append((section, product, "total_quantity", quantity))
+            rows.append((section, product, "total_revenue", revenue))
+
+    rows.extend(("peak_day", "", field, value) for field, value in report_data["peak_day"].items())
+    rows.extend(("region_averages", region, "average_transaction_value", average)
+                for region, average in report_data["region_averages"].items())
+
+    enrichment = report_data["enrichment"]
+    rows.extend(("enrichment", "", field, enrichment[field]) for field in ("total", "matched", "success_rate"))
+    rows.extend(("enrichment", product, "failed", True) for product in enrichment["failed_products"])
+
+    return rows
+
+
+# writes the report as text (default), json or csv and returns the path
+def generate_sales_report(report_data, output_file="output/sales_report.txt", output_format="text"):
+
+    if output_format not in REPORT_FORMATS:
+        raise ValueError(f"unknown report format: {output_format}")
+
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if output_format == "json":
+        with open(output_file, "w", encoding="utf-8") as file:
+            json.dump(dict(report_data, generated=datetime.now().isoformat()), file, indent=2)
+
+    elif output_format == "csv":
+        with open(output_file, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("section", "key", "field", "value"))
+            writer.writerows(report_csv_rows(report_data))
+
+    else:
+        with open(output_file, "w", encoding="utf-8") as file:
+            file.write(render_text_report(report_data))
+
+    return output_file
@@ -0,0 +1,237 @@
+# content addressed result cache
+# keys are a hash of the input file's fingerprint (size, mtime, sha256) plus
+# the name and arguments of the computation, so a changed file can never hit
+# an old entry. entries live in a size bounded in-memory LRU and, with a
+# cache_dir, in an on-disk tier shared by separate processes and CLI runs.
+# values are stored as JSON (sets and tuples tagged so they come back as
+# such), never pickled, so a shared cache directory cannot run code. every
+# get decodes a fresh copy, so callers can mutate results (e.g.
+# merge_aggregates) without corrupting the cache
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from utils.snapshot import source_fingerprint
+
+# bump when the shape of cached results changes
+CACHE_VERSION = 2
+DISK_SUFFIX = ".json"
+
+
+# the file is hashed on every call: size and mtime alone miss same size
+# rewrites that keep the mtime (cp -p, rsync -t, tar), and a stale hash
+# would serve old snapshots and results
+def file_fingerprint(filename):
+    return source_fingerprint(filename)
+
+
+def write_atomic(path, data):
+
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        print(f"could not write cache entry {path}: {e}")
+        return False
+
+
+# JSON safe copy of a value: sets, tuples and dicts with non string keys are
+# tagged so decode_value can restore them
+def encode_value(value):
+
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: encode_value(item) for key, item in value.items()}
+        return {"__items__": [[encode_value(key), encode_value(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": [encode_value(item) for item in value]}
+    return value
+
+
+def decode_tagged(value):
+
+    if len(value) == 1:
+        if "__set__" in value:
+            return set(value["__set__"])
+        if "__tuple__" in value:
+            return tuple(value["__tuple__"])
+        if "__items__" in value:
+            return {key: item for key, item in value["__items__"]}
+    return value
+
+
+def dumps(value):
+    return json.dumps(encode_value(value), separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    return json.loads(data, object_hook=decode_tagged)
+
+
+# stable hex key for a fingerprint, a computation name and its arguments
+def cache_key(fingerprint, name, *args, **kwargs):
+
+    payload = json.dumps(
+        [CACHE_VERSION, fingerprint, name, list(args), kwargs],
+        sort_keys=True,
+        default=repr
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+
+    # max_bytes bounds the encoded size held in memory, max_disk_bytes the
+    # on-disk tier (least recently used entries are evicted first)
+    def __init__(self, max_entries=256, max_bytes=256 << 20, cache_dir=None,
+                 max_disk_bytes=1 << 30):
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries or bool(self.cache_dir and os.path.exists(self.disk_path(key)))
+
+    def disk_path(self, key):
+        return os.path.join(self.cache_dir, key + DISK_SUFFIX)
+
+    # keeps the memory tier within max_entries and max_bytes
+    def store(self, key, data):
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+
+            if len(data) > self.max_bytes:
+                return
+
+            self.entries[key] = data
+            self.size += len(data)
+
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def get(self, key, default=None):
+
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+
+        if data is None and self.cache_dir:
+            data = self.read_disk(key)
+            if data is not None:
+                self.stats["disk_hits"] += 1
+                self.store(key, data)
+
+        if data is None:
+            self.stats["misses"] += 1
+            return default
+
+        try:
+            return loads(data)
+        except ValueError:
+            return default
+
+    # returns the encoded value
+    def put(self, key, value):
+
+        data = dumps(value)
+        self.store(key, data)
+
+        if self.cache_dir:
+            self.write_disk(key, data)
+
+        return data
+
+    # cached value, or compute() stored under key. a computed value is
+    # returned through the same decoding as a cached one, so hits and misses
+    # give identical results
+    def get_or_compute(self, key, compute):
+
+        missing = object()
+        value = self.get(key, missing)
+
+        if value is missing:
+            value = loads(self.put(key, compute()))
+
+        return value
+
+    def read_disk(self, key):
+
+        path = self.disk_path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # mtime is the recency used for disk eviction
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def write_disk(self, key, data):
+
+        if write_atomic(self.disk_path(key), data):
+            self.evict_disk()
+
+    def evict_disk(self):
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(DISK_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.stats["evictions"] += 1
+            except OSError:
+                continue
+
+    def clear(self):
+
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(DISK_SUFFIX):
+                    os.remove(os.path.join(self.cache_dir, name))
+
@@ -0,0 +1,189 @@
+# date-indexed rollup of the daily aggregates
+# every calendar day between the first and last sale gets one slot in
+# contiguous arrays (empty days are zeros), with prefix sums over them, so
+# the totals of any date range are two lookups and bucketed / rolling views
+# cost O(1) per bucket, without going back to the transactions
+
+from array import array
+from datetime import date, timedelta
+
+from utils.data_processor import aggregate_transactions
+
+
+class DailyRollup:
+
+    # aggregates as returned by aggregate_transactions
+    def __init__(self, aggregates):
+
+        days = {}
+        self.skipped_dates = []
+
+        for day, stats in aggregates["daily"].items():
+            try:
+                days[date.fromisoformat(day)] = stats
+            except (TypeError, ValueError):
+                # dates that are not YYYY-MM-DD cannot be placed on the axis
+                self.skipped_dates.append(day)
+
+        self.start = min(days) if days else None
+        self.end = max(days) if days else None
+        size = (self.end - self.start).days + 1 if days else 0
+
+        self.revenue = array("d", bytes(8 * size))
+        self.transaction_count = array("q", bytes(8 * size))
+        self.unique_customers = array("q", bytes(8 * size))
+        self.has_sales = bytearray(size)
+
+        for day, stats in days.items():
+            i = (day - self.start).days
+            self.revenue[i] = stats["revenue"]
+            self.transaction_count[i] = stats["transaction_count"]
+            self.unique_customers[i] = len(stats["unique_customers"])
+            self.has_sales[i] = 1
+
+        # prefix[i] is the total of days [0, i)
+        self.revenue_prefix = array("d", [0.0])
+        self.count_prefix = array("q", [0])
+        for revenue, count in zip(self.revenue, self.transaction_count):
+            self.revenue_prefix.append(self.revenue_prefix[-1] + revenue)
+            self.count_prefix.append(self.count_prefix[-1] + count)
+
+        # peak day per range, sparse table built on first use
+        self.peak_table = None
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        return cls(aggregate_transactions(transactions))
+
+    def __len__(self):
+        return len(self.revenue)
+
+    def day_at(self, i):
+        return self.start + timedelta(days=i)
+
+    # (first, end) slot positions of an inclusive date range, end exclusive
+    # dates can be date objects or ISO strings, None means unbounded
+    def slots(self, start=None, end=None):
+
+        if self.start is None:
+            return 0, 0
+
+        if isinstance(start, str):
+            start = date.fromisoformat(start)
+        if isinstance(end, str):
+            end = date.fromisoformat(end)
+
+        first = min(max((start - self.start).days, 0), len(self)) if start is not None else 0
+        last = min((end - self.start).days + 1, len(self)) if end is not None else len(self)
+
+        return first, max(first, last)
+
+    def slot_totals(self, first, last):
+
+        return {
+            "revenue": round(self.revenue_prefix[last] - self.revenue_prefix[first], 2),
+            "transaction_count": self.count_prefix[last] - self.count_prefix[first]
+        }
+
+    # revenue and transaction count of an inclusive date range
+    def range_totals(self, start=None, end=None):
+        return self.slot_totals(*self.slots(start, end))
+
+    # {bucket label: totals} for "week" (ISO weeks, labelled by their Monday),
+    # "month" (YYYY-MM) or a number of days (labelled by the first day)
+    def buckets(self, size="month", start=None, end=None):
+
+        first, last = self.slots(start, end)
+        result = {}
+
+        i = first
+        while i < last:
+            day = self.day_at(i)
+
+            if size == "month":
+                label = day.strftime("%Y-%m")
+                following = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+                bucket_end = i + (following - day).days
+            elif size == "week":
+                monday = day - timedelta(days=day.weekday())
+                label = monday.isoformat()
+                bucket_end = i + 7 - day.weekday()
+            elif isinstance(size, int) and size > 0:
+                label = day.isoformat()
+                bucket_end = i + size
+            else:
+                raise ValueError(f"unknown bucket size: {size}")
+
+            bucket_end = min(bucket_end, last)
+            result[label] = self.slot_totals(i, bucket_end)
+            i = bucket_end
+
+        return result
+
+    # {date: totals of the window days ending on that date} for every day
+    # in the range; windows reaching before the first sale are partial
+    def rolling(self, window=7, start=None, end=None):
+
+        if window < 1:
+            raise ValueError("window must be at least one day")
+
+        first, last = self.slots(start, end)
+
+        return {
+            self.day_at(i).isoformat(): self.slot_totals(max(i + 1 - window, 0), i + 1)
+            for i in range(first, last)
+        }
+
+    # same shape as daily_sales_trend, for the days with sales in the range
+    def daily_trend(self, start=None, end=None):
+
+        first, last = self.slots(start, end)
+
+        return {
+            self.day_at(i).isoformat(): {
+                "revenue": round(self.revenue[i], 2),
+                "transaction_count": self.transaction_count[i],
+                "unique_customers": self.unique_customers[i]
+            }
+            for i in range(first, last)
+            if self.has_sales[i]
+        }
+
+    # sparse table of the best slot over [i, i + 2**k), earliest day on ties
+    def build_peak_table(self):
+
+        revenue = self.revenue
+        table = [list(range(len(self)))]
+
+        width = 1
+        while width * 2 <= len(self):
+            previous = table[-1]
+            level = []
+            for i in range(len(self) - width * 2 + 1):
+                left, right = previous[i], previous[i + width]
+                level.append(right if revenue[right] > revenue[left] else left)
+            table.append(level)
+            width *= 2
+
+        self.peak_table = table
+
+    # (date, revenue, transaction count) of the best day in the range,
+    # like find_peak_sales_day, answered in O(1) after the first call
+    def peak_day(self, start=None, end=None):
+
+        first, last = self.slots(start, end)
+        if first >= last:
+            return None, 0.0, 0
+
+        if self.peak_table is None:
+            self.build_peak_table()
+
+        level = (last - first).bit_length() - 1
+        left = self.peak_table[level][first]
+        right = self.peak_table[level][last - (1 << level)]
+        best = right if self.revenue[right] > self.revenue[left] else left
+
+        if not self.has_sales[best]:
+            return None, 0.0, 0
+
+        return self.day_at(best).isoformat(), round(self.revenue[best], 2), self.transaction_count[best]
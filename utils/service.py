@@ -0,0 +1,294 @@
+# long-running analysis service
+# the sales file is parsed, validated and indexed once (through the snapshot
+# cache) and the product catalog is loaded once. with each load the
+# aggregates of every region (and of all rows) are precomputed, so region
+# only requests never touch the rows; amount ranges are a vectorized mask +
+# aggregation over numpy columns (or, without numpy, a filter on the index
+# plus one aggregation pass over the selected rows).
+# GET /analyze?region=North&min_amount=100&max_amount=5000&top_n=5
+# GET /health
+# responses are memoized in a ResultCache keyed on the file fingerprint, the
+# catalog and the query, so repeated queries skip even the aggregation
+
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from utils.api_handler import load_product_mapping, EnrichmentIndex, CATALOG_PAGE_SIZE
+from utils.file_handler import load_sales_table_cached
+from utils.filter_engine import FilterIndex
+from utils.result_cache import ResultCache, cache_key, file_fingerprint
+from utils.data_processor import (
+    load_numpy_backend,
+    aggregate_transactions,
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products
+)
+
+
+# a loaded snapshot and what every request needs precomputed.
+# the precomputed aggregates are shared between requests, the views only
+# read them
+class QueryIndex:
+
+    def __init__(self, table, valid_rows):
+
+        self.filter_index = FilterIndex(table, valid_rows)
+
+        numpy_backend = load_numpy_backend()
+        self.selection = None
+        if numpy_backend is not None:
+            self.selection = numpy_backend.SelectionIndex(table, self.filter_index.valid_rows)
+
+        # region (None for all rows) -> (aggregates, {ProductID: rows})
+        self.partitions = {
+            region: self.compute(region, None, None)[:2]
+            for region in [None] + self.filter_index.regions
+        }
+
+    def __len__(self):
+        return self.filter_index.total_input
+
+    # (aggregates, {ProductID: rows}, selected row count), from the rows
+    def compute(self, region, min_amount, max_amount):
+
+        if self.selection is not None:
+            positions = self.selection.select(region, min_amount, max_amount)
+            return (
+                self.selection.aggregate(positions),
+                self.selection.product_id_counts(positions),
+                len(positions)
+            )
+
+        selected, _, _ = self.filter_index.filter(
+            region=region,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            verbose=False
+        )
+        product_ids = selected.dictionaries["ProductID"]
+        counts = Counter(selected.codes["ProductID"])
+        return (
+            aggregate_transactions(selected),
+            {product_ids[code]: count for code, count in counts.items()},
+            len(selected)
+        )
+
+    # (aggregates, {ProductID: rows}, filter_summary) of validate_and_filter
+    # with these filters
+    def select(self, region=None, min_amount=None, max_amount=None):
+
+        index = self.filter_index
+        valid_count = len(index.valid_rows)
+        region_count = len(index.region_rows.get(region, ())) if region else valid_count
+
+        if min_amount is None and max_amount is None:
+            if region and region not in self.partitions:
+                aggregates, product_counts = aggregate_transactions([]), {}
+            else:
+                aggregates, product_counts = self.partitions[region or None]
+            final_count = region_count
+        else:
+            aggregates, product_counts, final_count = self.compute(region, min_amount, max_amount)
+
+        filter_summary = {
+            "total_input": index.total_input,
+            "invalid": index.invalid_count,
+            "filtered_by_region": valid_count - region_count,
+            "filtered_by_amount": region_count - final_count,
+            "final_count": final_count,
+            "rejected_by_rule": dict(index.rejected_by_rule)
+        }
+
+        return aggregates, product_counts, filter_summary
+
+
+class SalesService:
+
+    def __init__(self, filename="data/sales_data.txt", product_mapping=None, cache=None):
+
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.source_stat = None
+        self.fingerprint = None
+        self.query_index = None
+        self.cache = cache if cache is not None else ResultCache()
+
+        if product_mapping is None:
+            product_mapping = load_product_mapping()
+        self.product_mapping = product_mapping
+        self.enrichment_index = EnrichmentIndex(product_mapping)
+        self.catalog_key = hashlib.sha256(
+            json.dumps(product_mapping, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+        self.reload_if_changed()
+
+    # the dataset is rebuilt only when the file's stat changes (the request
+    # path cannot hash it). ctime is part of it: copies that keep the mtime
+    # (cp -p, rsync -t, tar) still set a new ctime
+    def reload_if_changed(self):
+
+        try:
+            stat = os.stat(self.filename)
+            source_stat = (stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+        except FileNotFoundError:
+            source_stat = None
+
+        if source_stat == self.source_stat and self.query_index is not None:
+            return False
+
+        with self.lock:
+            if source_stat != self.source_stat or self.query_index is None:
+                fingerprint = file_fingerprint(self.filename) if source_stat else None
+                table, valid_rows = load_sales_table_cached(self.filename, fingerprint=fingerprint)
+                self.query_index = QueryIndex(table, valid_rows)
+                self.fingerprint = fingerprint
+                self.source_stat = source_stat
+                print(f"service loaded {len(table)} transactions from {self.filename}")
+
+        return True
+
+    # enrichment match counts from the rows per ProductID of the selection
+    def enrichment_summary(self, product_counts):
+
+        total = sum(product_counts.values())
+        matched = 0
+        failed = set()
+
+        for product_id, count in product_counts.items():
+            if self.enrichment_index[product_id]["API_Match"]:
+                matched += count
+            else:
+                failed.add(product_id)
+
+        return {
+            "total": total,
+            "matched": matched,
+            "success_rate": round(matched / total * 100, 2) if total else 0.0,
+            "failed_products": sorted(failed)
+        }
+
+    def analyze(self, region=None, min_amount=None, max_amount=None, top_n=5):
+
+        self.reload_if_changed()
+        with self.lock:
+            fingerprint, query_index = self.fingerprint, self.query_index
+
+        key = cache_key(fingerprint, "service.analyze", region, min_amount, max_amount, top_n,
+                        catalog=self.catalog_key)
+
+        return self.cache.get_or_compute(
+            key, lambda: self.compute_analysis(query_index, region, min_amount, max_amount, top_n)
+        )
+
+    # the views only read the aggregates, so no rows are passed to them
+    def compute_analysis(self, query_index, region, min_amount, max_amount, top_n):
+
+        aggregates, product_counts, filter_summary = query_index.select(region, min_amount, max_amount)
+        peak_date, peak_revenue, peak_count = find_peak_sales_day(None, aggregates=aggregates)
+
+        return {
+            "filters": {"region": region, "min_amount": min_amount, "max_amount": max_amount},
+            "filter_summary": filter_summary,
+            "total_revenue": calculate_total_revenue(None, aggregates=aggregates),
+            "regions": region_wise_sales(None, aggregates=aggregates),
+            "top_products": top_selling_products(None, n=top_n, aggregates=aggregates),
+            "top_customers": customer_analysis(None, aggregates=aggregates, top_n=top_n),
+            "daily_trend": daily_sales_trend(None, aggregates=aggregates),
+            "peak_day": {"date": peak_date, "revenue": peak_revenue, "transaction_count": peak_count},
+            "low_performers": low_performing_products(None, aggregates=aggregates),
+            "enrichment": self.enrichment_summary(product_counts)
+        }
+
+
+# query string -> analyze() keyword arguments, ValueError on bad numbers
+def parse_analyze_query(query):
+
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+
+    def number(name, convert):
+        value = params.get(name, "").strip()
+        return convert(value) if value else None
+
+    top_n = number("top_n", int)
+
+    return {
+        "region": params.get("region", "").strip() or None,
+        "min_amount": number("min_amount", float),
+        "max_amount": number("max_amount", float),
+        "top_n": 5 if top_n is None else top_n
+    }
+
+
+class SalesRequestHandler(BaseHTTPRequestHandler):
+
+    service = None
+
+    def send_json(self, status, payload):
+
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+
+        url = urlparse(self.path)
+
+        if url.path == "/health":
+            self.send_json(200, {
+                "status": "ok",
+                "filename": self.service.filename,
+                "transactions": len(self.service.query_index),
+                "cache": dict(self.service.cache.stats, entries=len(self.service.cache))
+            })
+            return
+
+        if url.path != "/analyze":
+            self.send_json(404, {"error": f"unknown path {url.path}"})
+            return
+
+        try:
+            options = parse_analyze_query(url.query)
+        except ValueError as e:
+            self.send_json(400, {"error": f"invalid parameter: {e}"})
+            return
+
+        try:
+            self.send_json(200, self.service.analyze(**options))
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+
+def create_server(service, host="127.0.0.1", port=8000):
+
+    handler = type("BoundSalesRequestHandler", (SalesRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(filename="data/sales_data.txt", host="127.0.0.1", port=8000, cache=None,
+          catalog_page_size=CATALOG_PAGE_SIZE):
+
+    product_mapping = load_product_mapping(page_size=catalog_page_size)
+    service = SalesService(filename, product_mapping=product_mapping, cache=cache)
+    server = create_server(service, host, port)
+    print(f"serving sales analytics on http://{host}:{server.server_address[1]}/analyze")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nshutting down")
+    finally:
+        server.server_close()
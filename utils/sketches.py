@@ -0,0 +1,203 @@
+# fixed memory sketches for the approximate analytics mode
+
+import hashlib
+import heapq
+import math
+
+
+# 64 bit hash that is stable between runs and processes
+def stable_hash(value):
+
+    data = value.encode("utf-8") if isinstance(value, str) else repr(value).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+# distinct count estimate in 2**precision bytes
+# relative standard error is about 1.04 / sqrt(2**precision)
+class HyperLogLog:
+
+    def __init__(self, precision=10):
+
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+
+        hashed = stable_hash(value)
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+
+        # position of the leftmost 1 bit in the remaining bits
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.size)
+
+    def estimate(self):
+
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        # small range correction (linear counting)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+
+        return raw
+
+    def __len__(self):
+        return int(round(self.estimate()))
+
+
+# heavy hitters (top-k by total weight) in a fixed number of counters
+# every reported count overestimates the true total by at most its error,
+# and any item whose true total exceeds total_weight / capacity is kept
+class SpaceSaving:
+
+    def __init__(self, capacity=100):
+
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total_weight = 0
+        # (count, key) entries, stale ones are skipped when popped
+        self.heap = []
+
+    def add(self, key, weight=1):
+
+        self.total_weight += weight
+        counts = self.counts
+
+        if key in counts:
+            counts[key] += weight
+            heapq.heappush(self.heap, (counts[key], key))
+
+        elif len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0
+            heapq.heappush(self.heap, (weight, key))
+
+        else:
+            # replace the smallest counter, its count becomes the new error
+            smallest, evicted = self.pop_smallest()
+            del counts[evicted]
+            del self.errors[evicted]
+
+            counts[key] = smallest + weight
+            self.errors[key] = smallest
+            heapq.heappush(self.heap, (counts[key], key))
+
+        # drop stale entries now and then so the heap stays bounded
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, key) for key, count in counts.items()]
+            heapq.heapify(self.heap)
+
+    def pop_smallest(self):
+
+        while True:
+            count, key = heapq.heappop(self.heap)
+            if self.counts.get(key) == count:
+                return count, key
+
+    def top(self, n=5):
+
+        ranked = heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+        return [(key, count, self.errors[key]) for key, count in ranked]
+
+
+# quantiles with bounded relative error (logarithmic buckets, as in DDSketch)
+# min and max are tracked exactly
+class QuantileSketch:
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def bucket(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value):
+
+        # nan / inf have no bucket
+        if not math.isfinite(value):
+            return
+
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        if value > 0:
+            store = self.positive
+            index = self.bucket(value)
+        elif value < 0:
+            store = self.negative
+            index = self.bucket(-value)
+        else:
+            self.zero_count += 1
+            return
+
+        store[index] = store.get(index, 0) + 1
+
+        # keep memory fixed by folding the lowest buckets together
+        if len(store) > self.max_buckets:
+            lowest, second = sorted(store)[:2]
+            store[second] += store.pop(lowest)
+
+    def bucket_value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q):
+
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = 0
+
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return max(-self.bucket_value(index), self.min)
+
+        seen += self.zero_count
+        if seen > rank:
+            return 0
+
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return min(self.bucket_value(index), self.max)
+
+        return self.max
@@ -0,0 +1,267 @@
+# binary columnar snapshots of parsed + validated transactions
+# written next to the source file and keyed on its size, mtime and hash.
+# pyarrow is used when installed (Arrow IPC file, memory mapped on load),
+# otherwise a native format of raw array bytes read through mmap.
+# loaded columns are copied into plain arrays (one memcpy each), so a table
+# from a snapshot behaves exactly like a freshly parsed one
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from utils.transaction_table import TransactionTable, CODED_COLUMNS
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+NATIVE_MAGIC = b"SALESNAP1\n"
+NATIVE_SUFFIX = ".snapshot"
+ARROW_SUFFIX = ".arrow"
+ALIGNMENT = 8
+
+# bump whenever parsing or validation rules change what ends up in a
+# snapshot, so snapshots written by older code are rebuilt
+SNAPSHOT_VERSION = 2
+
+
+# identity of the source file, a snapshot is only used when all of it
+# (and the snapshot version) matches
+def source_fingerprint(filename, chunk_size=1 << 20):
+
+    stat = os.stat(filename)
+    digest = hashlib.sha256()
+
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest.hexdigest()
+    }
+
+
+def snapshot_path(filename, use_arrow=None):
+
+    if use_arrow is None:
+        use_arrow = pa is not None
+    return filename + (ARROW_SUFFIX if use_arrow else NATIVE_SUFFIX)
+
+
+# native format
+# magic | header length (8 bytes) | json header | 8 byte aligned column bytes
+def save_native_snapshot(path, table, valid_rows, fingerprint):
+
+    columns = {
+        "Quantity": table.quantity,
+        "UnitPrice": table.unit_price,
+        "ValidRows": array("q", valid_rows),
+        "TransactionID": "\n".join(table.transaction_ids).encode("utf-8")
+    }
+    for column in CODED_COLUMNS:
+        columns[column] = table.codes[column]
+
+    layout = {}
+    offset = 0
+    for name, values in columns.items():
+        data = values.tobytes() if isinstance(values, array) else values
+        layout[name] = {
+            "offset": offset,
+            "length": len(data),
+            "typecode": values.typecode if isinstance(values, array) else None,
+            "itemsize": values.itemsize if isinstance(values, array) else 1
+        }
+        offset += len(data) + (-len(data) % ALIGNMENT)
+
+    header = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": fingerprint,
+        "byteorder": sys.byteorder,
+        "rows": len(table),
+        "dictionaries": table.dictionaries,
+        "columns": layout
+    }).encode("utf-8")
+
+    # pad the header so the first column starts aligned
+    prefix = len(NATIVE_MAGIC) + 8 + len(header)
+    header += b" " * (-prefix % ALIGNMENT)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(NATIVE_MAGIC)
+        file.write(struct.pack("<Q", len(header)))
+        file.write(header)
+        for name, values in columns.items():
+            data = values.tobytes() if isinstance(values, array) else values
+            file.write(data)
+            file.write(b"\0" * (-len(data) % ALIGNMENT))
+    os.replace(temp_path, path)
+
+
+# array of typecode holding a copy of a buffer's bytes
+def copy_array(typecode, buffer):
+
+    values = array(typecode)
+    values.frombytes(buffer)
+    return values
+
+
+def load_native_snapshot(path, fingerprint):
+
+    with open(path, "rb") as file:
+        if file.read(len(NATIVE_MAGIC)) != NATIVE_MAGIC:
+            return None
+
+        header_length = struct.unpack("<Q", file.read(8))[0]
+        header = json.loads(file.read(header_length))
+        start = file.tell()
+
+        if header.get("version") != SNAPSHOT_VERSION or header["fingerprint"] != fingerprint \
+                or header["byteorder"] != sys.byteorder:
+            return None
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+
+            def column(name):
+                spec = header["columns"][name]
+                first = start + spec["offset"]
+                with memoryview(mapped)[first:first + spec["length"]] as view:
+                    if spec["typecode"] is None:
+                        return bytes(view)
+                    if array(spec["typecode"]).itemsize != spec["itemsize"]:
+                        raise ValueError("snapshot written on an incompatible platform")
+                    return copy_array(spec["typecode"], view)
+
+            table = TransactionTable(header["dictionaries"])
+            table.quantity = column("Quantity")
+            table.unit_price = column("UnitPrice")
+            for name in CODED_COLUMNS:
+                table.codes[name] = column(name)
+
+            ids = column("TransactionID").decode("utf-8")
+            table.transaction_ids = ids.split("\n") if header["rows"] else []
+            valid_rows = column("ValidRows")
+
+    return table, valid_rows
+
+
+# arrow format, string columns are dictionary encoded with the table codes
+def save_arrow_snapshot(path, table, valid_rows, fingerprint):
+
+    valid = bytearray(len(table))
+    for i in valid_rows:
+        valid[i] = 1
+
+    arrays = {
+        "TransactionID": pa.array(table.transaction_ids, pa.string()),
+        "Quantity": pa.array(table.quantity, pa.int64()),
+        "UnitPrice": pa.array(table.unit_price, pa.float64()),
+        "Valid": pa.array(valid, pa.uint8())
+    }
+    for column in CODED_COLUMNS:
+        arrays[column] = pa.DictionaryArray.from_arrays(
+            pa.array(table.codes[column], pa.int32()),
+            pa.array(table.dictionaries[column], pa.string())
+        )
+
+    arrow_table = pa.table(arrays).replace_schema_metadata({
+        "version": str(SNAPSHOT_VERSION),
+        "fingerprint": json.dumps(fingerprint)
+    })
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(temp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+    os.replace(temp_path, path)
+
+
+def load_arrow_snapshot(path, fingerprint):
+
+    with pa.memory_map(path, "r") as source:
+        arrow_table = pa.ipc.open_file(source).read_all()
+
+        metadata = arrow_table.schema.metadata or {}
+        if metadata.get(b"version") != str(SNAPSHOT_VERSION).encode() or \
+                json.loads(metadata.get(b"fingerprint", b"null")) != fingerprint:
+            return None
+
+        return arrow_snapshot_columns(arrow_table.combine_chunks())
+
+
+# TransactionTable and valid rows copied out of a (memory mapped) arrow table
+def arrow_snapshot_columns(arrow_table):
+
+    # copy of a column's data buffer (indices for dictionary columns)
+    def values(name, typecode):
+        chunked = arrow_table.column(name)
+        if not chunked.num_chunks or not len(chunked):
+            return array(typecode)
+
+        chunk = chunked.chunk(0)
+        if isinstance(chunk, pa.DictionaryArray):
+            chunk = chunk.indices
+
+        width = array(typecode).itemsize
+        buffer = memoryview(chunk.buffers()[1])
+        return copy_array(typecode, buffer[chunk.offset * width:(chunk.offset + len(chunk)) * width])
+
+    dictionaries = {}
+    for column in CODED_COLUMNS:
+        chunked = arrow_table.column(column)
+        dictionaries[column] = chunked.chunk(0).dictionary.to_pylist() if chunked.num_chunks else []
+
+    table = TransactionTable(dictionaries)
+    table.quantity = values("Quantity", "q")
+    table.unit_price = values("UnitPrice", "d")
+    for column in CODED_COLUMNS:
+        table.codes[column] = values(column, "i")
+    table.transaction_ids = arrow_table.column("TransactionID").to_pylist()
+
+    valid = values("Valid", "B")
+    valid_rows = array("q", [i for i, flag in enumerate(valid) if flag])
+
+    return table, valid_rows
+
+
+def save_snapshot(filename, table, valid_rows, fingerprint=None, use_arrow=None):
+
+    if use_arrow is None:
+        use_arrow = pa is not None
+    fingerprint = fingerprint or source_fingerprint(filename)
+    path = snapshot_path(filename, use_arrow)
+
+    if use_arrow:
+        save_arrow_snapshot(path, table, valid_rows, fingerprint)
+    else:
+        save_native_snapshot(path, table, valid_rows, fingerprint)
+
+    return path
+
+
+# (table, valid row positions) or None when missing, stale or unreadable
+def load_snapshot(filename, fingerprint=None, use_arrow=None):
+
+    if use_arrow is None:
+        use_arrow = pa is not None
+    path = snapshot_path(filename, use_arrow)
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        fingerprint = fingerprint or source_fingerprint(filename)
+        if use_arrow:
+            return load_arrow_snapshot(path, fingerprint)
+        return load_native_snapshot(path, fingerprint)
+
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"ignoring unreadable snapshot {path}: {e}")
+        return None
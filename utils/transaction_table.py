@@ -0,0 +1,180 @@
+# compact columnar storage for parsed transactions
+
+from array import array
+
+# string columns that repeat a lot are stored as integer codes
+# backed by one dictionary per column
+CODED_COLUMNS = ("Date", "ProductID", "ProductName", "CustomerID", "Region")
+
+COLUMN_ORDER = (
+    "TransactionID", "Date", "ProductID", "ProductName",
+    "Quantity", "UnitPrice", "CustomerID", "Region"
+)
+
+
+class TransactionTable:
+
+    def __init__(self, dictionaries=None, lookup=None):
+
+        self.transaction_ids = []
+        self.quantity = array("q")
+        self.unit_price = array("d")
+        self.codes = {column: array("i") for column in CODED_COLUMNS}
+
+        # code -> value, shared between tables taken from the same source
+        if dictionaries is None:
+            dictionaries = {column: [] for column in CODED_COLUMNS}
+        self.dictionaries = dictionaries
+        self._lookup = lookup if lookup is not None else self._build_lookup()
+
+    def _build_lookup(self):
+        return {
+            column: {value: code for code, value in enumerate(values)}
+            for column, values in self.dictionaries.items()
+        }
+
+    # the value -> code lookups are rebuilt on unpickling, so tables sent
+    # between processes only carry the arrays and the dictionaries
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+        del state["_lookup"]
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self._lookup = self._build_lookup()
+
+    def __len__(self):
+        return len(self.quantity)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    # returns the integer code of a value, adding it to the dictionary if new
+    def encode(self, column, value):
+
+        lookup = self._lookup[column]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(lookup)
+            self.dictionaries[column].append(value)
+        return code
+
+    # returns the code of a value or None if the column never saw it
+    def code_of(self, column, value):
+        return self._lookup[column].get(value)
+
+    def append(self, transaction_id, date, product_id, product_name,
+               quantity, unit_price, customer_id, region):
+
+        # numbers first so an out of range quantity leaves the table untouched
+        self.quantity.append(quantity)
+        try:
+            self.unit_price.append(unit_price)
+        except Exception:
+            self.quantity.pop()
+            raise
+
+        self.transaction_ids.append(transaction_id)
+        codes = self.codes
+        codes["Date"].append(self.encode("Date", date))
+        codes["ProductID"].append(self.encode("ProductID", product_id))
+        codes["ProductName"].append(self.encode("ProductName", product_name))
+        codes["CustomerID"].append(self.encode("CustomerID", customer_id))
+        codes["Region"].append(self.encode("Region", region))
+
+    # appends a row whose string columns are already encoded
+    def append_encoded(self, transaction_id, date_code, product_id_code,
+                       product_name_code, quantity, unit_price,
+                       customer_code, region_code):
+
+        self.quantity.append(quantity)
+        try:
+            self.unit_price.append(unit_price)
+        except Exception:
+            self.quantity.pop()
+            raise
+
+        self.transaction_ids.append(transaction_id)
+        codes = self.codes
+        codes["Date"].append(date_code)
+        codes["ProductID"].append(product_id_code)
+        codes["ProductName"].append(product_name_code)
+        codes["CustomerID"].append(customer_code)
+        codes["Region"].append(region_code)
+
+    def append_record(self, tx):
+
+        self.append(
+            tx["TransactionID"], tx["Date"], tx["ProductID"], tx["ProductName"],
+            tx["Quantity"], tx["UnitPrice"], tx["CustomerID"], tx["Region"]
+        )
+
+    # decoded values of one column, in row order
+    def column(self, name):
+
+        if name == "TransactionID":
+            return list(self.transaction_ids)
+        if name == "Quantity":
+            return list(self.quantity)
+        if name == "UnitPrice":
+            return list(self.unit_price)
+
+        values = self.dictionaries[name]
+        return [values[code] for code in self.codes[name]]
+
+    # one row as the same dict parse_transactions produces
+    def row(self, i):
+
+        dictionaries = self.dictionaries
+        codes = self.codes
+        return {
+            "TransactionID": self.transaction_ids[i],
+            "Date": dictionaries["Date"][codes["Date"][i]],
+            "ProductID": dictionaries["ProductID"][codes["ProductID"][i]],
+            "ProductName": dictionaries["ProductName"][codes["ProductName"][i]],
+            "Quantity": self.quantity[i],
+            "UnitPrice": self.unit_price[i],
+            "CustomerID": dictionaries["CustomerID"][codes["CustomerID"][i]],
+            "Region": dictionaries["Region"][codes["Region"][i]]
+        }
+
+    # new table with the selected rows, sharing this table's dictionaries
+    def take(self, indices):
+
+        result = TransactionTable(self.dictionaries, self._lookup)
+
+        transaction_ids = self.transaction_ids
+        quantity = self.quantity
+        unit_price = self.unit_price
+
+        result.transaction_ids = [transaction_ids[i] for i in indices]
+        result.quantity = array("q", [quantity[i] for i in indices])
+        result.unit_price = array("d", [unit_price[i] for i in indices])
+        for column, codes in self.codes.items():
+            result.codes[column] = array("i", [codes[i] for i in indices])
+
+        return result
+
+    # appends all rows of another table, remapping its codes into this one
+    def extend(self, other):
+
+        self.quantity.extend(other.quantity)
+        self.unit_price.extend(other.unit_price)
+        self.transaction_ids.extend(other.transaction_ids)
+
+        for column, codes in other.codes.items():
+            mapping = [self.encode(column, value) for value in other.dictionaries[column]]
+            self.codes[column].extend(array("i", [mapping[code] for code in codes]))
+
+    # builds a table from transaction dicts
+    @classmethod
+    def from_records(cls, transactions):
+
+        table = cls()
+        for tx in transactions:
+            table.append_record(tx)
+        return table
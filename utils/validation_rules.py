@@ -0,0 +1,174 @@
+# validation rules of validate_and_filter, as data
+# a rejected row is counted against the first rule it breaks, in the order
+# below (the order is_valid_transaction has always checked them in), so the
+# per-rule counts add up to the invalid count.
+# for TransactionTables the rules run as batch checks over whole columns:
+# prefix rules once per distinct dictionary value, then numpy masks over the
+# code / number columns when numpy is installed
+
+from operator import methodcaller
+
+from utils.transaction_table import COLUMN_ORDER
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+REQUIRED_FIELDS = list(COLUMN_ORDER)
+
+# (rule, field, required prefix)
+PREFIX_RULES = (
+    ("transaction_id_prefix", "TransactionID", "T"),
+    ("product_id_prefix", "ProductID", "P"),
+    ("customer_id_prefix", "CustomerID", "C")
+)
+
+# (rule, field) for values that must not be <= 0. every check is written
+# as "x <= 0 fails", never "x > 0 passes", so a NaN passes on every path
+# exactly as it always has in is_valid_transaction
+POSITIVE_RULES = (
+    ("quantity_positive", "Quantity"),
+    ("unit_price_positive", "UnitPrice")
+)
+
+# values of the wrong type (e.g. a non numeric Quantity in a hand built dict)
+MALFORMED = "malformed"
+
+RULES = ("missing_fields",) + tuple(rule for rule, _, _ in PREFIX_RULES) + \
+    tuple(rule for rule, _ in POSITIVE_RULES) + (MALFORMED,)
+
+
+def empty_rule_counts():
+    return dict.fromkeys(RULES, 0)
+
+
+# name of the first rule a transaction dict breaks, None when it is valid
+def first_failed_rule(tx):
+
+    try:
+        if not all(field in tx for field in REQUIRED_FIELDS):
+            return "missing_fields"
+
+        for rule, field, prefix in PREFIX_RULES:
+            if not tx[field].startswith(prefix):
+                return rule
+
+        for rule, field in POSITIVE_RULES:
+            if tx[field] <= 0:
+                return rule
+
+        return None
+
+    except Exception:
+        return MALFORMED
+
+
+# per distinct value of the coded ID columns: passes its prefix rule or not
+def prefix_ok_by_code(table):
+
+    return {
+        field: [value.startswith(prefix) for value in table.dictionaries[field]]
+        for _, field, prefix in PREFIX_RULES
+        if field in table.codes
+    }
+
+
+# first broken rule of one table row, None when it is valid
+def first_failed_rule_at(table, i, ok_by_code=None):
+
+    ok_by_code = ok_by_code or prefix_ok_by_code(table)
+
+    if not table.transaction_ids[i].startswith("T"):
+        return "transaction_id_prefix"
+    if not ok_by_code["ProductID"][table.codes["ProductID"][i]]:
+        return "product_id_prefix"
+    if not ok_by_code["CustomerID"][table.codes["CustomerID"][i]]:
+        return "customer_id_prefix"
+    if table.quantity[i] <= 0:
+        return "quantity_positive"
+    if table.unit_price[i] <= 0:
+        return "unit_price_positive"
+    return None
+
+
+# (valid row positions, rejections per rule) for a TransactionTable
+def validate_columns(table):
+
+    if np is not None and len(table):
+        return validate_columns_numpy(table)
+
+    ok_by_code = prefix_ok_by_code(table)
+    product_ok = ok_by_code["ProductID"]
+    customer_ok = ok_by_code["CustomerID"]
+    codes = table.codes
+
+    valid_rows = [
+        i
+        for i, (transaction_id, product_code, customer_code, quantity, unit_price) in enumerate(zip(
+            table.transaction_ids, codes["ProductID"], codes["CustomerID"],
+            table.quantity, table.unit_price
+        ))
+        if transaction_id.startswith("T")
+        and product_ok[product_code]
+        and customer_ok[customer_code]
+        and not quantity <= 0 and not unit_price <= 0
+    ]
+
+    return valid_rows, count_rejections(table, valid_rows, ok_by_code)
+
+
+# one boolean mask per rule, combined in rule order so every rejected row
+# lands on its first broken rule
+def validate_columns_numpy(table):
+
+    n = len(table)
+    codes = table.codes
+    ok_by_code = prefix_ok_by_code(table)
+
+    masks = [
+        ("transaction_id_prefix", np.fromiter(
+            map(methodcaller("startswith", "T"), table.transaction_ids), dtype=bool, count=n
+        )),
+        ("product_id_prefix", np.array(ok_by_code["ProductID"], dtype=bool)[
+            np.frombuffer(codes["ProductID"], dtype=np.int32)
+        ]),
+        ("customer_id_prefix", np.array(ok_by_code["CustomerID"], dtype=bool)[
+            np.frombuffer(codes["CustomerID"], dtype=np.int32)
+        ]),
+        ("quantity_positive", ~(np.frombuffer(table.quantity, dtype=np.int64) <= 0)),
+        ("unit_price_positive", ~(np.frombuffer(table.unit_price, dtype=np.float64) <= 0))
+    ]
+
+    counts = empty_rule_counts()
+    remaining = np.ones(n, dtype=bool)
+
+    for rule, passed in masks:
+        counts[rule] = int(np.count_nonzero(remaining & ~passed))
+        remaining &= passed
+
+    return np.flatnonzero(remaining).tolist(), counts
+
+
+# rejections per rule of the rows not in valid_rows,
+# for tables whose validity is already known, e.g. loaded from a snapshot
+def count_rejections(table, valid_rows, ok_by_code=None):
+
+    ok_by_code = ok_by_code or prefix_ok_by_code(table)
+    counts = empty_rule_counts()
+
+    valid = bytearray(len(table))
+    for i in valid_rows:
+        valid[i] = 1
+
+    start = 0
+    while True:
+        i = valid.find(0, start)
+        if i < 0:
+            break
+        rule = first_failed_rule_at(table, i, ok_by_code)
+        if rule:
+            counts[rule] += 1
+        start = i + 1
+
+    return counts